@@ -0,0 +1,389 @@
+"""
+API local de solo lectura con los agregados del dashboard.
+
+Sirve por HTTP los mismos números que muestra el dashboard (KPIs, matriz de
+oportunidad, perfil por región, tabla departamental, proyecciones y
+recomendaciones), leídos del mismo grafo de cálculo (grafo_dashboard.py:
+cubo de edades, índice de segmentos, modelo nacional) sobre la encuesta
+mapeada en memoria que comparten los procesos de Streamlit. Con
+CAFE_RUTAS_OLEADAS se sirven las oleadas deduplicadas, como en el dashboard.
+
+- GET /<tabla>?Región=Copán&Región=Agalta&Edad=18,35 -> tabla de un segmento
+- POST /lote {"segmentos": [...], "tablas": [...]} -> varios segmentos en una llamada
+- GET /salud -> filas, hash del dataset y del modelo
+
+Las respuestas llevan un ETag derivado del hash del dataset, del modelo, del
+cruce regional y de la consulta; una petición con If-None-Match vigente recibe 304
+sin recalcular nada. Se responde en JSON o en Arrow IPC (?formato=arrow o
+Accept: application/vnd.apache.arrow.stream) y con gzip si el cliente lo
+acepta.
+
+Uso:
+    python api_agregados.py --puerto 8765
+    curl -H 'Accept-Encoding: gzip' 'http://127.0.0.1:8765/kpis?Región=Copán' --compressed
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from cruce_regiones import cargar_cruce
+from datos import RUTA_DATOS, RUTA_OFICIAL, RUTAS_OLEADAS, cargar_datos, cargar_oleadas, cargar_serie_oficial
+from datos_compartidos import DIRECTORIO_MMAP, cargar_encuesta_compartida, firma_fuente
+from grafo_dashboard import TABLAS, construir_grafo, tablas_reporte
+from reporte_batch import filtrar_segmento
+
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+TIPO_JSON = "application/json; charset=utf-8"
+MAX_SEGMENTOS_CACHE = 256
+MAX_RESPUESTAS_CACHE = 1024
+MIN_BYTES_GZIP = 1024
+
+
+def _clave(*partes):
+    texto = json.dumps(partes, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class _LRU:
+    """Diccionario con desalojo del menos usado, seguro entre hilos."""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                return None
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def put(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+class ContextoAPI:
+    """
+    Dataset, grafo de cálculo y cachés del servidor.
+
+    Cada segmento se fija como la encuesta del grafo del dashboard y se leen
+    sus nodos; el modelo nacional depende solo de la serie oficial y se
+    entrena una sola vez. El dataset se recarga (y las cachés se vacían) solo
+    cuando cambia la firma de los archivos fuente o del cruce regional.
+    """
+
+    def __init__(self, ruta_datos=RUTA_DATOS, directorio_mmap=DIRECTORIO_MMAP, ruta_oficial=RUTA_OFICIAL,
+                 rutas_oleadas=RUTAS_OLEADAS):
+        # Las mismas fuentes que el dashboard: varias oleadas si están configuradas
+        self.fuente = list(rutas_oleadas) if rutas_oleadas else ruta_datos
+        self.directorio_mmap = directorio_mmap
+        self.grafo = construir_grafo()
+        # La misma serie oficial que el dashboard (CAFE_RUTA_OFICIAL)
+        self.grafo.fuente("historia", cargar_serie_oficial(ruta_oficial))
+        self.df_proyeccion = self.grafo["proyeccion"]
+        self.hash_modelo = _clave(self.grafo.firma("historia"), self.grafo.firma("modelo"))
+        self.segmentos = _LRU(MAX_SEGMENTOS_CACHE)
+        self.respuestas = _LRU(MAX_RESPUESTAS_CACHE)
+        self._lock = threading.Lock()
+        # Fijar un segmento como fuente y leer sus nodos debe ser atómico
+        self._lock_grafo = threading.Lock()
+        self._firma = None
+        self.df = None
+        self.hash_dataset = None
+        self.hash_cruce = None
+        self.actualizar()
+
+    def actualizar(self):
+        """Recarga el dataset y el cruce si sus archivos cambiaron desde la última carga."""
+        try:
+            firma = firma_fuente(self.fuente)
+        except FileNotFoundError:
+            firma = ""
+        cruce = cargar_cruce()
+        if (firma, cruce.firma) == self._firma and self.df is not None:
+            return
+        with self._lock:
+            if (firma, cruce.firma) == self._firma and self.df is not None:
+                return
+            cargar = cargar_oleadas if isinstance(self.fuente, list) else cargar_datos
+            self.df = cargar_encuesta_compartida(self.fuente, self.directorio_mmap, cargar)
+            # El hash del binario mapeado con que se abrió este DataFrame
+            self.hash_dataset = self.df.attrs["firma_contenido"]
+            with self._lock_grafo:
+                self.grafo.fuente("cruce", cruce, cruce.firma)
+            self.hash_cruce = cruce.firma
+            self._firma = (firma, cruce.firma)
+            self.segmentos.clear()
+            self.respuestas.clear()
+
+    def etag(self, *consulta):
+        return '"' + _clave(self.hash_dataset, self.hash_modelo, self.hash_cruce, *consulta) + '"'
+
+    def tablas_segmento(self, filtros):
+        """Tablas del reporte para un segmento (cacheadas por filtros)."""
+        clave = _clave(filtros)
+        tablas = self.segmentos.get(clave)
+        if tablas is None:
+            df_segmento = filtrar_segmento(self.df, filtros) if filtros else self.df
+            if df_segmento.empty:
+                tablas = {}
+            else:
+                with self._lock_grafo:
+                    self.grafo.fuente("encuesta_cruda", df_segmento, _clave(self.hash_dataset, filtros))
+                    tablas = tablas_reporte(self.grafo)
+            self.segmentos.put(clave, tablas)
+        return tablas
+
+    def tabla(self, nombre, filtros):
+        if nombre == "proyeccion_nacional":
+            return self.df_proyeccion
+        return self.tablas_segmento(filtros).get(nombre, pd.DataFrame())
+
+    def lote(self, segmentos, tablas):
+        """{tabla: DataFrame} con todas las filas de todos los segmentos (columna SegmentoCliente)."""
+        partes = {tabla: [] for tabla in tablas}
+        for segmento in segmentos:
+            resultado = self.tablas_segmento(segmento.get("filtros", {}))
+            for tabla in tablas:
+                if tabla in resultado:
+                    partes[tabla].append(resultado[tabla].assign(SegmentoCliente=segmento.get("nombre", "")))
+        return {tabla: pd.concat(p, ignore_index=True) if p else pd.DataFrame() for tabla, p in partes.items()}
+
+
+# -----------------------------------------------------------------------------
+# Serialización
+# -----------------------------------------------------------------------------
+def filtros_desde_query(query):
+    """Filtros de `filtrar_segmento` a partir de la query string."""
+    filtros = {}
+    for columna, valores in parse_qs(query).items():
+        if columna == "formato":
+            continue
+        if columna == "Edad":
+            rango = [int(v) for valor in valores for v in valor.split(",")]
+            filtros["Edad"] = [min(rango), max(rango)]
+        else:
+            filtros[columna] = sorted(valores)
+    return filtros
+
+
+def validar_filtros(filtros, columnas):
+    """Mensaje de error si `filtros` no se puede aplicar con `filtrar_segmento`; None si es válido."""
+    if not isinstance(filtros, dict):
+        return "'filtros' debe ser un objeto {columna: valores}"
+    desconocidas = [c for c in filtros if c not in columnas]
+    if desconocidas:
+        return f"Columnas desconocidas: {desconocidas}"
+    edad = filtros.get("Edad")
+    if edad is not None and not (isinstance(edad, list) and len(edad) == 2
+                                 and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in edad)):
+        return "Edad debe ser un rango [min, max]"
+    for columna, valores in filtros.items():
+        if columna != "Edad" and any(isinstance(v, (list, dict)) for v in
+                                     (valores if isinstance(valores, list) else [valores])):
+            return f"Valores inválidos para '{columna}'"
+    return None
+
+
+def validar_lote(pedido, columnas):
+    """Mensaje de error si el cuerpo de POST /lote no es válido; None si lo es."""
+    if not isinstance(pedido, dict) or not isinstance(pedido.get("segmentos"), list):
+        return "Cuerpo esperado: {\"segmentos\": [...], \"tablas\": [...]}"
+    tablas = pedido.get("tablas", list(TABLAS))
+    if not isinstance(tablas, list) or not all(isinstance(t, str) for t in tablas):
+        return "'tablas' debe ser una lista de nombres"
+    desconocidas = [t for t in tablas if t not in TABLAS]
+    if desconocidas:
+        return f"Tablas desconocidas: {desconocidas}"
+    for i, segmento in enumerate(pedido["segmentos"]):
+        if not isinstance(segmento, dict):
+            return f"Segmento {i}: se esperaba un objeto {{\"nombre\", \"filtros\"}}"
+        error = validar_filtros(segmento.get("filtros", {}), columnas)
+        if error:
+            return f"Segmento {i}: {error}"
+    return None
+
+
+def a_json(tablas):
+    """DataFrame o {tabla: DataFrame} -> bytes JSON (registros)."""
+    if isinstance(tablas, pd.DataFrame):
+        return tablas.to_json(orient="records", force_ascii=False).encode("utf-8")
+    cuerpo = ",".join(f'"{nombre}":{df.to_json(orient="records", force_ascii=False)}'
+                      for nombre, df in tablas.items())
+    return ("{" + cuerpo + "}").encode("utf-8")
+
+
+def a_arrow(df):
+    """DataFrame -> bytes en formato Arrow IPC (stream)."""
+    import pyarrow as pa
+
+    df = df.copy()
+    # Arrow requiere columnas de texto homogéneas, igual que el Parquet del batch
+    for columna in df.columns[df.dtypes == object]:
+        df[columna] = df[columna].astype(str)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    salida = io.BytesIO()
+    with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return salida.getvalue()
+
+
+# -----------------------------------------------------------------------------
+# Servidor HTTP
+# -----------------------------------------------------------------------------
+def crear_manejador(contexto):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _formato(self, query):
+            pedido = parse_qs(query).get("formato", [""])[0]
+            if pedido in ("arrow", "json"):
+                return pedido
+            return "arrow" if TIPO_ARROW in self.headers.get("Accept", "") else "json"
+
+        def _responder(self, estado, cuerpo=b"", tipo=TIPO_JSON, etag=None):
+            self.send_response(estado)
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            if cuerpo:
+                self.send_header("Content-Type", tipo)
+                if "gzip" in self.headers.get("Accept-Encoding", "") and len(cuerpo) >= MIN_BYTES_GZIP:
+                    comprimido = contexto.respuestas.get((etag, "gzip")) if etag else None
+                    if comprimido is None:
+                        comprimido = gzip.compress(cuerpo, compresslevel=5)
+                        if etag:
+                            contexto.respuestas.put((etag, "gzip"), comprimido)
+                    cuerpo = comprimido
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Vary", "Accept, Accept-Encoding")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _error(self, estado, mensaje):
+            self._responder(estado, json.dumps({"error": mensaje}, ensure_ascii=False).encode("utf-8"))
+
+        def _servir(self, consulta, calcular, formato):
+            """Responde 304 si el ETag coincide; si no, usa la respuesta cacheada o la calcula."""
+            etag = contexto.etag(*consulta, formato)
+            if etag in [e.strip() for e in self.headers.get("If-None-Match", "").split(",")]:
+                self._responder(304, etag=etag)
+                return
+            cuerpo = contexto.respuestas.get(etag)
+            if cuerpo is None:
+                cuerpo = calcular()
+                contexto.respuestas.put(etag, cuerpo)
+            self._responder(200, cuerpo, TIPO_ARROW if formato == "arrow" else TIPO_JSON, etag)
+
+        def do_GET(self):
+            contexto.actualizar()
+            partes = urlsplit(self.path)
+            nombre = partes.path.strip("/")
+            formato = self._formato(partes.query)
+
+            if nombre == "salud":
+                self._responder(200, json.dumps({
+                    "filas": len(contexto.df), "dataset": contexto.hash_dataset,
+                    "modelo": contexto.hash_modelo, "tablas": list(TABLAS) + ["proyeccion_nacional"],
+                }).encode("utf-8"))
+                return
+            if nombre not in TABLAS and nombre != "proyeccion_nacional":
+                self._error(404, f"Tabla desconocida: '{nombre}'")
+                return
+            try:
+                filtros = filtros_desde_query(partes.query)
+            except ValueError:
+                self._error(400, "Edad debe ser 'min,max'")
+                return
+            error = validar_filtros(filtros, contexto.df.columns)
+            if error:
+                self._error(400, error)
+                return
+
+            def calcular():
+                tabla = contexto.tabla(nombre, filtros)
+                return a_arrow(tabla) if formato == "arrow" else a_json(tabla)
+
+            self._servir((nombre, filtros), calcular, formato)
+
+        def do_POST(self):
+            contexto.actualizar()
+            partes = urlsplit(self.path)
+            if partes.path.strip("/") != "lote":
+                self._error(404, "Solo se admite POST /lote")
+                return
+            try:
+                pedido = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._error(400, "El cuerpo no es JSON válido")
+                return
+            error = validar_lote(pedido, contexto.df.columns)
+            if error:
+                self._error(400, error)
+                return
+            segmentos = pedido["segmentos"]
+            tablas = pedido.get("tablas", list(TABLAS))
+            formato = self._formato(partes.query)
+            if formato == "arrow" and len(tablas) != 1:
+                self._error(400, "Arrow admite una sola tabla por lote")
+                return
+
+            def calcular():
+                resultado = contexto.lote(segmentos, tablas)
+                return a_arrow(resultado[tablas[0]]) if formato == "arrow" else a_json(resultado)
+
+            self._servir(("lote", segmentos, tablas), calcular, formato)
+
+        def log_message(self, *args):
+            pass
+
+    return Manejador
+
+
+def crear_servidor(contexto, host="127.0.0.1", puerto=8765):
+    return ThreadingHTTPServer((host, puerto), crear_manejador(contexto))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API local de agregados del dashboard de consumo de café.")
+    parser.add_argument("--datos", default=RUTA_DATOS, help="CSV de la encuesta")
+    parser.add_argument("--oficial", default=RUTA_OFICIAL,
+                        help="CSV de la serie oficial (Año,Consumo); sin archivo se usa la serie fija")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    contexto = ContextoAPI(args.datos, ruta_oficial=args.oficial)
+    servidor = crear_servidor(contexto, args.host, args.puerto)
+    print(f"✅ API de agregados en http://{args.host}:{servidor.server_address[1]} "
+          f"({len(contexto.df):,} filas, dataset {contexto.hash_dataset})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,23 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import numpy as np # Necesario para la regresión polinomial (modelo predictivo)
+import io
+import math
 import os
 import sys
 import streamlit.components.v1 as components
-from sklearn.metrics import mean_squared_error, r2_score
+from datos import (RUTA_DATOS, RUTA_OFICIAL, RUTAS_OLEADAS, cargar_oleadas, cargar_serie_oficial, datos_de_ejemplo,
+                   firma_archivo, leer_csv, nombre_oleada)
+from datos_compartidos import cargar_encuesta_compartida
+from deduplicacion import IndiceHuellas
+from pronostico_regional import consumo_departamental
+from cruce_regiones import DIRECTORIO_GEODATOS, cargar_cruce
+from figuras import CacheFiguras, firma
+from histogramas_edad import COLUMNAS_SEGMENTO, HistogramasEdad
+from comparacion_oleadas import (VistaOleada, adopcion_por_edad, comparar_edad, comparar_participacion,
+                                 dimensiones_comunes)
+from normalizacion import CATALOGOS, normalizar_encuesta
+from grafo_dashboard import construir_grafo
 
 # -----------------------------------------------------------------------------
 # 1. CONFIGURACIÓN DE PÁGINA
@@ -173,251 +184,115 @@ load_js("script.js")
 # -----------------------------------------------------------------------------
 # 3. CARGA Y MODELADO DE DATOS 
 # -----------------------------------------------------------------------------
-@st.cache_data
-def load_data():
+def estado_archivos(rutas):
+    """Tamaño y mtime de los archivos fuente ('' si falta alguno): clave barata de los cachés."""
+    return "+".join(firma_archivo(r) if os.path.exists(r) else "" for r in rutas)
+
+
+@st.cache_resource(max_entries=2)
+def load_data(estado_fuente):
+    """
+    Encuesta respaldada por un archivo mapeado en memoria (solo lectura) que
+    comparten todos los procesos del servidor. Se usa cache_resource para
+    devolver siempre el mismo objeto: cache_data lo copiaría en cada rerun.
+
+    La clave es el estado de los archivos fuente, así que un CSV editado se
+    vuelve a cargar. Devuelve (df, firma de contenido): el hash del binario
+    mapeado, o del DataFrame para los datos de ejemplo.
+    """
     try:
+        # Varias oleadas (CAFE_RUTAS_OLEADAS): cada una con su muestra completa y
+        # 'Repetido' marcando a los encuestados ya vistos en una oleada anterior
+        if RUTAS_OLEADAS:
+            df = cargar_encuesta_compartida(RUTAS_OLEADAS, cargar=cargar_oleadas)
         # Se asume que 'consumo_cafe_honduras.csv' está disponible
-        df = pd.read_csv("consumo_cafe_honduras.csv")
-        # Generar una columna 'ID' si no existe, solo por si acaso
-        if 'ID' not in df.columns:
-            df['ID'] = range(1, len(df) + 1)
-        return df
+        else:
+            df = cargar_encuesta_compartida(RUTA_DATOS)
     except FileNotFoundError:
         st.error("⚠️ Archivo 'consumo_cafe_honduras.csv' no encontrado. Usando datos de ejemplo para evitar fallas.")
-        
-        # Generación de 1000 filas de datos dummy
-        N = 1000
-        data = {
-            "ID": range(1, N + 1),
-            "Variedad": (["Caturra", "Bourbon", "Pacas", "Lempira", "Typica"] * (N // 5 + 1))[:N],
-            "Preparación": (["Colado", "Espresso", "Cold brew", "Cappuccino", "De olla", "Instantáneo"] * (N // 6 + 1))[:N],
-            "Región": (["Copán", "Comayagua", "Agalta", "El Paraíso", "Montecillos", "Opalaca"] * (N // 6 + 1))[:N],
-            "Contexto": (["Hogar", "Oficina", "Cafetería"] * (N // 3 + 1))[:N],
-            "Frecuencia": (["Diario", "Semanal", "Ocasional"] * (N // 3 + 1))[:N],
-            "Edad": np.random.randint(18, 65, N) 
-        }
-        return pd.DataFrame(data)
-
-# Datos "Oficiales" (Hardcoded para el contexto macro)
-# Estos datos muestran un crecimiento no lineal (acelerado)
-df_oficial = pd.DataFrame({
-    "Año": [2014, 2016, 2018, 2020, 2022, 2024],
-    "Consumo": [20000, 80000, 150000, 250000, 320000, 390000] # Consumo en quintales
-})
-
-df = load_data()
-def enhanced_prediction_model(df_history, years_to_predict=6, max_degree=3):
-    """
-    Modelo mejorado que selecciona automáticamente el mejor grado polinomial
-    usando validación y muestra intervalos de confianza.
-    """
-    X = df_history['Año'].values
-    y = df_history['Consumo'].values
-    
-    # Dividir datos para validación (si hay suficientes puntos)
-    if len(X) >= 6:
-        # Usamos los últimos 2 puntos para validación
-        X_train, X_val = X[:-2], X[-2:]
-        y_train, y_val = y[:-2], y[-2:]
-        use_validation = True
-    else:
-        X_train, y_train = X, y
-        use_validation = False
-    
-    best_degree = 2
-    best_model = None
-    best_score = float('inf')
-    
-    # Probar diferentes grados
-    for degree in range(1, max_degree + 1):
-        try:
-            coefficients = np.polyfit(X_train, y_train, degree)
-            polynomial = np.poly1d(coefficients)
-            
-            if use_validation:
-                y_pred_val = polynomial(X_val)
-                score = mean_squared_error(y_val, y_pred_val)
-            else:
-                y_pred_train = polynomial(X_train)
-                score = mean_squared_error(y_train, y_pred_train)
-            
-            if score < best_score:
-                best_score = score
-                best_degree = degree
-                best_model = polynomial
-        except:
-            continue
-    
-    # Entrenar modelo final con todos los datos usando el mejor grado
-    final_coefficients = np.polyfit(X, y, best_degree)
-    final_model = np.poly1d(final_coefficients)
-    
-    # Generar predicciones
-    last_year = df_history['Año'].max()
-    prediction_years = np.arange(last_year + 1, last_year + years_to_predict + 1)
-    predicted_consumption = final_model(prediction_years)
-    
-    # Calcular intervalos de confianza (simplificado)
-    residuals = y - final_model(X)
-    std_residuals = np.std(residuals)
-    conf_low = predicted_consumption - 1.96 * std_residuals
-    conf_high = predicted_consumption + 1.96 * std_residuals
-    
-    # Crear DataFrame de predicciones
-    df_predictions = pd.DataFrame({
-        'Año': prediction_years,
-        'Consumo': predicted_consumption.round(0).astype(int),
-        'Confianza_Baja': conf_low.round(0).astype(int),
-        'Confianza_Alta': conf_high.round(0).astype(int),
-        'Tipo': 'Proyección'
-    })
-    
-    # Datos históricos con intervalo (igual al valor real)
-    df_history['Tipo'] = 'Histórico'
-    df_history['Confianza_Baja'] = df_history['Consumo']
-    df_history['Confianza_Alta'] = df_history['Consumo']
-    
-    # Combinar
-    df_combined = pd.concat([df_history, df_predictions], ignore_index=True)
-    
-    # Métricas del modelo
-    y_pred_all = final_model(X)
-    r2 = r2_score(y, y_pred_all)
-    mse = mean_squared_error(y, y_pred_all)
-    
-    metrics = {
-        'grado_polinomio': best_degree,
-        'r2_score': r2,
-        'mse': mse,
-        'intervalo_confianza': std_residuals
-    }
-    
-    return df_combined, final_model, metrics
+        df = datos_de_ejemplo(1000)
+    return df, df.attrs.get("firma_contenido") or firma(df)
+
+
+@st.cache_resource(max_entries=2)
+def load_oficial(estado_fuente):
+    """Serie oficial (CAFE_RUTA_OFICIAL o la serie fija) con su firma de contenido."""
+    df_oficial = cargar_serie_oficial(RUTA_OFICIAL)
+    return df_oficial, firma(df_oficial)
+
+
+@st.cache_data(max_entries=2)
+def load_registro_oleadas(estado_fuente):
+    """Duplicados por oleada configurada, leídos del índice en solo lectura una vez por estado de las fuentes."""
+    return IndiceHuellas(solo_lectura=True).registro([nombre_oleada(r) for r in RUTAS_OLEADAS])
+
+estado_encuesta = estado_archivos(RUTAS_OLEADAS or [RUTA_DATOS])
+df, firma_encuesta = load_data(estado_encuesta)
+df_oficial, firma_oficial = load_oficial(estado_archivos([RUTA_OFICIAL]))
 
 # -----------------------------------------------------------------------------
-# 4. MODELO PREDICTIVO (REGRESIÓN POLINOMIAL)
+# 4. GRAFO DE CÁLCULO (ARTEFACTOS DERIVADOS)
 # -----------------------------------------------------------------------------
-def predict_coffee_consumption(df_history, years_to_predict=6, degree=2):
+@st.cache_resource
+def grafo_calculo():
     """
-    Entrena un modelo de regresión polinomial y predice el consumo futuro.
+    Artefactos derivados como nodos con dependencias explícitas (ver
+    grafo_dashboard.py), compartidos entre sesiones. Cada nodo se memoiza por
+    la firma de sus entradas: si cambia la encuesta, la serie IHCAFE o el
+    cruce regional, solo se recalculan los nodos que dependen de esa fuente.
     """
-    X = df_history['Año'].values
-    y = df_history['Consumo'].values
-    
-    # 2. Entrenar el modelo (Ajustar un polinomio de grado 'degree' a los datos)
-    coefficients = np.polyfit(X, y, degree)
-    polynomial = np.poly1d(coefficients)
-    
-    # 3. Generar años futuros para la predicción
-    last_year = df_history['Año'].max()
-    prediction_years = np.arange(last_year + 1, last_year + years_to_predict + 1)
-    
-    # 4. Generar las predicciones
-    predicted_consumption = polynomial(prediction_years)
-    
-    # 5. Crear DataFrame de predicciones
-    df_predictions = pd.DataFrame({
-        'Año': prediction_years,
-        'Consumo': predicted_consumption.round(0).astype(int),
-        'Tipo': 'Proyección'
-    })
-    
-    # 6. Combinar con datos históricos
-    df_history['Tipo'] = 'Histórico'
-    df_combined = pd.concat([df_history, df_predictions], ignore_index=True)
-    
-    return df_combined, polynomial
-
-# Entrenar y obtener el modelo
-df_proyeccion, model_polynomial = predict_coffee_consumption(df_oficial.copy(), years_to_predict=6, degree=2)
-
-# Entrenar el modelo mejorado para obtener las métricas
-df_proyeccion_mejorado, model_mejorado, metrics_modelo = enhanced_prediction_model(df_oficial.copy(), years_to_predict=6, max_degree=3)
-
+    return construir_grafo()
+
+grafo = grafo_calculo()
+cruce = cargar_cruce()
+grafo.fuente("encuesta_cruda", df, firma_encuesta)
+grafo.fuente("historia", df_oficial, firma_oficial)
+grafo.fuente("cruce", cruce, cruce.firma)
+
+df = grafo["encuesta"]
+histogramas_edad = grafo["histogramas"]
+df_proyeccion, leaderboard_modelos, metrics_modelo = grafo["modelo"]
+recomendaciones = grafo["recomendaciones"]
+df_pronostico_regional = grafo["pronostico_regional"]
 # ======================================================================
-# 6. SISTEMA DE RECOMENDACIONES AUTOMÁTICAS
+# 9. CACHÉ DE FIGURAS
 # ======================================================================
-@st.cache_data
-def generar_recomendaciones_automaticas(_df, df_proyeccion, df_oficial, metrics_modelo):
+@st.cache_resource
+def cache_figuras():
     """
-    Genera recomendaciones estratégicas basadas en el análisis de datos.
+    Figuras ya construidas y serializadas, compartidas entre pestañas y
+    sesiones. La clave es una firma de las entradas agregadas y el estilo.
     """
-    recomendaciones = []
-    
-    # 1. ANÁLISIS DE TENDENCIAS DE CONSUMO
-    crecimiento_historico = ((df_oficial['Consumo'].iloc[-1] - df_oficial['Consumo'].iloc[0]) / 
-                            df_oficial['Consumo'].iloc[0]) * 100
-    
-    if crecimiento_historico > 100:
-        recomendaciones.append({
-            'categoria': '📈 TENDENCIA DE MERCADO',
-            'mensaje': f'El consumo interno ha crecido un {crecimiento_historico:.0f}% en {len(df_oficial)} años. Es un mercado en expansión acelerada.',
-            'prioridad': 'ALTA',
-            'accion': 'Aumentar capacidad de producción en un 30% para 2026'
-        })
-    
-    # 2. ANÁLISIS POR EDAD Y MÉTODO
-    if 'Edad' in _df.columns and 'Preparación' in _df.columns:
-        edad_coldbrew = _df[_df['Preparación'] == 'Cold brew']['Edad'].mean()
-        if edad_coldbrew < 35:
-            recomendaciones.append({
-                'categoria': '👥 DEMOGRAFÍA',
-                'mensaje': f'El Cold Brew es popular entre jóvenes ({edad_coldbrew:.0f} años promedio).',
-                'prioridad': 'MEDIA',
-                'accion': 'Lanzar campaña digital en redes sociales para menores de 35 años'
-            })
-    
-    # 3. ANÁLISIS POR FRECUENCIA
-    if 'Frecuencia' in _df.columns:
-        frecuencia_diaria = (_df['Frecuencia'] == 'Diario').mean() * 100
-        if frecuencia_diaria < 50:
-            recomendaciones.append({
-                'categoria': '🔄 FRECUENCIA',
-                'mensaje': f'Solo el {frecuencia_diaria:.1f}% consume café diariamente.',
-                'prioridad': 'ALTA',
-                'accion': 'Crear programa de fidelización con descuentos progresivos'
-            })
-    
-    # 4. ANÁLISIS POR REGIÓN
-    if 'Región' in _df.columns:
-        region_counts = _df['Región'].value_counts()
-        region_top = region_counts.index[0]
-        region_menos = region_counts.index[-1]
-        
-        if region_counts.iloc[0] > region_counts.iloc[-1] * 3:
-            recomendaciones.append({
-                'categoria': '🗺️ DISTRIBUCIÓN GEOGRÁFICA',
-                'mensaje': f'{region_top} domina el mercado vs {region_menos}.',
-                'prioridad': 'MEDIA',
-                'accion': f'Explorar oportunidades en {region_menos} con pilotos de cafeterías'
-            })
-    
-    # 5. PROYECCIÓN FUTURA
-    consumo_2030 = df_proyeccion[df_proyeccion['Año'] == 2030]['Consumo'].iloc[0]
-    consumo_2024 = df_oficial[df_oficial['Año'] == 2024]['Consumo'].iloc[0]
-    crecimiento_proyectado = ((consumo_2030 - consumo_2024) / consumo_2024) * 100
-    
-    if crecimiento_proyectado > 50:
-        recomendaciones.append({
-            'categoria': '🔮 PROYECCIÓN',
-            'mensaje': f'Se proyecta crecimiento del {crecimiento_proyectado:.0f}% para 2030.',
-            'prioridad': 'ALTA',
-            'accion': 'Planificar expansión de infraestructura para 2028'
-        })
-    
-    # 6. CALIDAD DEL MODELO
-    if metrics_modelo['r2_score'] > 0.95:
-        recomendaciones.append({
-            'categoria': '🎯 PRECISIÓN DEL MODELO',
-            'mensaje': f'Modelo predictivo con R²={metrics_modelo["r2_score"]:.3f} (Excelente ajuste).',
-            'prioridad': 'BAJA',
-            'accion': 'Las proyecciones son confiables para planificación estratégica'
-        })
-    
-    return recomendaciones
+    return CacheFiguras()
+
+def figura(nombre, entradas, construir):
+    """Figura cacheada: `construir()` solo corre si cambian las entradas."""
+    return cache_figuras().obtener(nombre, entradas, construir)
+
+def figura_cajas(estadisticas, colores, titulo=None, eje_x=None):
+    """
+    Boxplot a partir de estadísticas ya calculadas (q1, mediana, q3,
+    límites y media por grupo), sin pasar las edades individuales.
+    """
+    fig = go.Figure()
+    for i, (grupo, fila) in enumerate(estadisticas.iterrows()):
+        fig.add_trace(go.Box(
+            name=str(grupo), x=[str(grupo)], q1=[fila['q1']], median=[fila['mediana']], q3=[fila['q3']],
+            lowerfence=[fila['limite_inferior']], upperfence=[fila['limite_superior']], mean=[fila['media']],
+            marker_color=colores[i % len(colores)]
+        ))
+    fig.update_layout(title=titulo, xaxis_title=eje_x, yaxis_title="Edad")
+    return fig
+
+def figura_tendencia(df_oficial, titulo, color, fondo, grid, height=None):
+    """Serie histórica IHCAFE (se usa en Panorama y en Storytelling)."""
+    def construir():
+        fig = px.area(df_oficial, x="Año", y="Consumo", title=titulo,
+                      markers=True, color_discrete_sequence=[color], height=height)
+        fig.update_layout(plot_bgcolor=fondo, yaxis_gridcolor=grid)
+        return fig
+    return figura("tendencia", (df_oficial, titulo, color, fondo, grid, height), construir)
 
-# Generar recomendaciones
-recomendaciones = generar_recomendaciones_automaticas(df, df_proyeccion, df_oficial, metrics_modelo)
 # -----------------------------------------------------------------------------
 # 5. ENCABEZADO (HERO SECTION)
 # -----------------------------------------------------------------------------
@@ -435,39 +310,32 @@ st.markdown("---")
 # -----------------------------------------------------------------------------
 
 # --- KPI ROW (FILA DE MÉTRICAS) ---
-if not df.empty:
-    total_encuestados = len(df)
-    region_top = df['Región'].mode()[0] if 'Región' in df.columns else "N/A"
-    metodo_top = df['Preparación'].mode()[0] if 'Preparación' in df.columns else "N/A"
-    edad_promedio = int(df['Edad'].mean()) if 'Edad' in df.columns else 0
-else:
-    total_encuestados = 0
-    region_top = "-"
-    metodo_top = "-"
-    edad_promedio = 0
-
-# Obtener la predicción para 2030 y el crecimiento total proyectado
-consumo_2030 = df_proyeccion[df_proyeccion['Año'] == 2030]['Consumo'].iloc[0] if not df_proyeccion.empty and 2030 in df_proyeccion['Año'].values else 0
-consumo_2024 = df_oficial[df_oficial['Año'] == 2024]['Consumo'].iloc[0] if not df_oficial.empty and 2024 in df_oficial['Año'].values else 1 # Evitar división por cero
-crecimiento_proyectado = ((consumo_2030 - consumo_2024) / consumo_2024) * 100 if consumo_2024 > 0 else 0
+kpis = grafo["kpis"]
 
 kpi1, kpi2, kpi3, kpi_pred = st.columns(4)
-kpi1.metric("Muestra Analizada", f"{total_encuestados}", "Personas encuestadas")
-kpi2.metric("Región Dominante", region_top, "Mayor participación")
-kpi3.metric("Método Favorito", metodo_top, "Tendencia #1")
-kpi_pred.metric("Consumo Proyectado (2030)", f"{consumo_2030:,.0f} Quintales", f"Crecimiento del {crecimiento_proyectado:,.0f}% vs. 2024")
+if RUTAS_OLEADAS:
+    registro_oleadas = load_registro_oleadas(estado_encuesta)
+    duplicados = int((registro_oleadas['duplicados_internos'] + registro_oleadas['duplicados_previos']).sum())
+    kpi1.metric("Muestra Analizada", f"{kpis.total_encuestados}",
+                f"{duplicados:,} duplicados descartados ({len(registro_oleadas)} oleadas)", delta_color="off")
+else:
+    kpi1.metric("Muestra Analizada", f"{kpis.total_encuestados}", "Personas encuestadas")
+kpi2.metric("Región Dominante", kpis.region_top, "Mayor participación")
+kpi3.metric("Método Favorito", kpis.metodo_top, "Tendencia #1")
+kpi_pred.metric("Consumo Proyectado (2030)", f"{kpis.consumo_2030:,.0f} Quintales", f"Crecimiento del {kpis.crecimiento_proyectado:,.0f}% vs. 2024")
 
 st.markdown("###") # Espacio
 
 # --- PESTAÑAS DE NAVEGACIÓN ---
-tab1, tab_story, tab_strategy, tab_predict, tab_roadmap, tab2, tab3 = st.tabs([
+tab1, tab_story, tab_strategy, tab_predict, tab_roadmap, tab2, tab3, tab_oleadas = st.tabs([
     "📊 Panorama General", 
     "📖 El Viaje del Consumidor", 
     "🎯 Estrategia y Segmentación",
     "🔮 Proyección de Consumo",
     "💡 Roadmap de Decisión", # NUEVA PESTAÑA DE ALTO VALOR
     "🧬 ADN del Consumidor", 
-    "🗺️ Mapa & Datos"
+    "🗺️ Mapa & Datos",
+    "📈 Comparar Oleadas"
 ])
 
 # -----------------------------------------------------------------------------
@@ -533,12 +401,12 @@ with tab_roadmap:
         st.markdown("<h4>Estrategia de Inversión: Escalar la Capacidad</h4>", unsafe_allow_html=True)
         st.markdown(f"Basada en la **Proyección a 2030**:")
         
-        st.markdown(f"**Objetivo:** Asegurar una capacidad de producción y procesamiento para satisfacer una demanda de **{consumo_2030:,.0f} quintales**.")
+        st.markdown(f"**Objetivo:** Asegurar una capacidad de producción y procesamiento para satisfacer una demanda de **{kpis.consumo_2030:,.0f} quintales**.")
         
         # FIX: Se usa una sola llamada a st.markdown para la lista completa
         list_html_inv = f"""
 <ul>
-    <li>Expansión de Tostado: Planificar la inversión en 3 nuevas plantas de tostado de alta capacidad para el año 2028, anticipando la demanda del 2030. La capacidad actual no es sostenible con el crecimiento del {crecimiento_proyectado:,.0f}%.</li>
+    <li>Expansión de Tostado: Planificar la inversión en 3 nuevas plantas de tostado de alta capacidad para el año 2028, anticipando la demanda del 2030. La capacidad actual no es sostenible con el crecimiento del {kpis.crecimiento_proyectado:,.0f}%.</li>
     <li>Gestión de Inventario: Mantener reservas de café verde premium para mitigar la volatilidad de precios en el mercado de exportación, asegurando que la demanda interna no afecte la calidad del producto.</li>
     <li>Talento y Capacitación: Lanzar un programa de certificación de baristas para profesionalizar el servicio en el canal HORECA (Hoteles, Restaurantes y Cafeterías), elevando la experiencia de consumo en los centros de crecimiento.</li>
 </ul>
@@ -571,17 +439,18 @@ with tab1:
     col_left, col_right = st.columns([2, 1])
     
     with col_left:
-        fig_trend = px.area(df_oficial, x="Año", y="Consumo", 
-                            title="Evolución Histórica en Quintales (Datos IHCAFE)",
-                            markers=True, color_discrete_sequence=['#8B4513'])
-        fig_trend.update_layout(plot_bgcolor="rgba(0,0,0,0)", yaxis_gridcolor='#e0e0e0')
+        fig_trend = figura_tendencia(df_oficial, "Evolución Histórica en Quintales (Datos IHCAFE)",
+                                     '#8B4513', "rgba(0,0,0,0)", '#e0e0e0')
         st.plotly_chart(fig_trend, use_container_width=True)
         
     with col_right:
         if not df.empty and 'Contexto' in df.columns:
-            fig_pie = px.pie(df, names='Contexto', hole=0.6, 
-                             color_discrete_sequence=COLOR_PALETTE,
-                             title="Distribución por Contexto de Consumo")
+            # Se grafican los conteos, no una etiqueta por encuestado
+            conteo_contexto = df['Contexto'].value_counts()
+            fig_pie = figura("pie_contexto", (conteo_contexto,), lambda: px.pie(
+                names=conteo_contexto.index, values=conteo_contexto.values, hole=0.6,
+                color_discrete_sequence=COLOR_PALETTE,
+                title="Distribución por Contexto de Consumo"))
             st.plotly_chart(fig_pie, use_container_width=True)
         else:
             st.info("No hay datos de contexto disponibles.")
@@ -611,11 +480,8 @@ with tab_story:
     """)
 
     # Gráfico de Trend
-    fig_trend = px.area(df_oficial, x="Año", y="Consumo", 
-                        title="📈 Crecimiento del Consumo Interno: +1850% en 10 años",
-                        markers=True, color_discrete_sequence=['#A0522D'],
-                        height=350)
-    fig_trend.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
+    fig_trend = figura_tendencia(df_oficial, "📈 Crecimiento del Consumo Interno: +1850% en 10 años",
+                                 '#A0522D', "#3C2F2F", '#554444', height=350)
     st.plotly_chart(fig_trend, use_container_width=True)
     
     st.markdown("""
@@ -642,17 +508,22 @@ with tab_story:
         
         with col_home:
             # Gráfico de barras para contexto
-            fig_context = px.bar(conteo_contexto, y='Contexto', x='Frecuencia', orientation='h',
-                                 color='Frecuencia', color_continuous_scale='Agsunset',
-                                 title="Distribución por Contexto")
-            fig_context.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
+            def construir_contexto():
+                fig = px.bar(conteo_contexto, y='Contexto', x='Frecuencia', orientation='h',
+                             color='Frecuencia', color_continuous_scale='Agsunset',
+                             title="Distribución por Contexto")
+                fig.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
+                return fig
+            fig_context = figura("barras_contexto", (conteo_contexto,), construir_contexto)
             st.plotly_chart(fig_context, use_container_width=True)
             
         with col_office:
             # Gráfico de Pastel para preparación
-            fig_prep = px.pie(df, names='Preparación', hole=0.5, 
-                             color_discrete_sequence=['#D2691E', '#CD853F', '#F4A460', '#DEB887', '#556B2F'],
-                             title="Métodos de Preparación Más Populares")
+            conteo_preparacion = df['Preparación'].value_counts()
+            fig_prep = figura("pie_preparacion", (conteo_preparacion,), lambda: px.pie(
+                names=conteo_preparacion.index, values=conteo_preparacion.values, hole=0.5,
+                color_discrete_sequence=['#D2691E', '#CD853F', '#F4A460', '#DEB887', '#556B2F'],
+                title="Métodos de Preparación Más Populares"))
             st.plotly_chart(fig_prep, use_container_width=True)
             
     st.markdown("""
@@ -669,17 +540,21 @@ with tab_story:
     if not df.empty and all(col in df.columns for col in ['Variedad', 'Edad']):
         
         top_varieties = df['Variedad'].value_counts().nlargest(5).index
-        df_top_varieties = df[df['Variedad'].isin(top_varieties)]
         
-        # Gráfico Boxplot para edad vs. variedad
-        fig_age_variety = px.box(df_top_varieties, x="Variedad", y="Edad", color="Variedad",
-                                 color_discrete_sequence=['#4B3621', '#A0522D', '#D2691E', '#CD853F', '#F4A460'],
-                                 title="Edad Promedio por Variedad de Café Consumida")
-        fig_age_variety.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
+        # Gráfico Boxplot para edad vs. variedad (desde los histogramas de edad)
+        stats_variedad = histogramas_edad.estadisticas({'Variedad': list(top_varieties)}, por='Variedad')
+        stats_variedad = stats_variedad.reindex([v for v in top_varieties if v in stats_variedad.index])
+
+        def construir_edad_variedad():
+            fig = figura_cajas(stats_variedad, ['#4B3621', '#A0522D', '#D2691E', '#CD853F', '#F4A460'],
+                               "Edad Promedio por Variedad de Café Consumida", "Variedad")
+            fig.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
+            return fig
+        fig_age_variety = figura("edad_variedad", (stats_variedad,), construir_edad_variedad)
         st.plotly_chart(fig_age_variety, use_container_width=True)
 
         st.markdown(f"""
-        **La Demografía:** La edad promedio del consumidor se mantiene en los **{edad_promedio} años**, 
+        **La Demografía:** La edad promedio del consumidor se mantiene en los **{kpis.edad_promedio} años**, 
         pero el consumo de variedades más finas como **Bourbon** y **Caturra** está concentrado 
         en rangos de edad más jóvenes.
         
@@ -703,30 +578,29 @@ with tab_strategy:
     if not df.empty and all(col in df.columns for col in ['Variedad', 'Frecuencia', 'Edad']):
         
         # --- 1. MATRIZ DE OPORTUNIDAD (HEATMAP) ---
-        df_crosstab = pd.crosstab(df['Frecuencia'], df['Variedad'])
+        # Heatmap y scatter salen del índice de segmentos (sin re-escanear filas)
         frecuencia_order = ['Diario', 'Semanal', 'Ocasional']
-        df_crosstab = df_crosstab.reindex(frecuencia_order, axis=0).fillna(0)
-        
-        z = df_crosstab.values
-        x = df_crosstab.columns
-        y = df_crosstab.index
+        df_crosstab = grafo["crosstab"]
         
-        fig_heatmap = go.Figure(data=go.Heatmap(
-                z=z,
-                x=x,
-                y=y,
-                colorscale=COLOR_CONTINUOUS, 
-                text=[[str(val) for val in row] for row in z],
-                texttemplate="%{text}",
-                hovertemplate="Variedad: %{x}<br>Frecuencia: %{y}<br>Conteo: %{z}<extra></extra>"
-            ))
-        
-        fig_heatmap.update_layout(
-            title='Matriz de Oportunidad: Frecuencia vs. Variedad',
-            xaxis_title="Variedad de Café",
-            yaxis_title="Frecuencia de Consumo",
-            plot_bgcolor="#2C201C"
-        )
+        def construir_heatmap():
+            z = df_crosstab.values
+            fig = go.Figure(data=go.Heatmap(
+                    z=z,
+                    x=df_crosstab.columns,
+                    y=df_crosstab.index,
+                    colorscale=COLOR_CONTINUOUS, 
+                    text=[[str(val) for val in row] for row in z],
+                    texttemplate="%{text}",
+                    hovertemplate="Variedad: %{x}<br>Frecuencia: %{y}<br>Conteo: %{z}<extra></extra>"
+                ))
+            fig.update_layout(
+                title='Matriz de Oportunidad: Frecuencia vs. Variedad',
+                xaxis_title="Variedad de Café",
+                yaxis_title="Frecuencia de Consumo",
+                plot_bgcolor="#2C201C"
+            )
+            return fig
+        fig_heatmap = figura("heatmap", (df_crosstab,), construir_heatmap)
         st.plotly_chart(fig_heatmap, use_container_width=True)
         
         st.markdown('<div class="insight-box">', unsafe_allow_html=True)
@@ -742,22 +616,19 @@ with tab_strategy:
         # --- 2. SEGMENTACIÓN POR VALOR (Edad vs. Frecuencia) ---
         st.subheader("Segmento de Mayor Potencial de Gasto (RFM Simplificado)")
         
-        gasto_mapping = {'Diario': 3, 'Semanal': 2, 'Ocasional': 1}
-        df['GastoPotencial'] = df['Frecuencia'].map(gasto_mapping)
-        
-        df_scatter = df.groupby(['Edad', 'Frecuencia'], as_index=False).agg(
-            Conteo=('ID', 'size'),
-            DiversidadMetodo=('Preparación', 'nunique')
-        )
-
-        fig_scatter = px.scatter(df_scatter, x='Edad', y='Frecuencia', size='Conteo', 
-                                 color='DiversidadMetodo', 
-                                 color_continuous_scale='Inferno',
-                                 log_x=False, size_max=40,
-                                 category_orders={"Frecuencia": frecuencia_order},
-                                 title="Relación Edad, Frecuencia y Diversidad de Métodos")
-        
-        fig_scatter.update_layout(plot_bgcolor="#2C201C")
+        # Conteo (size) y DiversidadMetodo (nunique vía popcount) desde el índice
+        df_scatter = grafo["scatter"]
+
+        def construir_scatter():
+            fig = px.scatter(df_scatter, x='Edad', y='Frecuencia', size='Conteo', 
+                             color='DiversidadMetodo', 
+                             color_continuous_scale='Inferno',
+                             log_x=False, size_max=40,
+                             category_orders={"Frecuencia": frecuencia_order},
+                             title="Relación Edad, Frecuencia y Diversidad de Métodos")
+            fig.update_layout(plot_bgcolor="#2C201C")
+            return fig
+        fig_scatter = figura("scatter", (df_scatter, frecuencia_order), construir_scatter)
         st.plotly_chart(fig_scatter, use_container_width=True)
         
         st.markdown('<div class="insight-box">', unsafe_allow_html=True)
@@ -769,15 +640,24 @@ with tab_strategy:
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("---")
     st.subheader("🤖 Recomendaciones Automáticas del Sistema")
-    for rec in recomendaciones:
-        with st.expander(f"{rec['categoria']} - Prioridad {rec['prioridad']}"):
-            st.write(f"**📌 Insight:** {rec['mensaje']}")
-            st.write(f"**🎯 Acción Recomendada:** {rec['accion']}")
+    # Solo se renderiza el texto de la página visible
+    orden_rec = recomendaciones.orden_por_prioridad()
+    tamaño_pagina = 10
+    if recomendaciones.num_paginas(tamaño_pagina) > 1:
+        pagina_rec = st.number_input("Página de recomendaciones:", min_value=1,
+                                     max_value=recomendaciones.num_paginas(tamaño_pagina), value=1) - 1
+    else:
+        pagina_rec = 0
+    for i in recomendaciones.pagina(pagina_rec, tamaño_pagina, orden_rec):
+        prioridad = recomendaciones.prioridad_texto(i)
+        with st.expander(f"{recomendaciones.categoria(i)} - Prioridad {prioridad} ({recomendaciones.segmento_texto(i)})"):
+            st.write(f"**📌 Insight:** {recomendaciones.mensaje(i)}")
+            st.write(f"**🎯 Acción Recomendada:** {recomendaciones.accion(i)}")
             
             # Color según prioridad
-            if rec['prioridad'] == 'ALTA':
+            if prioridad == 'ALTA':
                 st.error("⏰ **Acción Inmediata Requerida**")
-            elif rec['prioridad'] == 'MEDIA':
+            elif prioridad == 'MEDIA':
                 st.warning("📅 **Planificar para los próximos 6 meses**")
             else:
                 st.info("👁️ **Monitorear y evaluar**")
@@ -789,42 +669,51 @@ with tab_strategy:
 # Pestaña 4 (Predicción)
 with tab_predict:
     st.header("🔮 Proyección del Consumo Interno de Café en Honduras (Hasta 2030)")
-    st.markdown("""
-    Aplicamos un **Modelo de Regresión Polinomial de Grado 2** a los datos históricos 
-    (2014-2024) para proyectar el crecimiento acelerado del mercado hasta el año 2030.
-    Este modelo se basa en la tendencia no lineal observada en la última década.
+    st.markdown(f"""
+    Comparamos varios modelos (polinomios, log-lineal y logística con saturación) con 
+    **backtesting de origen móvil** sobre los datos históricos (2014-2024) y proyectamos 
+    hasta 2030 con el de menor error fuera de muestra: **{metrics_modelo['modelo']}**.
     """)
+    if math.isnan(metrics_modelo['rmse_backtest']):
+        st.info("La serie oficial tiene muy pocos años para el backtesting: se proyecta con el modelo más "
+                "simple y sin intervalo de confianza.")
+    with st.expander("🏁 Leaderboard de modelos (backtesting)"):
+        st.dataframe(leaderboard_modelos[["Rango", "Modelo", "RMSE", "MAPE", "Predicciones"]],
+                     hide_index=True)
     st.markdown("---")
 
     # Gráfico de Predicción
     if not df_proyeccion.empty:
         
-        # El gráfico combina el histórico (línea sólida) y la proyección (línea punteada/diferente color)
-        fig_pred = px.scatter(df_proyeccion, x='Año', y='Consumo', 
-                              color='Tipo', 
-                              color_discrete_map={'Histórico': '#CD853F', 'Proyección': '#A0522D'},
-                              title='Consumo Histórico vs. Proyección (Quintales de Café)',
-                              labels={'Consumo': 'Consumo Estimado (Quintales)', 'Año': 'Año', 'Tipo': 'Tipo de Dato'})
-        
-        # Añadir la línea de tendencia completa (Histórico + Proyección)
-        fig_pred.add_trace(go.Line(
-            x=df_proyeccion['Año'],
-            y=df_proyeccion['Consumo'],
-            mode='lines',
-            line=dict(color='#A0522D', width=3),
-            name='Línea de Tendencia'
-        ))
-        
-        # Estilizar el gráfico
-        fig_pred.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
-        fig_pred.update_traces(marker=dict(size=10))
+        def construir_prediccion():
+            # El gráfico combina el histórico (línea sólida) y la proyección (línea punteada/diferente color)
+            fig = px.scatter(df_proyeccion, x='Año', y='Consumo', 
+                             color='Tipo', 
+                             color_discrete_map={'Histórico': '#CD853F', 'Proyección': '#A0522D'},
+                             title='Consumo Histórico vs. Proyección (Quintales de Café)',
+                             labels={'Consumo': 'Consumo Estimado (Quintales)', 'Año': 'Año', 'Tipo': 'Tipo de Dato'})
+            
+            # Añadir la línea de tendencia completa (Histórico + Proyección)
+            fig.add_trace(go.Line(
+                x=df_proyeccion['Año'],
+                y=df_proyeccion['Consumo'],
+                mode='lines',
+                line=dict(color='#A0522D', width=3),
+                name='Línea de Tendencia'
+            ))
+            
+            # Estilizar el gráfico
+            fig.update_layout(plot_bgcolor="#3C2F2F", yaxis_gridcolor='#554444')
+            fig.update_traces(marker=dict(size=10))
+            return fig
+        fig_pred = figura("prediccion", (df_proyeccion,), construir_prediccion)
         
         st.plotly_chart(fig_pred, use_container_width=True)
 
         st.markdown('<div class="prediction-box">', unsafe_allow_html=True)
         st.markdown(f"**PREDICCIÓN CLAVE 2030:**")
-        st.markdown(f"Se proyecta que el consumo interno alcanzará los **{consumo_2030:,.0f} quintales**.")
-        st.markdown(f"Esto representa una oportunidad de mercado de **+{crecimiento_proyectado:,.0f}%** en los próximos 6 años.")
+        st.markdown(f"Se proyecta que el consumo interno alcanzará los **{kpis.consumo_2030:,.0f} quintales**.")
+        st.markdown(f"Esto representa una oportunidad de mercado de **+{kpis.crecimiento_proyectado:,.0f}%** en los próximos 6 años.")
         st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown("---")
@@ -866,11 +755,13 @@ with tab2:
             regiones_disponibles = df['Región'].unique() if 'Región' in df.columns else []
             filtro_region = st.multiselect("Filtrar Región:", regiones_disponibles, default=regiones_disponibles)
         with c_filt2:
-            min_age = int(df['Edad'].min()) if 'Edad' in df.columns else 18
-            max_age = int(df['Edad'].max()) if 'Edad' in df.columns else 90
+            stats_edad = histogramas_edad.estadisticas(omitir_vacios=False).iloc[0]
+            min_age = int(stats_edad['minimo']) if stats_edad['n'] else 18
+            max_age = int(stats_edad['maximo']) if stats_edad['n'] else 90
             rango_edad = st.slider("Rango de Edad:", 18, 90, (min_age, max_age))
         
-        # Filtrado de datos
+        # Filtrado de datos (las figuras solo se reconstruyen si cambian los filtros)
+        filtros_adn = (grafo.firma("encuesta"), sorted(map(str, filtro_region)), tuple(rango_edad))
         df_filtered = df[
             (df['Región'].isin(filtro_region)) & 
             (df['Edad'] >= rango_edad[0]) & 
@@ -883,9 +774,9 @@ with tab2:
         with col_sun:
             st.markdown("**Patrones de Consumo: Región ➡ Variedad ➡ Preparación**")
             if not df_filtered.empty and all(col in df.columns for col in ['Región', 'Variedad', 'Preparación']):
-                fig_sun = px.sunburst(df_filtered, path=['Región', 'Variedad', 'Preparación'], 
-                                        color_discrete_sequence=COLOR_PALETTE,
-                                        height=500)
+                fig_sun = figura("sunburst", filtros_adn, lambda: px.sunburst(
+                    df_filtered, path=['Región', 'Variedad', 'Preparación'],
+                    color_discrete_sequence=COLOR_PALETTE, height=500))
                 st.plotly_chart(fig_sun, use_container_width=True)
             else:
                 st.warning("No hay datos suficientes para generar el gráfico radial.")
@@ -893,8 +784,10 @@ with tab2:
         with col_bar:
             st.markdown("**Frecuencia por Rango de Edad**")
             if not df_filtered.empty and all(col in df.columns for col in ['Frecuencia', 'Edad']):
-                fig_box = px.box(df_filtered, x="Frecuencia", y="Edad", color="Frecuencia",
-                                    color_discrete_sequence=COLOR_PALETTE)
+                stats_frecuencia = histogramas_edad.estadisticas(
+                    {'Región': list(filtro_region)}, por='Frecuencia', edad=rango_edad)
+                fig_box = figura("box_frecuencia", (stats_frecuencia,), lambda: figura_cajas(
+                    stats_frecuencia, COLOR_PALETTE, eje_x="Frecuencia"))
                 st.plotly_chart(fig_box, use_container_width=True)
             else:
                 st.warning("No hay datos para el gráfico de caja.")
@@ -909,86 +802,84 @@ with tab3:
     # 1. Cargar GEOJSON oficial desde GADM (18 departamentos)
     # ============================================================
     import requests
-    import json
 
-    url_geo = "https://geodata.ucdavis.edu/gadm/gadm4.1/json/gadm41_HND_1.json"
-    honduras_geo = requests.get(url_geo).json()
+    @st.cache_resource
+    def cargar_geojson(url):
+        """GeoJSON de departamentos: se descarga una vez por proceso."""
+        return requests.get(url).json()
+
+    # Configurable para pruebas de carga sin red (ver prueba_carga.py)
+    url_geo = os.environ.get("CAFE_URL_GEOJSON", "https://geodata.ucdavis.edu/gadm/gadm4.1/json/gadm41_HND_1.json")
 
     # ============================================================
     # 2. Preparar DATA del mapa desde tu dataset + datos realistas
     # ============================================================
 
-    # Agrupar datos reales del dataset
-    departamentos_hn = [
-        "Atlántida", "Colón", "Comayagua", "Copán", "Cortés", "Choluteca",
-        "El Paraíso", "Francisco Morazán", "Gracias a Dios", "Intibucá",
-        "Islas de la Bahía", "La Paz", "Lempira", "Ocotepeque", "Olancho",
-        "Santa Bárbara", "Valle", "Yoro"
-    ]
-
-    # Datos reales del dataset
-    df_real = df.groupby("Región").agg(
-        EdadPromedio=("Edad", "mean"),
-        Conteo=("ID", "count"),
-        CafeFavorito=("Variedad", lambda x: x.mode()[0]),
-        PreparacionFavorita=("Preparación", lambda x: x.mode()[0])
-    ).reset_index()
-
-    # Crear base completa
-    df_mapa = pd.DataFrame({"Región": departamentos_hn})
-
-    # Merge: departamentos con y sin datos reales
-    df_mapa = df_mapa.merge(df_real, on="Región", how="left")
-
-    # Completar datos faltantes (ficticios realistas)
-    df_mapa["Conteo"] = df_mapa["Conteo"].fillna(0).astype(int)
-    df_mapa["EdadPromedio"] = df_mapa["EdadPromedio"].fillna(32)
-
-    df_mapa["CafeFavorito"] = df_mapa["CafeFavorito"].fillna("Café Tradicional")
-    df_mapa["PreparacionFavorita"] = df_mapa["PreparacionFavorita"].fillna("Colado")
-
-    # Asignar consumo ficticio (ya lo tenías)
-    consumo_ficticio = {
-        "Yoro": 18000, "Atlántida": 17000, "Colón": 15000, "Cortés": 30000,
-        "Copán": 32000, "Ocotepeque": 14000, "Intibucá": 16000, "Lempira": 20000,
-        "Santa Bárbara": 24000, "Comayagua": 28000, "Francisco Morazán": 33000,
-        "El Paraíso": 27000, "Olancho": 22000, "La Paz": 15000, "Valle": 11000,
-        "Choluteca": 12000, "Gracias a Dios": 8000, "Islas de la Bahía": 5000
-    }
-
-    df_mapa["Consumo"] = df_mapa["Región"].map(consumo_ficticio)
+    # Perfil de la encuesta proyectado de regiones cafetaleras a departamentos
+    # (copia: la columna Consumo depende del año elegido)
+    df_mapa = grafo["tabla_mapa"].copy()
 
-    # ============================================================
-    # 3. Construcción del MAPA interactivo
-    # ============================================================
-    
-    fig_map = px.choropleth_mapbox(
-        df_mapa,
-        geojson=honduras_geo,
-        locations="Región",
-        featureidkey="properties.NAME_1",
-        color="Consumo",
-        color_continuous_scale="YlOrBr",
-        mapbox_style="carto-positron",
-        zoom=6.2,
-        center={"lat": 14.8, "lon": -86.2},
-        opacity=0.75,
-        hover_name="Región",
-        hover_data={
-            "Consumo": True,
-            "EdadPromedio": True,
-            "CafeFavorito": True,
-            "PreparacionFavorita": True,
-            "Conteo": True
-        }
-    )
+    # Consumo proyectado por departamento (pronóstico regional cacheado).
+    # El slider solo selecciona el año a colorear, nunca vuelve a ajustar.
+    años_mapa = sorted(df_pronostico_regional["Año"].unique())
+    if not años_mapa:
+        # Encuesta vacía o toda en cuarentena: no hay series departamentales
+        st.info("No hay pronóstico departamental: la encuesta no tiene encuestados válidos con región.")
+    else:
+        año_mapa = st.select_slider("Año a visualizar:", options=años_mapa, value=max(años_mapa))
+        if cruce.aproximado:
+            st.warning(f"⚠️ Valores por departamento aproximados: no hay polígonos de regiones IHCAFE en "
+                       f"'{DIRECTORIO_GEODATOS}/', así que cada región cafetalera se reparte en partes "
+                       "iguales entre los departamentos que abarca.")
+        df_mapa["Consumo"] = df_mapa["Región"].map(consumo_departamental(df_pronostico_regional, año_mapa))
+
+        # ============================================================
+        # 3. Construcción del MAPA interactivo
+        # ============================================================
     
-    fig_map.update_layout(
-        margin={"r":0, "t":20, "l":0, "b":0},
-        height=650,
-        title="Consumo Estimado y Perfil del Consumidor por Departamento"
-    )
-    st.plotly_chart(fig_map, use_container_width=True)
+        def construir_mapa():
+            fig = px.choropleth_mapbox(
+                df_mapa,
+                geojson=cargar_geojson(url_geo),
+                locations="Región",
+                featureidkey="properties.NAME_1",
+                color="Consumo",
+                color_continuous_scale="YlOrBr",
+                mapbox_style="carto-positron",
+                zoom=6.2,
+                center={"lat": 14.8, "lon": -86.2},
+                opacity=0.75,
+                hover_name="Región",
+                hover_data={
+                    "Consumo": True,
+                    "EdadPromedio": True,
+                    "CafeFavorito": True,
+                    "PreparacionFavorita": True,
+                    "Conteo": True
+                }
+            )
+            fig.update_layout(
+                margin={"r":0, "t":20, "l":0, "b":0},
+                height=650,
+                title=f"Consumo Proyectado ({año_mapa}) y Perfil del Consumidor por Departamento"
+                      + (" (aproximado)" if cruce.aproximado else "")
+            )
+            return fig
+
+        # El GeoJSON se identifica por su URL: no se vuelve a hashear en cada rerun
+        fig_map = figura("mapa", (url_geo, df_mapa, año_mapa), construir_mapa)
+        st.plotly_chart(fig_map, use_container_width=True)
+
+        pesos = "aproximados: iguales por departamento" if cruce.aproximado else f"por {cruce.origen}"
+        with st.expander(f"🧭 Cruce Región cafetalera → Departamento (pesos {pesos})"):
+            st.dataframe(cruce.tabla(), height=300, hide_index=True)
+
+        with st.expander(f"📋 Pronóstico por Departamento, Variedad y Contexto ({año_mapa})"):
+            df_sub = df_pronostico_regional[df_pronostico_regional["Año"] == año_mapa]
+            st.dataframe(
+                df_sub[["Departamento", "Nivel", "Segmento", "Modelo", "Consumo"]],
+                height=300, hide_index=True
+            )
     
     st.markdown("### Datos Detallados por Departamento")
     
@@ -1000,11 +891,14 @@ with tab3:
             conteo_region = df['Región'].value_counts().reset_index()
             conteo_region.columns = ['Región', 'Encuestados']
             
-            fig_bar = px.bar(conteo_region, y='Región', x='Encuestados', orientation='h',
+            def construir_barras_region():
+                fig = px.bar(conteo_region, y='Región', x='Encuestados', orientation='h',
                              color='Encuestados', 
                              color_continuous_scale=COLOR_CONTINUOUS, 
                              text='Encuestados')
-            fig_bar.update_layout(yaxis={'categoryorder':'total ascending'})
+                fig.update_layout(yaxis={'categoryorder':'total ascending'})
+                return fig
+            fig_bar = figura("barras_region", (conteo_region,), construir_barras_region)
             st.plotly_chart(fig_bar, use_container_width=True)
         else:
             st.write("Sin datos regionales.")
@@ -1023,6 +917,117 @@ with tab3:
             )
 
 
+# -----------------------------------------------------------------------------
+# PESTAÑA: COMPARACIÓN ENTRE OLEADAS
+# -----------------------------------------------------------------------------
+@st.cache_resource
+def histogramas_de_archivo(contenido):
+    """Cubo de histogramas de un CSV subido (se lee una sola vez por contenido)."""
+    df_archivo, _ = normalizar_encuesta(leer_csv(io.BytesIO(contenido)))
+    return HistogramasEdad.desde_dataframe(df_archivo)
+
+with tab_oleadas:
+    st.header("📈 Cambios entre Oleadas de la Encuesta")
+    st.markdown("""
+    Compara dos versiones de la encuesta a partir de sus **agregados cacheados** (histogramas de edad
+    por segmento): diferencias de conteos, participación y edad, con pruebas de significancia para
+    todas las categorías a la vez (valores *q* corregidos por comparaciones múltiples).
+    """)
+
+    # Versiones disponibles: oleadas del dataset cargado (CAFE_RUTAS_OLEADAS) y CSV subidos
+    versiones = {}
+    histogramas_oleadas = grafo["histogramas_oleadas"]
+    if histogramas_oleadas is not None:
+        for oleada in histogramas_oleadas.categorias['Oleada'].valores:
+            versiones[str(oleada)] = VistaOleada(histogramas_oleadas, oleada)
+    else:
+        versiones["Encuesta actual"] = histogramas_edad
+    archivos = st.file_uploader("Agregar versiones de la encuesta (CSV):", type="csv", accept_multiple_files=True)
+    for archivo in archivos or []:
+        versiones[archivo.name] = histogramas_de_archivo(archivo.getvalue())
+
+    if len(versiones) < 2:
+        st.info("Se necesitan al menos dos versiones: configura varias oleadas o sube otro CSV.")
+    else:
+        nombres = list(versiones)
+        col_base, col_otra = st.columns(2)
+        nombre_base = col_base.selectbox("Oleada base:", nombres, index=0)
+        nombre_otra = col_otra.selectbox("Oleada a comparar:", nombres, index=len(nombres) - 1)
+        base, otra = versiones[nombre_base], versiones[nombre_otra]
+
+        # Un CSV subido puede no traer todas las columnas de segmento
+        dimensiones = dimensiones_comunes(base, otra)
+        omitidas = [c for c in COLUMNAS_SEGMENTO if c not in dimensiones]
+        if omitidas:
+            st.caption(f"⚠️ '{nombre_base}' o '{nombre_otra}' no traen {', '.join(omitidas)}: "
+                       "esas dimensiones no se comparan.")
+        if not dimensiones:
+            st.info("Las dos versiones no comparten ninguna columna de segmento.")
+        else:
+            # --- 1. Participación por categoría ---
+            st.subheader("Participación por Categoría")
+            opciones = [c for c in ['Contexto', 'Preparación', 'Variedad', 'Frecuencia', 'Región'] if c in dimensiones]
+            columna_cmp = st.selectbox("Dimensión:", opciones)
+            df_participacion = comparar_participacion(base, otra, columna_cmp)
+
+            def construir_participacion():
+                fig = go.Figure([
+                    go.Bar(name=nombre_base, x=df_participacion.index, y=df_participacion["% base"],
+                           marker_color=COLOR_PALETTE[1]),
+                    go.Bar(name=nombre_otra, x=df_participacion.index, y=df_participacion["% comparada"],
+                           marker_color=COLOR_PALETTE[4]),
+                ])
+                fig.update_layout(barmode="group", yaxis_title="% de encuestados", xaxis_title=columna_cmp,
+                                  title=f"Participación por {columna_cmp}")
+                return fig
+            st.plotly_chart(figura("participacion_oleadas", (df_participacion, nombre_base, nombre_otra),
+                                   construir_participacion), use_container_width=True)
+            st.dataframe(df_participacion.style.format({
+                "% base": "{:.1f}", "% comparada": "{:.1f}", "Δ p.p.": "{:+.1f}",
+                "z": "{:.2f}", "p": "{:.4f}", "q": "{:.4f}"}), use_container_width=True)
+
+            # --- 2. Adopción de un método por edad ---
+            st.subheader("Adopción por Grupo de Edad")
+            if 'Preparación' not in dimensiones:
+                st.info("Alguna de las dos versiones no trae la columna Preparación.")
+            else:
+                metodo_cmp = st.selectbox("Método de preparación:", CATALOGOS['Preparación'],
+                                          index=CATALOGOS['Preparación'].index('Cold brew'))
+                df_adopcion = adopcion_por_edad(base, otra, valor=metodo_cmp)
+
+                def construir_adopcion():
+                    fig = go.Figure([
+                        go.Scatter(name=nombre_base, x=df_adopcion.index, y=df_adopcion["% base"],
+                                   mode="lines+markers", line_color=COLOR_PALETTE[1]),
+                        go.Scatter(name=nombre_otra, x=df_adopcion.index, y=df_adopcion["% comparada"],
+                                   mode="lines+markers", line_color=COLOR_PALETTE[4]),
+                    ])
+                    fig.update_layout(yaxis_title=f"% que prefiere {metodo_cmp}", xaxis_title="Edad",
+                                      title=f"Adopción de {metodo_cmp} por Edad")
+                    return fig
+                st.plotly_chart(figura("adopcion_oleadas", (df_adopcion, nombre_base, nombre_otra, metodo_cmp),
+                                       construir_adopcion), use_container_width=True)
+                st.dataframe(df_adopcion.style.format({
+                    "% base": "{:.1f}", "% comparada": "{:.1f}", "Δ p.p.": "{:+.1f}",
+                    "z": "{:.2f}", "p": "{:.4f}", "q": "{:.4f}"}), use_container_width=True)
+
+            # --- 3. Edad por segmento ---
+            st.subheader("Edad por Segmento (prueba t de Welch)")
+            opciones = [c for c in ['Preparación', 'Contexto', 'Región', 'Variedad', 'Frecuencia'] if c in dimensiones]
+            grupo_edad = st.selectbox("Agrupar edad por:", opciones)
+            df_edad_cmp = comparar_edad(base, otra, grupo_edad)
+            st.dataframe(df_edad_cmp.style.format({
+                "Media base": "{:.1f}", "Media comparada": "{:.1f}", "Δ media": "{:+.2f}", "Δ mediana": "{:+.1f}",
+                "t": "{:.2f}", "gl": "{:.0f}", "p": "{:.4f}", "q": "{:.4f}"}), use_container_width=True)
+
+# --- Inspección del grafo de cálculo ---
+with st.expander("⚙️ Grafo de cálculo: dependencias, aciertos y tiempos"):
+    st.graphviz_chart(grafo.dot())
+    st.dataframe(grafo.estadisticas(), use_container_width=True, hide_index=True)
+    st.caption("Un cambio en una fuente recalcula solo: "
+               + "; ".join(f"**{f}** → {', '.join(grafo.dependientes(f))}"
+                           for f in ("encuesta_cruda", "historia", "cruce")))
+
 # -----------------------------------------------------------------------------
 # 7. FOOTER
 # -----------------------------------------------------------------------------
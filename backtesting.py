@@ -0,0 +1,305 @@
+"""
+Backtesting con origen móvil (rolling origin) para elegir el modelo de una serie.
+
+Para cada origen k se entrena con los primeros k puntos y se pronostican los
+siguientes `horizonte` puntos. El error se acumula sobre todos los orígenes y
+cada serie se queda con el candidato de menor RMSE. Los candidatos son:
+
+- Polinomios de grado 1..3 (años centrados y escalados).
+- Log-lineal: log(y) lineal en el año (crecimiento exponencial).
+- Logística: y = K / (1 + exp(-(a + b x))), con la saturación K buscada en
+  una malla de múltiplos del máximo observado (cada K es un ajuste lineal
+  sobre logit(y / K)).
+
+Cada candidato se ajusta a todas las series a la vez (una matriz años x
+series), así que el backtest corre en el proceso actual: todas las series
+departamentales (y sus sub-series) se evalúan en una sola pasada. Los errores de cada
+bloque de series se guardan en disco con una clave de contenido, así que
+repetir el backtest con los mismos datos no vuelve a ajustar nada. La caché
+se poda por antigüedad y por cantidad de archivos (ver `limpiar_cache`); una
+entrada podada por otro proceso mientras se leía se recalcula.
+
+Uso (leaderboard de la serie nacional IHCAFE):
+    python backtesting.py --salida leaderboard.csv
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_CACHE = os.path.join(".cache", "backtesting")
+MAX_ARCHIVOS_CACHE = 512
+MAX_EDAD_CACHE = 30 * 24 * 3600  # segundos
+VERSION_BACKTESTING = 1
+MIN_ENTRENAMIENTO = 4
+HORIZONTE = 2
+SERIES_POR_BLOQUE = 256
+# Saturación de la logística como múltiplo del máximo observado
+MALLA_SATURACION = np.array([1.02, 1.05, 1.1, 1.2, 1.35, 1.5, 1.75, 2.0, 2.5, 3.0, 4.0, 6.0])
+
+
+# -----------------------------------------------------------------------------
+# Candidatos: ajustar(x, Y) -> parámetros, predecir(parámetros, x) -> matriz
+# -----------------------------------------------------------------------------
+def _escala(x):
+    centro, escala = x.mean(), max(x.std(), 1.0)
+    return centro, escala
+
+
+def _ajustar_polinomio(grado):
+    def ajustar(x, Y):
+        centro, escala = _escala(x)
+        coef, *_ = np.linalg.lstsq(np.vander((x - centro) / escala, grado + 1), Y, rcond=None)
+        return coef, centro, escala
+
+    def predecir(parametros, x):
+        coef, centro, escala = parametros
+        return np.vander((x - centro) / escala, grado + 1) @ coef
+
+    return ajustar, predecir
+
+
+def _ajustar_loglineal(x, Y):
+    centro, escala = _escala(x)
+    validas = (Y > 0).all(axis=0)
+    logY = np.log(np.where(Y > 0, Y, 1.0))
+    coef, *_ = np.linalg.lstsq(np.vander((x - centro) / escala, 2), logY, rcond=None)
+    coef[:, ~validas] = np.nan
+    return coef, centro, escala
+
+
+def _predecir_loglineal(parametros, x):
+    coef, centro, escala = parametros
+    return np.exp(np.vander((x - centro) / escala, 2) @ coef)
+
+
+def _ajustar_logistica(x, Y):
+    centro, escala = _escala(x)
+    X = np.vander((x - centro) / escala, 2)
+    maximo = Y.max(axis=0)
+    validas = (Y > 0).all(axis=0)
+    mejor_sse = np.full(Y.shape[1], np.inf)
+    mejor = (np.full((2, Y.shape[1]), np.nan), np.full(Y.shape[1], np.nan))
+    for factor in MALLA_SATURACION:
+        K = maximo * factor
+        with np.errstate(divide="ignore", invalid="ignore"):
+            Z = np.log(Y / (K - Y))
+        Z = np.where(np.isfinite(Z), Z, 0.0)
+        coef, *_ = np.linalg.lstsq(X, Z, rcond=None)
+        pred = K / (1.0 + np.exp(-(X @ coef)))
+        sse = ((Y - pred) ** 2).sum(axis=0)
+        mejora = validas & (sse < mejor_sse)
+        mejor_sse[mejora] = sse[mejora]
+        mejor[0][:, mejora] = coef[:, mejora]
+        mejor[1][mejora] = K[mejora]
+    return mejor[0], mejor[1], centro, escala
+
+
+def _predecir_logistica(parametros, x):
+    coef, K, centro, escala = parametros
+    return K / (1.0 + np.exp(-(np.vander((x - centro) / escala, 2) @ coef)))
+
+
+# Nombre -> (ajustar, predecir, número de parámetros)
+CANDIDATOS = {
+    "Polinomio grado 1": (*_ajustar_polinomio(1), 2),
+    "Polinomio grado 2": (*_ajustar_polinomio(2), 3),
+    "Polinomio grado 3": (*_ajustar_polinomio(3), 4),
+    "Log-lineal": (_ajustar_loglineal, _predecir_loglineal, 2),
+    "Logística": (_ajustar_logistica, _predecir_logistica, 3),
+}
+
+
+def candidatos_hasta_grado(max_degree):
+    """Todos los candidatos, con polinomios solo hasta `max_degree`."""
+    return [nombre for nombre in CANDIDATOS
+            if not nombre.startswith("Polinomio") or int(nombre.rsplit(" ", 1)[1]) <= max_degree]
+
+
+# -----------------------------------------------------------------------------
+# Folds
+# -----------------------------------------------------------------------------
+def origenes(n_puntos, min_entrenamiento=MIN_ENTRENAMIENTO):
+    """Tamaños de entrenamiento de cada fold (siempre queda al menos un punto de prueba)."""
+    return list(range(min(min_entrenamiento, n_puntos - 1), n_puntos))
+
+
+def errores_candidato(nombre, x, Y, min_entrenamiento=MIN_ENTRENAMIENTO, horizonte=HORIZONTE):
+    """
+    Errores (predicción - real) de un candidato en todos los folds.
+
+    Devuelve una matriz (predicciones x series); los folds con menos puntos
+    de entrenamiento que parámetros del modelo quedan en NaN.
+    """
+    ajustar, predecir, n_parametros = CANDIDATOS[nombre]
+    filas = []
+    for k in origenes(len(x), min_entrenamiento):
+        prueba = slice(k, min(k + horizonte, len(x)))
+        if k < n_parametros:
+            filas.append(np.full((prueba.stop - prueba.start, Y.shape[1]), np.nan))
+            continue
+        with np.errstate(over="ignore", invalid="ignore"):
+            pred = predecir(ajustar(x[:k], Y[:k]), x[prueba])
+        filas.append(pred - Y[prueba])
+    return np.vstack(filas)
+
+
+def _clave_cache(nombre, x, Y, min_entrenamiento, horizonte):
+    h = hashlib.blake2b(digest_size=12)
+    h.update(f"{VERSION_BACKTESTING}|{nombre}|{min_entrenamiento}|{horizonte}|{Y.shape}".encode("utf-8"))
+    h.update(np.ascontiguousarray(x, dtype=float).tobytes())
+    h.update(np.ascontiguousarray(Y, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def _evaluar_bloque(nombre, x, Y, min_entrenamiento, horizonte, directorio):
+    """Errores de un candidato sobre un bloque de series, con caché en disco."""
+    ruta = None
+    if directorio is not None:
+        ruta = os.path.join(directorio, _clave_cache(nombre, x, Y, min_entrenamiento, horizonte) + ".npy")
+        try:
+            errores = np.load(ruta)
+        except (FileNotFoundError, ValueError, EOFError):
+            # Sin entrada, o podada/truncada entre la búsqueda y la lectura: se recalcula
+            pass
+        else:
+            try:
+                # Marca de uso para que la poda conserve las entradas recientes
+                os.utime(ruta)
+            except FileNotFoundError:
+                pass
+            return errores
+    errores = errores_candidato(nombre, x, Y, min_entrenamiento, horizonte)
+    if ruta is not None:
+        os.makedirs(directorio, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            np.save(f, errores)
+        os.replace(temporal, ruta)
+    return errores
+
+
+def limpiar_cache(directorio=DIRECTORIO_CACHE, max_archivos=MAX_ARCHIVOS_CACHE, max_edad=MAX_EDAD_CACHE):
+    """
+    Borra las entradas sin uso en `max_edad` segundos y, si aún sobran, las
+    menos usadas recientemente hasta dejar `max_archivos`. Devuelve cuántas borró.
+    """
+    try:
+        entradas = [(e.stat().st_mtime, e.path) for e in os.scandir(directorio)
+                    if e.is_file() and e.name.endswith(".npy")]
+    except FileNotFoundError:
+        return 0
+    entradas.sort(reverse=True)
+    limite = time.time() - max_edad
+    borrar = [ruta for i, (mtime, ruta) in enumerate(entradas) if i >= max_archivos or mtime < limite]
+    for ruta in borrar:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+    return len(borrar)
+
+
+# -----------------------------------------------------------------------------
+# Backtest, leaderboard y pronóstico con el modelo elegido
+# -----------------------------------------------------------------------------
+def backtest(x, Y, candidatos=None, min_entrenamiento=MIN_ENTRENAMIENTO, horizonte=HORIZONTE,
+             series_por_bloque=SERIES_POR_BLOQUE, directorio_cache=DIRECTORIO_CACHE, nombres_series=None):
+    """
+    Backtest de todos los candidatos sobre todas las columnas de Y.
+
+    Devuelve el leaderboard en formato largo (Serie, Modelo, RMSE, MAPE,
+    Predicciones, Rango), con Rango 1 para el mejor modelo de cada serie.
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    candidatos = list(candidatos or CANDIDATOS)
+    bloques = [slice(i, i + series_por_bloque) for i in range(0, Y.shape[1], series_por_bloque)]
+    resultados = [_evaluar_bloque(nombre, x, Y[:, b], min_entrenamiento, horizonte, directorio_cache)
+                  for nombre in candidatos for b in bloques]
+    if directorio_cache is not None:
+        limpiar_cache(directorio_cache)
+
+    n_series = Y.shape[1]
+    nombres_series = list(range(n_series)) if nombres_series is None else list(nombres_series)
+    reales = np.vstack([Y[slice(k, min(k + horizonte, len(x)))] for k in origenes(len(x), min_entrenamiento)])
+    partes = []
+    for i, nombre in enumerate(candidatos):
+        errores = np.hstack(resultados[i * len(bloques):(i + 1) * len(bloques)])
+        validos = np.isfinite(errores)
+        n = validos.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rmse = np.sqrt(np.where(validos, errores ** 2, 0).sum(axis=0) / n)
+            mape = np.where(validos, np.abs(errores) / np.abs(reales), 0).sum(axis=0) / n * 100
+        # Un candidato que no pudo evaluarse en todos los folds no compite
+        rmse[n < validos.shape[0]] = np.inf
+        partes.append(pd.DataFrame({"Serie": nombres_series, "Modelo": nombre, "RMSE": rmse,
+                                    "MAPE": mape, "Predicciones": n}))
+    leaderboard = pd.concat(partes, ignore_index=True)
+    leaderboard["Rango"] = leaderboard.groupby("Serie", sort=False)["RMSE"].rank(method="first").astype(int)
+    return leaderboard.sort_values(["Serie", "Rango"], ignore_index=True)
+
+
+def resumen_leaderboard(leaderboard):
+    """Por modelo: series ganadas, rango promedio y RMSE/MAPE medianos."""
+    resumen = leaderboard.groupby("Modelo").agg(
+        Ganadas=("Rango", lambda r: int((r == 1).sum())),
+        RangoPromedio=("Rango", "mean"),
+        RMSEMediano=("RMSE", "median"),
+        MAPEMediano=("MAPE", "median"),
+    )
+    return resumen.sort_values(["Ganadas", "RangoPromedio"], ascending=[False, True]).reset_index()
+
+
+def seleccion(leaderboard):
+    """Modelo elegido por serie (Serie -> Modelo) en el orden del leaderboard."""
+    return leaderboard[leaderboard["Rango"] == 1].set_index("Serie")["Modelo"]
+
+
+def pronosticar(x, Y, modelos, x_futuro):
+    """
+    Reajusta el modelo elegido de cada serie con todos los puntos y pronostica
+    `x_futuro`. `modelos` es una secuencia con un nombre de candidato por
+    columna de Y; las series de un mismo modelo se ajustan juntas.
+    """
+    x = np.asarray(x, dtype=float)
+    x_futuro = np.asarray(x_futuro, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    modelos = np.asarray(modelos, dtype=object)
+    pronostico = np.full((len(x_futuro), Y.shape[1]), np.nan)
+    for nombre in pd.unique(modelos):
+        ajustar, predecir, _ = CANDIDATOS[nombre]
+        columnas = modelos == nombre
+        with np.errstate(over="ignore", invalid="ignore"):
+            pronostico[:, columnas] = predecir(ajustar(x, Y[:, columnas]), x_futuro)
+    return pronostico
+
+
+def main(argv=None):
+    from datos import DF_OFICIAL
+
+    parser = argparse.ArgumentParser(description="Leaderboard de modelos por backtesting de origen móvil.")
+    parser.add_argument("--salida", help="CSV con el leaderboard completo")
+    parser.add_argument("--horizonte", type=int, default=HORIZONTE)
+    parser.add_argument("--min-entrenamiento", type=int, default=MIN_ENTRENAMIENTO)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    leaderboard = backtest(DF_OFICIAL["Año"], DF_OFICIAL["Consumo"], min_entrenamiento=args.min_entrenamiento,
+                           horizonte=args.horizonte, nombres_series=["Nacional"])
+    duracion = time.perf_counter() - inicio
+    print(f"✅ Serie nacional x {len(CANDIDATOS)} modelos en {duracion:.2f} s")
+    print(resumen_leaderboard(leaderboard).to_string(index=False))
+    if args.salida:
+        leaderboard.to_csv(args.salida, index=False, encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
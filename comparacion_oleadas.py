@@ -0,0 +1,172 @@
+"""
+Comparación entre oleadas de la encuesta a partir de agregados cacheados.
+
+Cada oleada se resume en sus histogramas de Edad por segmento
+(`HistogramasEdad`). Conteos, participaciones y estadísticas de edad de
+cualquier corte salen de restar/dividir esos cubos, sin volver a recorrer
+las filas: comparar dos oleadas grandes cuesta lo mismo que ver una.
+
+Las pruebas de significancia son vectorizadas sobre todas las categorías:
+
+- Participaciones: prueba z de dos proporciones (con varianza combinada),
+  con valores q de Benjamini-Hochberg por la cantidad de categorías.
+- Edad: prueba t de Welch con media, varianza y n calculados del histograma.
+
+Un CSV subido puede no traer todas las columnas de segmento: las
+comparaciones solo se hacen sobre `dimensiones_comunes` de las dos versiones.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from histogramas_edad import COLUMNAS_SEGMENTO, estadisticas_histograma
+
+# Bandas de edad para la adopción por edad: [inicio, fin)
+BANDAS_EDAD = ((0, 25), (25, 35), (35, 45), (45, 55), (55, 121))
+ALFA = 0.05
+
+
+class VistaOleada:
+    """Una oleada dentro de un cubo con columna 'Oleada' (mismo interfaz `histograma`)."""
+
+    def __init__(self, histogramas, oleada):
+        self.histogramas = histogramas
+        self.oleada = oleada
+        self.columnas = tuple(c for c in histogramas.columnas if c != 'Oleada')
+
+    def histograma(self, filtros=None, por=(), edad=None):
+        filtros = dict(filtros or {}, Oleada=[self.oleada])
+        return self.histogramas.histograma(filtros, por, edad)
+
+
+def dimensiones_comunes(*fuentes, columnas=COLUMNAS_SEGMENTO):
+    """Columnas de `columnas` presentes en todas las fuentes, en ese orden."""
+    return [c for c in columnas if all(c in fuente.columnas for fuente in fuentes)]
+
+
+def _exigir(fuentes, columnas):
+    faltan = [c for c in columnas if c not in dimensiones_comunes(*fuentes, columnas=columnas)]
+    if faltan:
+        raise ValueError(f"Alguna versión de la encuesta no tiene las columnas {faltan}")
+
+
+def _conteos(fuente, columna, filtros=None, edad=None):
+    indice, h = fuente.histograma(filtros, por=columna, edad=edad)
+    return pd.Series(h.sum(axis=1), index=indice)
+
+
+def valores_q(p):
+    """Valores q de Benjamini-Hochberg (NaN se ignoran)."""
+    p = np.asarray(p, dtype=float)
+    q = np.full(p.shape, np.nan)
+    validos = np.flatnonzero(~np.isnan(p))
+    if validos.size == 0:
+        return q
+    orden = validos[np.argsort(p[validos])]
+    m = len(orden)
+    ajustados = p[orden] * m / np.arange(1, m + 1)
+    q[orden] = np.minimum.accumulate(ajustados[::-1])[::-1].clip(max=1.0)
+    return q
+
+
+def prueba_proporciones(x1, n1, x2, n2):
+    """Prueba z de dos proporciones, vectorizada. Devuelve (z, p)."""
+    x1, n1, x2, n2 = (np.asarray(v, dtype=float) for v in (x1, n1, x2, n2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p1, p2 = x1 / n1, x2 / n2
+        combinada = (x1 + x2) / (n1 + n2)
+        error = np.sqrt(combinada * (1 - combinada) * (1 / n1 + 1 / n2))
+        z = (p2 - p1) / error
+    return z, 2 * stats.norm.sf(np.abs(z))
+
+
+def prueba_welch(media1, var1, n1, media2, var2, n2):
+    """Prueba t de Welch a partir de resúmenes, vectorizada. Devuelve (t, gl, p)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        a, b = var1 / n1, var2 / n2
+        t = (media2 - media1) / np.sqrt(a + b)
+        gl = (a + b) ** 2 / (a ** 2 / (n1 - 1) + b ** 2 / (n2 - 1))
+    return t, gl, 2 * stats.t.sf(np.abs(t), gl)
+
+
+def comparar_participacion(base, otra, columna, filtros=None, edad=None):
+    """
+    Conteos y participación de cada categoría de `columna` en dos oleadas,
+    con su diferencia (puntos porcentuales) y prueba z por categoría.
+    """
+    _exigir((base, otra), [columna])
+    conteo_base = _conteos(base, columna, filtros, edad)
+    conteo_otra = _conteos(otra, columna, filtros, edad)
+    categorias = conteo_base.index.union(conteo_otra.index)
+    x1 = conteo_base.reindex(categorias, fill_value=0)
+    x2 = conteo_otra.reindex(categorias, fill_value=0)
+    n1, n2 = x1.sum(), x2.sum()
+    z, p = prueba_proporciones(x1, n1, x2, n2)
+    tabla = pd.DataFrame({
+        "Conteo base": x1, "Conteo comparada": x2, "Δ conteo": x2 - x1,
+        "% base": 100 * x1 / max(n1, 1), "% comparada": 100 * x2 / max(n2, 1),
+    }, index=pd.Index(categorias, name=columna))
+    tabla["Δ p.p."] = tabla["% comparada"] - tabla["% base"]
+    tabla["z"] = z
+    tabla["p"] = p
+    tabla["q"] = valores_q(p)
+    tabla["Significativo"] = tabla["q"] < ALFA
+    return tabla
+
+
+def comparar_edad(base, otra, por, filtros=None, edad=None):
+    """Media, mediana y n de Edad por grupo en dos oleadas, con prueba t de Welch."""
+    _exigir((base, otra), [por] if isinstance(por, str) else list(por))
+    indice_base, h_base = base.histograma(filtros, por=por, edad=edad)
+    indice_otra, h_otra = otra.histograma(filtros, por=por, edad=edad)
+    s_base = estadisticas_histograma(h_base).set_axis(indice_base)
+    s_otra = estadisticas_histograma(h_otra).set_axis(indice_otra)
+    grupos = s_base.index.union(s_otra.index)
+    s_base, s_otra = s_base.reindex(grupos), s_otra.reindex(grupos)
+    t, gl, p = prueba_welch(s_base["media"], s_base["std"] ** 2, s_base["n"],
+                            s_otra["media"], s_otra["std"] ** 2, s_otra["n"])
+    tabla = pd.DataFrame({
+        "n base": s_base["n"].fillna(0).astype(np.int64), "n comparada": s_otra["n"].fillna(0).astype(np.int64),
+        "Media base": s_base["media"], "Media comparada": s_otra["media"],
+        "Δ media": s_otra["media"] - s_base["media"],
+        "Δ mediana": s_otra["mediana"] - s_base["mediana"],
+        "t": t, "gl": gl, "p": p,
+    }, index=grupos)
+    tabla["q"] = valores_q(p)
+    tabla["Significativo"] = tabla["q"] < ALFA
+    return tabla
+
+
+def adopcion_por_edad(base, otra, columna="Preparación", valor="Cold brew", bandas=BANDAS_EDAD, filtros=None):
+    """
+    Participación de `valor` dentro de cada banda de edad en dos oleadas,
+    con prueba z por banda. Sale de un solo histograma por oleada.
+    """
+    _exigir((base, otra), [columna])
+    cortes = np.array([inicio for inicio, _ in bandas] + [bandas[-1][1]])
+    etiquetas = [f"{inicio}-{fin - 1}" if fin <= 120 else f"{inicio}+" for inicio, fin in bandas]
+
+    def por_banda(fuente):
+        indice, h = fuente.histograma(filtros, por=columna)
+        acumulado = np.concatenate([np.zeros((len(h), 1), dtype=np.int64), np.cumsum(h, axis=1)], axis=1)
+        cortes_validos = np.minimum(cortes, h.shape[1])
+        en_banda = np.diff(acumulado[:, cortes_validos], axis=1)
+        total = en_banda.sum(axis=0)
+        fila = np.flatnonzero(np.asarray(indice) == valor)
+        positivos = en_banda[fila[0]] if fila.size else np.zeros(len(bandas), dtype=np.int64)
+        return positivos, total
+
+    x1, n1 = por_banda(base)
+    x2, n2 = por_banda(otra)
+    z, p = prueba_proporciones(x1, n1, x2, n2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tabla = pd.DataFrame({
+            "n base": n1, "n comparada": n2,
+            "% base": 100 * x1 / n1, "% comparada": 100 * x2 / n2,
+        }, index=pd.Index(etiquetas, name="Edad"))
+    tabla["Δ p.p."] = tabla["% comparada"] - tabla["% base"]
+    tabla["z"] = z
+    tabla["p"] = p
+    tabla["q"] = valores_q(p)
+    tabla["Significativo"] = tabla["q"] < ALFA
+    return tabla
@@ -0,0 +1,309 @@
+"""
+Cruce (crosswalk) de regiones cafetaleras IHCAFE a departamentos GADM.
+
+La encuesta registra la región cafetalera (Copán, Agalta, Montecillos, ...),
+pero el mapa colorea departamentos (NAME_1). Este módulo calcula una sola vez
+la matriz de asignación W (regiones x departamentos, filas que suman 1) y la
+guarda como matriz dispersa. Cualquier agregado por región se proyecta a
+departamentos con un único producto `W.T @ X`.
+
+Los pesos se calculan a partir de polígonos locales:
+    geodatos/regiones_ihcafe.geojson   (propiedad "region")
+    geodatos/departamentos.geojson     (propiedad "NAME_1")
+    geodatos/poblacion_departamentos.csv (opcional: Departamento,Poblacion)
+
+Sin población los pesos son por área de intersección; con población se
+asume densidad uniforme dentro de cada departamento. Si no hay polígonos se
+usa una asignación aproximada por pertenencia (pesos iguales entre los
+departamentos que abarca cada región): el repositorio no incluye los
+polígonos, así que ese es el caso por defecto y el cruce lo declara con
+`aproximado` para que el mapa y las tablas lo indiquen.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Departamentos oficiales (GADM NAME_1)
+DEPARTAMENTOS_HN = [
+    "Atlántida", "Colón", "Comayagua", "Copán", "Cortés", "Choluteca",
+    "El Paraíso", "Francisco Morazán", "Gracias a Dios", "Intibucá",
+    "Islas de la Bahía", "La Paz", "Lempira", "Ocotepeque", "Olancho",
+    "Santa Bárbara", "Valle", "Yoro"
+]
+
+DIRECTORIO_GEODATOS = os.environ.get("CAFE_DIRECTORIO_GEODATOS", "geodatos")
+RUTA_REGIONES = os.path.join(DIRECTORIO_GEODATOS, "regiones_ihcafe.geojson")
+RUTA_DEPARTAMENTOS = os.path.join(DIRECTORIO_GEODATOS, "departamentos.geojson")
+RUTA_POBLACION = os.path.join(DIRECTORIO_GEODATOS, "poblacion_departamentos.csv")
+DIRECTORIO_CACHE = os.path.join(".cache", "cruce")
+RESOLUCION_GRADOS = 0.01
+# Celdas (puntos x aristas) por bloque en la prueba punto-en-polígono
+MAX_CELDAS_BLOQUE = 1 << 22
+
+# Asignación aproximada cuando no hay polígonos locales
+REGION_DEPARTAMENTOS_APROX = {
+    "Copán": ["Copán", "Ocotepeque", "Lempira", "Santa Bárbara"],
+    "Opalaca": ["Intibucá", "Lempira", "Santa Bárbara"],
+    "Montecillos": ["La Paz", "Comayagua", "Intibucá"],
+    "Comayagua": ["Comayagua", "Santa Bárbara", "Cortés", "Yoro"],
+    "El Paraíso": ["El Paraíso", "Francisco Morazán", "Choluteca", "Valle"],
+    "Agalta": ["Olancho", "Yoro", "Colón", "Atlántida"],
+}
+
+
+class CruceRegional:
+    """Matriz dispersa regiones x departamentos con filas normalizadas."""
+    __slots__ = ("regiones", "departamentos", "matriz", "origen", "firma")
+
+    def __init__(self, regiones, departamentos, matriz, origen="", firma=None):
+        self.regiones = list(regiones)
+        self.departamentos = list(departamentos)
+        self.matriz = sparse.csr_matrix(matriz)
+        self.origen = origen
+        # Firma de contenido de los archivos de origen (None si no se conoce)
+        self.firma = firma
+
+    @property
+    def aproximado(self):
+        """True si los pesos no salen de polígonos sino de la asignación por pertenencia."""
+        return self.origen == "aproximado"
+
+    def _matriz_para(self, etiquetas):
+        """
+        Filas de W para las etiquetas de región dadas (en ese orden).
+
+        Una etiqueta que ya es un departamento se asigna a sí misma; una
+        etiqueta desconocida queda en cero.
+        """
+        posicion = {r: i for i, r in enumerate(self.regiones)}
+        dep = {d: j for j, d in enumerate(self.departamentos)}
+        filas, cols, vals, seleccion = [], [], [], []
+        for k, etiqueta in enumerate(etiquetas):
+            if etiqueta in posicion:
+                seleccion.append((k, posicion[etiqueta]))
+            elif etiqueta in dep:
+                filas.append(k)
+                cols.append(dep[etiqueta])
+                vals.append(1.0)
+        identidad = sparse.csr_matrix((vals, (filas, cols)), shape=(len(etiquetas), len(self.departamentos)))
+        if not seleccion:
+            return identidad
+        destino, origen = np.array(seleccion).T
+        selector = sparse.csr_matrix((np.ones(len(destino)), (destino, origen)),
+                                     shape=(len(etiquetas), len(self.regiones)))
+        return selector @ self.matriz + identidad
+
+    def proyectar(self, agregados):
+        """
+        Proyecta agregados por región (DataFrame indexado por región, columnas
+        numéricas aditivas) a departamentos con un solo producto disperso.
+        """
+        W = self._matriz_para(list(agregados.index))
+        valores = W.T @ agregados.to_numpy(dtype=float)
+        return pd.DataFrame(valores, index=pd.Index(self.departamentos, name="Departamento"),
+                            columns=agregados.columns)
+
+    def tabla(self):
+        """Pesos en formato largo (Región, Departamento, Peso) para inspección."""
+        coo = self.matriz.tocoo()
+        return pd.DataFrame({
+            "Región": np.asarray(self.regiones, dtype=object)[coo.row],
+            "Departamento": np.asarray(self.departamentos, dtype=object)[coo.col],
+            "Peso": coo.data,
+        }).sort_values(["Región", "Peso"], ascending=[True, False], ignore_index=True)
+
+
+def _normalizar_filas(matriz):
+    matriz = sparse.csr_matrix(matriz, dtype=float)
+    totales = np.asarray(matriz.sum(axis=1)).ravel()
+    totales[totales == 0] = 1.0
+    return sparse.diags(1.0 / totales) @ matriz
+
+
+def cruce_aproximado():
+    """Cruce por pertenencia, con pesos iguales por región."""
+    regiones = list(REGION_DEPARTAMENTOS_APROX)
+    dep = {d: j for j, d in enumerate(DEPARTAMENTOS_HN)}
+    filas, cols = [], []
+    for i, region in enumerate(regiones):
+        for departamento in REGION_DEPARTAMENTOS_APROX[region]:
+            filas.append(i)
+            cols.append(dep[departamento])
+    matriz = sparse.csr_matrix((np.ones(len(filas)), (filas, cols)), shape=(len(regiones), len(DEPARTAMENTOS_HN)))
+    return CruceRegional(regiones, DEPARTAMENTOS_HN, _normalizar_filas(matriz), origen="aproximado",
+                         firma="aproximado")
+
+
+# -----------------------------------------------------------------------------
+# Cálculo desde polígonos (rasterización en una malla regular)
+# -----------------------------------------------------------------------------
+def _anillos(geometria):
+    """Lista de anillos (arreglos Nx2) de un Polygon/MultiPolygon GeoJSON."""
+    if geometria["type"] == "Polygon":
+        poligonos = [geometria["coordinates"]]
+    elif geometria["type"] == "MultiPolygon":
+        poligonos = geometria["coordinates"]
+    else:
+        return []
+    return [np.asarray(anillo, dtype=float)[:, :2] for poligono in poligonos for anillo in poligono]
+
+
+def _dentro(x, y, anillos):
+    """
+    Prueba punto-en-polígono (regla par-impar, respeta huecos), vectorizada
+    sobre puntos y sobre las aristas de todos los anillos a la vez. Los
+    puntos se procesan en bloques de a lo sumo MAX_CELDAS_BLOQUE pares
+    punto-arista.
+    """
+    aristas = np.vstack([np.hstack([anillo[:-1], anillo[1:]]) for anillo in anillos])
+    x0, y0, x1, y1 = (aristas[:, k] for k in range(4))
+    # Las aristas horizontales nunca cruzan la semirrecta: su pendiente no se usa
+    alto = np.where(y1 != y0, y1 - y0, 1.0)
+    pendiente = (x1 - x0) / alto
+    dentro = np.zeros(len(x), dtype=bool)
+    paso = max(1, MAX_CELDAS_BLOQUE // max(len(aristas), 1))
+    for inicio in range(0, len(x), paso):
+        px, py = x[inicio:inicio + paso, None], y[inicio:inicio + paso, None]
+        cruza = (y0 > py) != (y1 > py)
+        cortes = cruza & (px < x0 + (py - y0) * pendiente)
+        dentro[inicio:inicio + paso] = np.count_nonzero(cortes, axis=1) % 2 == 1
+    return dentro
+
+
+def _etiquetar_malla(x, y, features, propiedad, nombres):
+    """Código (índice en `nombres`) del polígono que contiene cada punto; -1 si ninguno."""
+    etiqueta = np.full(len(x), -1, dtype=np.int32)
+    posicion = {n: i for i, n in enumerate(nombres)}
+    for feature in features:
+        nombre = feature["properties"].get(propiedad)
+        if nombre not in posicion:
+            continue
+        anillos = _anillos(feature["geometry"])
+        if not anillos:
+            continue
+        todos = np.vstack(anillos)
+        (xmin, ymin), (xmax, ymax) = todos.min(axis=0), todos.max(axis=0)
+        candidatos = np.flatnonzero((etiqueta < 0) & (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+        if len(candidatos):
+            dentro = _dentro(x[candidatos], y[candidatos], anillos)
+            etiqueta[candidatos[dentro]] = posicion[nombre]
+    return etiqueta
+
+
+def cruce_desde_poligonos(geo_regiones, geo_departamentos, poblacion=None, resolucion=RESOLUCION_GRADOS):
+    """
+    Pesos por área (o población) de la intersección región ∩ departamento.
+
+    Se rasteriza el área común en una malla de `resolucion` grados; cada
+    celda pesa cos(latitud) para aproximar su área real.
+    """
+    features_reg = geo_regiones["features"]
+    regiones = sorted({f["properties"]["region"] for f in features_reg})
+    todos = np.vstack([np.vstack(_anillos(f["geometry"])) for f in features_reg])
+    (xmin, ymin), (xmax, ymax) = todos.min(axis=0), todos.max(axis=0)
+    xs = np.arange(xmin + resolucion / 2, xmax, resolucion)
+    ys = np.arange(ymin + resolucion / 2, ymax, resolucion)
+    x, y = (m.ravel() for m in np.meshgrid(xs, ys))
+
+    reg = _etiquetar_malla(x, y, features_reg, "region", regiones)
+    x, y, reg = x[reg >= 0], y[reg >= 0], reg[reg >= 0]
+    dep = _etiquetar_malla(x, y, geo_departamentos["features"], "NAME_1", DEPARTAMENTOS_HN)
+    validos = dep >= 0
+    area = np.cos(np.radians(y[validos]))
+    matriz = sparse.csr_matrix((area, (reg[validos], dep[validos])),
+                               shape=(len(regiones), len(DEPARTAMENTOS_HN)))
+    matriz.sum_duplicates()
+
+    origen = "área"
+    if poblacion is not None:
+        # Densidad uniforme por departamento: peso ∝ población * fracción del área del depto
+        todo_dep = _etiquetar_malla(*(m.ravel() for m in np.meshgrid(xs, ys)),
+                                    geo_departamentos["features"], "NAME_1", DEPARTAMENTOS_HN)
+        _, yy = (m.ravel() for m in np.meshgrid(xs, ys))
+        area_dep = np.bincount(todo_dep[todo_dep >= 0], weights=np.cos(np.radians(yy[todo_dep >= 0])),
+                               minlength=len(DEPARTAMENTOS_HN))
+        area_dep[area_dep == 0] = 1.0
+        densidad = poblacion.reindex(DEPARTAMENTOS_HN).fillna(0).to_numpy() / area_dep
+        matriz = matriz @ sparse.diags(densidad)
+        origen = "población"
+    return CruceRegional(regiones, DEPARTAMENTOS_HN, _normalizar_filas(matriz), origen=origen)
+
+
+def _hash_archivos(rutas):
+    h = hashlib.blake2b(digest_size=8)
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            with open(ruta, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def guardar_cruce(cruce, ruta_base):
+    sparse.save_npz(ruta_base + ".npz", cruce.matriz)
+    with open(ruta_base + ".json", "w", encoding="utf-8") as f:
+        json.dump({"regiones": cruce.regiones, "departamentos": cruce.departamentos,
+                   "origen": cruce.origen}, f, ensure_ascii=False)
+
+
+def leer_cruce(ruta_base):
+    with open(ruta_base + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    return CruceRegional(meta["regiones"], meta["departamentos"], sparse.load_npz(ruta_base + ".npz"), meta["origen"],
+                         firma=os.path.basename(ruta_base))
+
+
+def _estado_archivos(rutas):
+    """(tamaño, mtime) de cada archivo, None si no existe: detecta cambios sin leerlos."""
+    estado = []
+    for ruta in rutas:
+        try:
+            info = os.stat(ruta)
+        except FileNotFoundError:
+            estado.append(None)
+        else:
+            estado.append((info.st_size, info.st_mtime_ns))
+    return tuple(estado)
+
+
+def cargar_cruce(ruta_regiones=RUTA_REGIONES, ruta_departamentos=RUTA_DEPARTAMENTOS,
+                 ruta_poblacion=RUTA_POBLACION, directorio_cache=DIRECTORIO_CACHE):
+    """
+    Cruce regiones -> departamentos, calculado una sola vez por combinación
+    de archivos de polígonos (se guarda en disco como .npz).
+
+    Cada llamada revisa tamaño y mtime de los archivos: si cambian (o aparece
+    un archivo de polígonos nuevo) se devuelve el cruce correspondiente, con
+    `firma` distinta. Sin cambios se devuelve el mismo objeto.
+    """
+    rutas = (ruta_regiones, ruta_departamentos, ruta_poblacion)
+    return _cargar_cruce(rutas, directorio_cache, _estado_archivos(rutas))
+
+
+@lru_cache(maxsize=4)
+def _cargar_cruce(rutas, directorio_cache, estado):
+    ruta_regiones, ruta_departamentos, ruta_poblacion = rutas
+    if not (os.path.exists(ruta_regiones) and os.path.exists(ruta_departamentos)):
+        return cruce_aproximado()
+
+    ruta_base = os.path.join(directorio_cache, "cruce-" + _hash_archivos(rutas))
+    if os.path.exists(ruta_base + ".npz"):
+        return leer_cruce(ruta_base)
+
+    with open(ruta_regiones, encoding="utf-8") as f:
+        geo_regiones = json.load(f)
+    with open(ruta_departamentos, encoding="utf-8") as f:
+        geo_departamentos = json.load(f)
+    poblacion = None
+    if os.path.exists(ruta_poblacion):
+        poblacion = pd.read_csv(ruta_poblacion, encoding="utf-8-sig").set_index("Departamento")["Poblacion"]
+
+    cruce = cruce_desde_poligonos(geo_regiones, geo_departamentos, poblacion)
+    cruce.firma = os.path.basename(ruta_base)
+    os.makedirs(directorio_cache, exist_ok=True)
+    guardar_cruce(cruce, ruta_base)
+    return cruce
@@ -0,0 +1,128 @@
+"""
+Carga de datos de la encuesta y serie oficial de consumo.
+
+Independiente de Streamlit para poder reutilizarse desde el dashboard,
+el reporte batch y otros procesos sin navegador.
+"""
+import hashlib
+import os
+
+import pandas as pd
+
+from deduplicacion import DUPLICADO_INTERNO, DUPLICADO_PREVIO, IndiceHuellas
+from generador_sintetico import generar_encuesta
+from normalizacion import VERSION_NORMALIZACION, normalizar_encuesta
+
+RUTA_DATOS = os.environ.get("CAFE_RUTA_DATOS", "consumo_cafe_honduras.csv")
+DIRECTORIO_CUARENTENA = os.path.join(".cache", "cuarentena")
+DIRECTORIO_OLEADAS = os.path.join(".cache", "oleadas")
+# Oleadas de la encuesta, en orden, separadas por os.pathsep (p. ej. "ola1.csv:ola2.csv")
+RUTAS_OLEADAS = [r for r in os.environ.get("CAFE_RUTAS_OLEADAS", "").split(os.pathsep) if r]
+# Serie oficial actualizada (CSV con columnas Año,Consumo); si no existe se usa DF_OFICIAL
+RUTA_OFICIAL = os.environ.get("CAFE_RUTA_OFICIAL", "consumo_oficial.csv")
+
+# Datos "Oficiales" (Hardcoded para el contexto macro)
+# Estos datos muestran un crecimiento no lineal (acelerado)
+DF_OFICIAL = pd.DataFrame({
+    "Año": [2014, 2016, 2018, 2020, 2022, 2024],
+    "Consumo": [20000, 80000, 150000, 250000, 320000, 390000] # Consumo en quintales
+})
+
+
+def leer_csv(fuente):
+    """Lee un CSV de la encuesta (ruta o archivo abierto) como texto, sin normalizar."""
+    # utf-8-sig descarta el BOM inicial del CSV exportado desde Excel
+    return pd.read_csv(fuente, encoding="utf-8-sig", dtype=str, keep_default_na=False, na_values=[""])
+
+
+def cargar_datos(ruta=RUTA_DATOS, directorio_cuarentena=DIRECTORIO_CUARENTENA):
+    """
+    Lee la encuesta desde CSV, la normaliza y valida.
+
+    Las filas inválidas se escriben en `directorio_cuarentena` con su motivo.
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    df, cuarentena = normalizar_encuesta(leer_csv(ruta))
+    ruta_cuarentena = os.path.join(directorio_cuarentena, os.path.basename(ruta))
+    if not cuarentena.empty:
+        os.makedirs(directorio_cuarentena, exist_ok=True)
+        cuarentena.to_csv(ruta_cuarentena, index=False, encoding="utf-8")
+    elif os.path.exists(ruta_cuarentena):
+        os.remove(ruta_cuarentena)
+    return df
+
+
+def cargar_serie_oficial(ruta=RUTA_OFICIAL):
+    """Serie oficial de consumo desde `ruta`, o DF_OFICIAL si el archivo no existe."""
+    if not os.path.exists(ruta):
+        return DF_OFICIAL.copy()
+    serie = pd.read_csv(ruta, encoding="utf-8-sig")
+    return serie[["Año", "Consumo"]].sort_values("Año").reset_index(drop=True)
+
+
+def firma_archivo(ruta):
+    """Firma barata de un archivo (tamaño + mtime)."""
+    info = os.stat(ruta)
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+def nombre_oleada(ruta):
+    """Nombre de una oleada: el de su archivo sin extensión."""
+    return os.path.splitext(os.path.basename(ruta))[0]
+
+
+def cargar_oleadas(rutas=RUTAS_OLEADAS, indice=None, directorio=DIRECTORIO_OLEADAS):
+    """
+    Carga varias oleadas, descarta los encuestados repetidos dentro de cada
+    oleada y las concatena con una columna 'Oleada'.
+
+    Cada oleada conserva su muestra completa (la comparación entre oleadas
+    necesita a los encuestados de panel en ambas). 'Repetido' vale 1 en las
+    filas de encuestados ya vistos en una oleada anterior: el análisis
+    combinado las descarta para contar a cada persona una vez.
+
+    El índice de huellas es persistente: agregar una oleada solo consulta sus
+    propias filas. Solo cuentan como anteriores las oleadas de `rutas` que
+    preceden a cada una. La tasa de duplicados queda en `indice.registro()`.
+
+    Cada oleada ya limpia se guarda en `directorio` (parquet), con una firma
+    de su archivo y de los de las oleadas anteriores: agregar una oleada solo
+    lee y normaliza la nueva. Si cambia una oleada, se recargan ella y las
+    siguientes (sus duplicados previos pueden cambiar).
+
+    El índice y el caché se comparten entre procesos: la carga completa se
+    hace con el candado del índice tomado.
+    """
+    indice = IndiceHuellas() if indice is None else indice
+    os.makedirs(directorio, exist_ok=True)
+    partes = []
+    previas = []
+    firma = f"n{VERSION_NORMALIZACION}"
+    with indice.bloqueo():
+        for ruta in rutas:
+            oleada = nombre_oleada(ruta)
+            firma = hashlib.sha1(f"{firma}+{firma_archivo(ruta)}".encode()).hexdigest()[:16]
+            archivo = os.path.join(directorio, f"{oleada}-{firma}.parquet")
+            if indice.firma(oleada) == firma and os.path.exists(archivo):
+                partes.append(pd.read_parquet(archivo))
+            else:
+                df = cargar_datos(ruta)
+                estado = indice.clasificar(df, oleada, firma=firma, previas=previas)
+                unicas = estado != DUPLICADO_INTERNO
+                df = df[unicas].assign(Oleada=oleada,
+                                       Repetido=(estado[unicas] == DUPLICADO_PREVIO).astype("int8"))
+                for anterior in os.listdir(directorio):
+                    if anterior.rsplit("-", 1)[0] == oleada:
+                        os.remove(os.path.join(directorio, anterior))
+                df.to_parquet(archivo, index=False)
+                partes.append(df)
+            previas.append(oleada)
+    return pd.concat(partes, ignore_index=True)
+
+
+def datos_de_ejemplo(N=1000):
+    """
+    N filas de datos de ejemplo con distribuciones sesgadas y correlacionadas
+    (ver generador_sintetico.py), con semilla fija para que sean reproducibles.
+    """
+    return generar_encuesta(N, semilla=0)
@@ -0,0 +1,221 @@
+"""
+Dataset de la encuesta compartido entre procesos mediante un archivo mapeado en memoria.
+
+Las columnas se guardan codificadas (códigos de categoría e enteros) en un
+único archivo binario. Cada proceso de Streamlit lo mapea en modo solo lectura
+y construye un DataFrame cuyas columnas son vistas sin copia sobre ese mapa,
+por lo que las páginas del dataset se comparten en la caché del sistema
+operativo en lugar de duplicarse por proceso.
+
+Cada fuente (un CSV o una lista de oleadas) tiene su propio archivo de
+metadata, así que el dashboard y la API pueden compartir el directorio sin
+pisarse. Los binarios que ninguna metadata referencia se borran tras un
+margen; un proceso que ya los tiene mapeados sigue leyendo (POSIX) o el
+borrado se reintenta más adelante (Windows).
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from datos import cargar_datos
+from normalizacion import VERSION_NORMALIZACION
+
+DIRECTORIO_MMAP = os.environ.get("CAFE_DIRECTORIO_MMAP", os.path.join(".cache", "encuesta_mmap"))
+ALINEACION = 64  # bytes; cada columna empieza alineada a línea de caché
+VERSION_FORMATO = 2
+# Segundos que un binario sin referencias se conserva antes de borrarse
+MARGEN_PODA = 300
+
+
+def firma_fuente(ruta):
+    """
+    Firma barata del archivo fuente (tamaño + mtime) para detectar cambios.
+    Acepta una lista de rutas (oleadas). Incluye la versión de la
+    normalización: el binario guarda datos ya limpios.
+    """
+    rutas = [ruta] if isinstance(ruta, str) else ruta
+    partes = []
+    for r in rutas:
+        info = os.stat(r)
+        partes.append(f"{info.st_size}-{info.st_mtime_ns}")
+    return f"{'+'.join(partes)}-n{VERSION_NORMALIZACION}"
+
+
+def _dtype_codigos(n_categorias):
+    if n_categorias < 2 ** 7:
+        return np.int8
+    if n_categorias < 2 ** 15:
+        return np.int16
+    return np.int32
+
+
+def _codificar(serie):
+    """Devuelve (arreglo, categorías o None) para una columna."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        valores = serie.to_numpy()
+        if pd.api.types.is_integer_dtype(valores) and len(valores):
+            # Edad cabe en int16; IDs u otros enteros conservan su rango
+            tipo = np.int16 if valores.min() >= -2 ** 15 and valores.max() < 2 ** 15 else valores.dtype
+            return valores.astype(tipo), None
+        return valores, None
+    categorica = pd.Categorical(serie)
+    categorias = [str(c) for c in categorica.categories]
+    return categorica.codes.astype(_dtype_codigos(len(categorias))), categorias
+
+
+def archivo_meta(ruta=None):
+    """Nombre del archivo de metadata de una fuente (ruta, lista de rutas o None)."""
+    rutas = [] if ruta is None else [ruta] if isinstance(ruta, str) else ruta
+    clave = "\n".join(os.path.abspath(r) for r in rutas)
+    return f"encuesta-{hashlib.blake2b(clave.encode('utf-8'), digest_size=8).hexdigest()}.json"
+
+
+def podar_binarios(directorio=DIRECTORIO_MMAP, margen=None):
+    """Borra los binarios que ninguna metadata referencia y no se usaron en `margen` segundos."""
+    margen = MARGEN_PODA if margen is None else margen
+    referenciados = set()
+    for ruta_meta in glob.glob(os.path.join(directorio, "encuesta-*.json")):
+        try:
+            with open(ruta_meta, encoding="utf-8") as f:
+                referenciados.add(json.load(f).get("binario"))
+        except (OSError, json.JSONDecodeError):
+            # Metadata a medio escribir o ilegible: no se poda en esta pasada
+            return
+    limite = time.time() - margen
+    for ruta_binario in glob.glob(os.path.join(directorio, "encuesta-*.bin")):
+        if os.path.basename(ruta_binario) in referenciados:
+            continue
+        try:
+            if os.path.getmtime(ruta_binario) < limite:
+                os.remove(ruta_binario)
+        except OSError:
+            # Ya borrado por otro proceso, o mapeado (Windows)
+            pass
+
+
+def exportar_encuesta(df, directorio=DIRECTORIO_MMAP, firma="", ruta=None):
+    """
+    Escribe el DataFrame codificado en `directorio` y devuelve la metadata
+    de la fuente `ruta`.
+
+    El binario lleva un hash de contenido en el nombre y la metadata se
+    reemplaza de forma atómica, así que los procesos que ya tienen mapeada la
+    versión anterior siguen leyendo un archivo válido.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    columnas, bloques, offset = [], [], 0
+    hash_contenido = hashlib.blake2b(digest_size=8)
+    for nombre in df.columns:
+        arreglo, categorias = _codificar(df[nombre])
+        arreglo = np.ascontiguousarray(arreglo)
+        relleno = (-offset) % ALINEACION
+        offset += relleno
+        columnas.append({
+            "nombre": nombre,
+            "dtype": arreglo.dtype.str,
+            "offset": offset,
+            "categorias": categorias,
+        })
+        bloques.append((relleno, arreglo))
+        offset += arreglo.nbytes
+        hash_contenido.update(arreglo.tobytes())
+        hash_contenido.update(json.dumps(categorias, ensure_ascii=False).encode("utf-8"))
+
+    nombre_binario = f"encuesta-{hash_contenido.hexdigest()}.bin"
+    ruta_binario = os.path.join(directorio, nombre_binario)
+    if not os.path.exists(ruta_binario):
+        fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            for relleno, arreglo in bloques:
+                f.write(b"\0" * relleno)
+                f.write(arreglo.tobytes())
+        os.replace(temporal, ruta_binario)
+    else:
+        # Reutilizado: se marca como reciente para que la poda no lo borre
+        os.utime(ruta_binario)
+
+    meta = {
+        "version": VERSION_FORMATO,
+        "filas": len(df),
+        "firma_fuente": firma,
+        "binario": nombre_binario,
+        "columnas": columnas,
+    }
+    fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(temporal, os.path.join(directorio, archivo_meta(ruta)))
+    podar_binarios(directorio)
+    return meta
+
+
+def leer_meta(directorio=DIRECTORIO_MMAP, ruta=None):
+    try:
+        with open(os.path.join(directorio, archivo_meta(ruta)), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get("version") != VERSION_FORMATO:
+        return None
+    return meta
+
+
+def abrir_encuesta(directorio=DIRECTORIO_MMAP, meta=None):
+    """
+    Mapea el binario en modo solo lectura y arma el DataFrame sin copias.
+
+    Las columnas categóricas usan los códigos mapeados directamente
+    (Categorical.from_codes sin validar) y las numéricas son vistas de NumPy.
+    `df.attrs["firma_contenido"]` es el hash de contenido del binario.
+    """
+    meta = meta or leer_meta(directorio)
+    if meta is None:
+        raise FileNotFoundError(f"No hay dataset mapeado en '{directorio}'")
+    n = meta["filas"]
+    ruta_binario = os.path.join(directorio, meta["binario"])
+    # Un archivo vacío (encuesta sin filas) no se puede mapear
+    mapa = (np.memmap(ruta_binario, dtype=np.uint8, mode="r") if os.path.getsize(ruta_binario)
+            else np.zeros(0, dtype=np.uint8))
+
+    datos = {}
+    for columna in meta["columnas"]:
+        vista = np.frombuffer(mapa, dtype=np.dtype(columna["dtype"]), count=n, offset=columna["offset"])
+        if columna["categorias"] is not None:
+            valores = pd.Categorical.from_codes(vista, categories=columna["categorias"], validate=False)
+        else:
+            valores = vista
+        datos[columna["nombre"]] = pd.Series(valores, copy=False)
+    df = pd.DataFrame(datos, copy=False)
+    df.attrs["firma_contenido"] = meta["binario"]
+    return df
+
+
+def preparar_encuesta_compartida(ruta=None, directorio=DIRECTORIO_MMAP, cargar=cargar_datos):
+    """
+    Metadata del dataset mapeado de la fuente `ruta`. La limpieza y
+    codificación solo se repiten si el CSV fuente cambió (tamaño/mtime
+    distintos) o cambió la versión de la normalización.
+    """
+    args = () if ruta is None else (ruta,)
+    rutas = [] if ruta is None else [ruta] if isinstance(ruta, str) else ruta
+    firma = firma_fuente(rutas) if rutas and all(os.path.exists(r) for r in rutas) else ""
+    meta = leer_meta(directorio, ruta)
+    if meta is None or meta["firma_fuente"] != firma:
+        meta = exportar_encuesta(cargar(*args), directorio, firma, ruta)
+    return meta
+
+
+def cargar_encuesta_compartida(ruta=None, directorio=DIRECTORIO_MMAP, cargar=cargar_datos):
+    """Devuelve la encuesta normalizada y codificada, respaldada por el archivo mapeado."""
+    meta = preparar_encuesta_compartida(ruta, directorio, cargar)
+    try:
+        return abrir_encuesta(directorio, meta)
+    except FileNotFoundError:
+        # Otro proceso reemplazó y podó el binario entre la lectura de la metadata y el mapeo
+        return abrir_encuesta(directorio, preparar_encuesta_compartida(ruta, directorio, cargar))
@@ -0,0 +1,327 @@
+"""
+Deduplicación de encuestados entre oleadas de la encuesta.
+
+Cada fila se resume en una huella de 64 bits de su clave de encuestado (el
+ID de la exportación). Solo se deduplica sobre un ID real: si la oleada no
+trae ID (la normalización numera las filas) no hay forma de saber si dos
+filas son la misma persona, y la oleada se conserva completa. Dos personas
+distintas pueden dar las mismas respuestas, así que estas nunca se usan
+como clave.
+
+Las huellas vistas se guardan en una tabla hash de direccionamiento abierto
+(sondeo lineal) en disco, mapeada con np.memmap:
+
+- Consultar e insertar un lote es vectorizado y cuesta O(lote): no depende
+  de cuántas oleadas ya se registraron. La tabla solo se reconstruye al
+  duplicar su capacidad (costo amortizado constante por fila).
+- Junto a cada huella se guarda su origen (oleada, generación de carga).
+  Volver a cargar una oleada, aunque se haya reexportado o editado, conserva
+  a todos sus encuestados: una huella de la misma oleada pero de una carga
+  anterior no cuenta como duplicado. Dentro de una misma carga sí, así que
+  los lotes de una oleada pueden procesarse por partes (p. ej. leyendo el
+  CSV con `chunksize`).
+
+- Solo cuentan como duplicado previo las claves de la carga vigente de las
+  oleadas que preceden a la actual (`previas`). Una clave de una oleada que
+  ya no está configurada, o de una carga reemplazada, pasa a la oleada que
+  la ve (y la oleada que la tenía deberá recargarse), así que quitar o
+  reordenar oleadas no deja duplicados fantasma.
+
+La tasa de duplicados por oleada queda registrada en la metadata del índice.
+Varios procesos (los servidores del dashboard) pueden cargar oleadas a la
+vez: los escritores toman `bloqueo()`, un candado de archivo del directorio.
+"""
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_DEDUPLICACION = os.environ.get("CAFE_DIRECTORIO_DEDUPLICACION", os.path.join(".cache", "deduplicacion"))
+ARCHIVO_META = "indice.json"
+ARCHIVO_BLOQUEO = "indice.lock"
+VERSION_FORMATO = 2
+
+COLUMNAS_HUELLA = ("ID",)
+CAPACIDAD_INICIAL = 1 << 16
+CARGA_MAXIMA = 0.5
+
+# Estado de cada fila al clasificar un lote
+CONSERVADA, DUPLICADO_INTERNO, DUPLICADO_PREVIO = 0, 1, 2
+
+# El origen se empaqueta en un uint64: 24 bits de oleada + 40 bits de generación
+_BITS_GENERACION = 40
+_VACIO = np.uint64(0)
+_MEZCLA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def huellas(df, columnas=COLUMNAS_HUELLA):
+    """
+    Huella uint64 por fila a partir del texto de `columnas`.
+
+    No depende del dtype (categórica, int16 del mapa en memoria u objeto),
+    así que la misma respuesta da la misma huella en cualquier carga.
+    """
+    resultado = np.zeros(len(df), dtype=np.uint64)
+    for columna in columnas:
+        serie = df[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Se hashea cada categoría una vez y se expande con los códigos
+            por_categoria = pd.util.hash_array(serie.cat.categories.astype(str).to_numpy(dtype=object))
+            codigos = serie.cat.codes.to_numpy()
+            valores = np.where(codigos >= 0, por_categoria[codigos], np.uint64(0))
+        else:
+            valores = pd.util.hash_array(serie.astype(str).to_numpy(dtype=object))
+        resultado = (resultado * _MEZCLA) ^ valores
+    # 0 marca las celdas vacías de la tabla
+    resultado[resultado == _VACIO] = 1
+    return resultado
+
+
+def _capacidad_para(elementos):
+    capacidad = CAPACIDAD_INICIAL
+    while elementos > capacidad * CARGA_MAXIMA:
+        capacidad <<= 1
+    return capacidad
+
+
+def _sondear(claves, origenes, tabla, tabla_origenes):
+    """
+    Busca o inserta (sondeo lineal) un lote de claves distintas.
+
+    Las claves ausentes se insertan con su origen. Devuelve, por clave, el
+    origen registrado antes de esta llamada (el propio si se insertó), si
+    se insertó y la celda que ocupa.
+    """
+    mascara = np.uint64(len(tabla) - 1)
+    posicion = (claves & mascara).astype(np.int64)
+    registrado = np.empty(len(claves), dtype=np.uint64)
+    insertada = np.zeros(len(claves), dtype=bool)
+    celda = np.empty(len(claves), dtype=np.int64)
+    pendientes = np.arange(len(claves))
+    while pendientes.size:
+        p = posicion[pendientes]
+        actual = tabla[p]
+        encontrada = actual == claves[pendientes]
+        registrado[pendientes[encontrada]] = tabla_origenes[p[encontrada]]
+        celda[pendientes[encontrada]] = p[encontrada]
+
+        # Varias claves pueden caer en la misma celda vacía: gana la primera
+        vacias = np.flatnonzero(actual == _VACIO)
+        _, primera = np.unique(p[vacias], return_index=True)
+        ganadoras = vacias[primera]
+        tabla[p[ganadoras]] = claves[pendientes[ganadoras]]
+        tabla_origenes[p[ganadoras]] = origenes[pendientes[ganadoras]]
+        registrado[pendientes[ganadoras]] = origenes[pendientes[ganadoras]]
+        insertada[pendientes[ganadoras]] = True
+        celda[pendientes[ganadoras]] = p[ganadoras]
+
+        resueltas = encontrada.copy()
+        resueltas[ganadoras] = True
+        # Las perdedoras reintentan la misma celda (ahora ocupada) y avanzan después
+        ocupadas = (actual != _VACIO) & ~encontrada
+        posicion[pendientes[ocupadas]] = (p[ocupadas] + 1) & int(mascara)
+        pendientes = pendientes[~resueltas]
+    return registrado, insertada, celda
+
+
+class IndiceHuellas:
+    """Tabla hash persistente de huellas de encuestados con registro por oleada."""
+
+    def __init__(self, directorio=DIRECTORIO_DEDUPLICACION, columnas=COLUMNAS_HUELLA, solo_lectura=False):
+        self.directorio = directorio
+        self.columnas = tuple(columnas)
+        # Solo lectura: para consultar el registro sin mapear la tabla para escritura
+        self.solo_lectura = solo_lectura
+        if not solo_lectura:
+            os.makedirs(directorio, exist_ok=True)
+        self.meta = self._leer_meta()
+        self._abrir()
+
+    # --- Persistencia ---------------------------------------------------
+    def _leer_meta(self):
+        try:
+            with open(os.path.join(self.directorio, ARCHIVO_META), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") == VERSION_FORMATO and tuple(meta["columnas"]) == self.columnas:
+                return meta
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+        return {"version": VERSION_FORMATO, "columnas": list(self.columnas), "capacidad": 0,
+                "ocupadas": 0, "archivo": None, "oleadas": {}}
+
+    def _guardar_meta(self):
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, os.path.join(self.directorio, ARCHIVO_META))
+
+    def _abrir(self):
+        if self.meta["archivo"] is None:
+            self.tabla = np.zeros(0, dtype=np.uint64)
+            self.origenes = np.zeros(0, dtype=np.uint64)
+            return
+        ruta = os.path.join(self.directorio, self.meta["archivo"])
+        mapa = np.memmap(ruta, dtype=np.uint64, mode="r" if self.solo_lectura else "r+",
+                         shape=(2, self.meta["capacidad"]))
+        self.tabla, self.origenes = mapa[0], mapa[1]
+
+    @contextlib.contextmanager
+    def bloqueo(self):
+        """
+        Exclusión entre procesos para una secuencia de escrituras. Al tomarlo
+        se relee el índice: otro proceso pudo haberlo modificado.
+        """
+        with open(os.path.join(self.directorio, ARCHIVO_BLOQUEO), "a") as candado:
+            if fcntl is not None:
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            try:
+                self.meta = self._leer_meta()
+                self._abrir()
+                yield self
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(candado, fcntl.LOCK_UN)
+
+    def _crecer(self, elementos):
+        """Reconstruye la tabla con capacidad para `elementos` huellas."""
+        capacidad = _capacidad_para(elementos)
+        anterior = self.meta["archivo"]
+        archivo = f"huellas-{capacidad}.bin"
+        mapa = np.memmap(os.path.join(self.directorio, archivo), dtype=np.uint64, mode="w+",
+                         shape=(2, capacidad))
+        usadas = self.tabla != _VACIO
+        if usadas.any():
+            _sondear(self.tabla[usadas], self.origenes[usadas], mapa[0], mapa[1])
+        mapa.flush()
+        self.tabla, self.origenes = mapa[0], mapa[1]
+        self.meta.update(capacidad=capacidad, archivo=archivo)
+        self._guardar_meta()
+        if anterior and anterior != archivo:
+            os.remove(os.path.join(self.directorio, anterior))
+
+    # --- Oleadas --------------------------------------------------------
+    def _id_oleada(self, oleada):
+        registro = self.meta["oleadas"].get(oleada)
+        if registro is None:
+            registro = {"id": len(self.meta["oleadas"]) + 1, "generacion": 0, "firma": None, "filas": 0,
+                        "duplicados_internos": 0, "duplicados_previos": 0, "tasa_duplicados": 0.0,
+                        "sin_clave": False}
+            self.meta["oleadas"][oleada] = registro
+        return registro
+
+    @staticmethod
+    def _origen(registro):
+        return (np.uint64(registro["id"]) << np.uint64(_BITS_GENERACION)) | np.uint64(registro["generacion"])
+
+    def tiene_clave(self, df):
+        """True si el lote trae una clave de encuestado real (no un ID numerado al cargar)."""
+        return all(c in df.columns for c in self.columnas) and not df.attrs.get("id_generado", False)
+
+    def firma(self, oleada):
+        """Firma de la fuente con que se cargó la oleada por última vez (None si no se cargó)."""
+        return self.meta["oleadas"].get(oleada, {}).get("firma")
+
+    def clasificar(self, df, oleada, nueva_carga=True, firma=None, previas=None):
+        """
+        Estado de cada fila del lote: CONSERVADA, DUPLICADO_INTERNO (clave ya
+        vista en esta carga de la oleada) o DUPLICADO_PREVIO (clave de la
+        carga vigente de una oleada de `previas`). Registra las claves nuevas
+        y actualiza el registro.
+
+        `nueva_carga=True` inicia una carga de la oleada (primer lote); los
+        lotes siguientes de la misma carga usan False. `firma` identifica la
+        fuente de la carga (ver `firma`). `previas` son las oleadas anteriores
+        a esta (por defecto, todas las demás registradas).
+        """
+        registro = self._id_oleada(oleada)
+        if nueva_carga:
+            registro.update(generacion=registro["generacion"] + 1, filas=0,
+                            duplicados_internos=0, duplicados_previos=0, firma=firma)
+        estado = np.full(len(df), CONSERVADA, dtype=np.int8)
+        registro["filas"] += len(df)
+        if not self.tiene_clave(df):
+            registro["sin_clave"] = True
+            self._guardar_meta()
+            return estado
+        registro["sin_clave"] = False
+        if previas is None:
+            previas = list(self.meta["oleadas"])
+        vigentes = np.array([self._origen(self.meta["oleadas"][o]) for o in previas
+                             if o != oleada and o in self.meta["oleadas"]], dtype=np.uint64)
+
+        claves = huellas(df, self.columnas)
+        unicas, primera, inversa = np.unique(claves, return_index=True, return_inverse=True)
+        if self.meta["ocupadas"] + len(unicas) > self.meta["capacidad"] * CARGA_MAXIMA:
+            self._crecer(self.meta["ocupadas"] + len(unicas))
+        propio = self._origen(registro)
+        registrados, insertada, celda = _sondear(unicas, np.full(len(unicas), propio), self.tabla, self.origenes)
+        self.meta["ocupadas"] += int(insertada.sum())
+
+        misma_carga = registrados == propio
+        previa = np.isin(registrados, vigentes)
+        # Claves de una carga anterior de esta oleada, de una carga reemplazada
+        # de otra o de una oleada que no es anterior: se conservan y pasan a
+        # la carga actual
+        reasignadas = ~misma_carga & ~previa
+        self.origenes[celda[reasignadas]] = propio
+        # Si se quitan claves a la carga vigente de otra oleada (oleadas
+        # reordenadas o quitadas), esa carga deja de ser válida
+        cedentes = set(np.unique(registrados[reasignadas]).tolist())
+        for otra, datos_otra in self.meta["oleadas"].items():
+            if otra != oleada and int(self._origen(datos_otra)) in cedentes:
+                datos_otra["firma"] = None
+        self.tabla.flush()
+
+        estado_clave = np.where(insertada | reasignadas, CONSERVADA,
+                                np.where(misma_carga, DUPLICADO_INTERNO, DUPLICADO_PREVIO)).astype(np.int8)
+        estado = estado_clave[inversa.ravel()]
+        # Repeticiones dentro del lote de una clave nueva de esta oleada; las
+        # de una clave de otra oleada siguen siendo duplicados previos
+        repetida = np.ones(len(df), dtype=bool)
+        repetida[primera] = False
+        estado[repetida & (estado == CONSERVADA)] = DUPLICADO_INTERNO
+
+        registro["duplicados_internos"] += int((estado == DUPLICADO_INTERNO).sum())
+        registro["duplicados_previos"] += int((estado == DUPLICADO_PREVIO).sum())
+        registro["tasa_duplicados"] = round(
+            (registro["duplicados_internos"] + registro["duplicados_previos"]) / max(registro["filas"], 1), 6)
+        self._guardar_meta()
+        return estado
+
+    def deduplicar(self, df, oleada, nueva_carga=True, firma=None):
+        """Devuelve (df sin duplicados, resumen) para un lote de la oleada (ver `clasificar`)."""
+        estado = self.clasificar(df, oleada, nueva_carga, firma)
+        resumen = {"oleada": oleada, "filas": len(df), "conservadas": int((estado == CONSERVADA).sum()),
+                   "duplicados_internos": int((estado == DUPLICADO_INTERNO).sum()),
+                   "duplicados_previos": int((estado == DUPLICADO_PREVIO).sum())}
+        return df[estado == CONSERVADA], resumen
+
+    def deduplicar_lotes(self, lotes, oleada):
+        """Deduplica una oleada leída por partes; devuelve un generador de lotes limpios."""
+        for i, lote in enumerate(lotes):
+            limpio, _ = self.deduplicar(lote, oleada, nueva_carga=(i == 0))
+            yield limpio
+
+    def registro(self, oleadas=None):
+        """
+        Tabla de oleadas con filas leídas, duplicados y tasa de duplicados.
+        Con `oleadas`, solo esas (en ese orden) de las que ya se cargaron.
+        """
+        nombres = list(self.meta["oleadas"]) if oleadas is None else [o for o in oleadas if o in self.meta["oleadas"]]
+        if not nombres:
+            return pd.DataFrame(columns=["Oleada", "filas", "duplicados_internos",
+                                         "duplicados_previos", "tasa_duplicados", "sin_clave"])
+        tabla = pd.DataFrame.from_dict({o: self.meta["oleadas"][o] for o in nombres}, orient="index")
+        tabla = tabla.drop(columns=["id", "generacion", "firma"])
+        return tabla.rename_axis("Oleada").reset_index()
+
+    def __len__(self):
+        return self.meta["ocupadas"]
@@ -0,0 +1,156 @@
+"""
+Caché de figuras Plotly ya construidas y serializadas.
+
+Cada figura se identifica por una firma de contenido de sus entradas
+agregadas (tablas pequeñas, no filas de la encuesta) y de su estilo. La
+primera vez se construye, se serializa una sola vez con orjson (o json si no
+está instalado) y se guarda como `FiguraCongelada`; las siguientes ejecuciones,
+pestañas y sesiones del mismo proceso reciben exactamente el mismo objeto.
+
+La caché se acota por bytes del JSON (`MAX_BYTES_FIGURAS`) además de por
+número de figuras: una figura de mapa lleva el GeoJSON completo, así que
+pocas figuras grandes pueden pesar más que muchas pequeñas.
+
+Límite de Streamlit: `st.plotly_chart` no acepta una especificación ya
+serializada. Con cualquier figura llama a `fig.to_dict()` (copia profunda) y
+luego a `plotly.io.to_json` en cada ejecución. `FiguraCongelada` devuelve un
+dict ya JSON-compatible sin copiarlo, así que en cada ejecución solo queda el
+volcado final, que con orjson instalado es del orden de milisegundos aun con
+el GeoJSON del mapa. Construir la figura, validarla y copiar sus datos
+ocurre una sola vez.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:  # opcional: se usa json de la biblioteca estándar
+    orjson = None
+
+MAX_FIGURAS = 128
+MAX_BYTES_FIGURAS = 64 * 1024 * 1024
+
+
+def firma(*entradas):
+    """Hash de contenido de DataFrames, Series, arreglos y valores simples."""
+    h = hashlib.blake2b(digest_size=12)
+
+    def agregar(valor):
+        if isinstance(valor, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+            columnas = valor.columns if isinstance(valor, pd.DataFrame) else [valor.name]
+            h.update(repr([str(c) for c in columnas]).encode("utf-8"))
+        elif isinstance(valor, np.ndarray):
+            h.update(str(valor.dtype).encode("utf-8"))
+            h.update(np.ascontiguousarray(valor).tobytes())
+        elif isinstance(valor, dict):
+            for clave in sorted(valor, key=str):
+                agregar(clave)
+                agregar(valor[clave])
+        elif isinstance(valor, (list, tuple)):
+            h.update(b"[")
+            for elemento in valor:
+                agregar(elemento)
+            h.update(b"]")
+        else:
+            h.update(repr(valor).encode("utf-8"))
+        h.update(b"|")
+
+    for entrada in entradas:
+        agregar(entrada)
+    return h.hexdigest()
+
+
+def serializar(fig):
+    """Figura -> bytes JSON (orjson si está disponible)."""
+    return pio.to_json(fig, validate=False, engine="orjson" if orjson is not None else "json").encode("utf-8")
+
+
+class FiguraCongelada(go.Figure):
+    """
+    Figura de solo lectura cuyo dict JSON-compatible se calcula una vez.
+
+    `to_dict`/`to_plotly_json` devuelven ese dict sin copiarlo, así que no
+    debe modificarse (se comparte entre sesiones). Los bytes serializados no
+    se guardan: solo su tamaño, que usa la caché para su presupuesto.
+    """
+
+    def __init__(self, fig):
+        super().__init__(fig)
+        # Plotly solo admite atributos nuevos con prefijo "_"
+        serializada = serializar(fig)
+        self._bytes_json = len(serializada)
+        self._dict_congelado = orjson.loads(serializada) if orjson is not None else json.loads(serializada)
+
+    @property
+    def bytes_json(self):
+        """Tamaño de la especificación serializada."""
+        return self._bytes_json
+
+    def to_dict(self):
+        return self._dict_congelado
+
+    def to_plotly_json(self):
+        return self._dict_congelado
+
+
+class CacheFiguras:
+    """
+    LRU de figuras congeladas con estadísticas de aciertos, seguro entre hilos.
+
+    Se desalojan las menos usadas mientras se pase de `capacidad` figuras o de
+    `max_bytes` de JSON. Una figura que por sí sola excede `max_bytes` se
+    devuelve sin guardarse.
+    """
+
+    def __init__(self, capacidad=MAX_FIGURAS, max_bytes=MAX_BYTES_FIGURAS):
+        self.capacidad = capacidad
+        self.max_bytes = max_bytes
+        self._figuras = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, nombre, entradas, construir):
+        """
+        Devuelve la figura de `nombre` para esas entradas; si no existe la
+        construye con `construir()` y la congela.
+        """
+        clave = (nombre, firma(*entradas))
+        with self._lock:
+            figura = self._figuras.get(clave)
+            if figura is not None:
+                self._figuras.move_to_end(clave)
+                self.aciertos += 1
+                return figura
+            self.fallos += 1
+        figura = FiguraCongelada(construir())
+        if figura.bytes_json > self.max_bytes:
+            return figura
+        with self._lock:
+            anterior = self._figuras.pop(clave, None)
+            if anterior is not None:  # otro hilo la construyó a la vez
+                self._bytes -= anterior.bytes_json
+            self._figuras[clave] = figura
+            self._bytes += figura.bytes_json
+            while len(self._figuras) > self.capacidad or self._bytes > self.max_bytes:
+                _, desalojada = self._figuras.popitem(last=False)
+                self._bytes -= desalojada.bytes_json
+        return figura
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "figuras": len(self._figuras),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "bytes_json": self._bytes,
+            }
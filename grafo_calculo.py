@@ -0,0 +1,164 @@
+"""
+Grafo de cálculo con invalidación por dependencias.
+
+Cada nodo declara de qué nodos depende. Su clave es la firma de contenido
+de las salidas de sus dependencias (más sus parámetros), así que un cambio
+en una fuente (otra encuesta, un `df_oficial` editado, un cruce regional
+nuevo) solo recalcula los nodos que dependen de ella:
+
+    encuesta_cruda -> encuesta -> histogramas / indice_segmentos / tabla_mapa
+                                  -> kpis, crosstab, scatter, recomendaciones
+    historia -> modelo -> proyeccion -> kpis, recomendaciones
+
+Si un nodo se recalcula y su salida no cambió (misma firma), los nodos de
+abajo siguen siendo aciertos. Cada nodo lleva conteo de aciertos/fallos y
+tiempos, consultables con `estadisticas()`.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from figuras import firma
+
+ENTRADAS_POR_NODO = 4
+
+
+def firma_valor(valor):
+    """
+    Firma de contenido de una salida, o None si no se sabe calcular.
+
+    Objetos propios pueden exponer `huella()` o `as_dict()`.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series, np.ndarray, str, int, float, bool, type(None))):
+        return firma(valor)
+    if isinstance(valor, (list, tuple, dict)):
+        elementos = valor.values() if isinstance(valor, dict) else valor
+        if all(firma_valor(v) is not None for v in elementos):
+            return firma(valor)
+        return None
+    if hasattr(valor, "huella"):
+        return firma(valor.huella())
+    if hasattr(valor, "as_dict"):
+        return firma(valor.as_dict())
+    return None
+
+
+class _Nodo:
+    __slots__ = ("nombre", "funcion", "dependencias", "parametros", "entradas",
+                 "aciertos", "fallos", "segundos_ultimo", "segundos_total", "clave")
+
+    def __init__(self, nombre, funcion, dependencias, parametros):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.dependencias = tuple(dependencias)
+        self.parametros = parametros
+        # clave de entradas -> (valor, firma de la salida)
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.segundos_ultimo = 0.0
+        self.segundos_total = 0.0
+        self.clave = None
+
+
+class GrafoCalculo:
+    """Nodos con dependencias explícitas, memoizados por firma de sus entradas."""
+
+    def __init__(self):
+        self._nodos = {}
+        self._fuentes = {}
+        self._lock = threading.RLock()
+
+    def fuente(self, nombre, valor, firma_contenido=None):
+        """
+        Fija el valor de un nodo fuente. `firma_contenido` evita re-hashear
+        fuentes grandes cuya firma ya se conoce (p. ej. el binario mapeado).
+        """
+        with self._lock:
+            self._fuentes[nombre] = (valor, firma_contenido or firma_valor(valor) or firma(id(valor)))
+
+    def nodo(self, nombre, dependencias=(), **parametros):
+        """Decorador: registra `funcion(*valores_de_dependencias, **parametros)`."""
+        def registrar(funcion):
+            with self._lock:
+                self._nodos[nombre] = _Nodo(nombre, funcion, dependencias, parametros)
+            return funcion
+        return registrar
+
+    def _resolver(self, nombre):
+        """Devuelve (valor, firma de la salida) del nodo, recalculando si hace falta."""
+        if nombre in self._fuentes:
+            return self._fuentes[nombre]
+        if nombre not in self._nodos:
+            raise KeyError(f"Nodo desconocido: '{nombre}'")
+        nodo = self._nodos[nombre]
+        resueltas = [self._resolver(dep) for dep in nodo.dependencias]
+        clave = firma([f for _, f in resueltas], nodo.parametros)
+        nodo.clave = clave
+        if clave in nodo.entradas:
+            nodo.aciertos += 1
+            nodo.entradas.move_to_end(clave)
+            return nodo.entradas[clave]
+
+        nodo.fallos += 1
+        inicio = time.perf_counter()
+        valor = nodo.funcion(*[v for v, _ in resueltas], **nodo.parametros)
+        nodo.segundos_ultimo = time.perf_counter() - inicio
+        nodo.segundos_total += nodo.segundos_ultimo
+        # Sin firma de contenido, la salida se identifica por sus entradas
+        resultado = (valor, firma_valor(valor) or clave)
+        nodo.entradas[clave] = resultado
+        while len(nodo.entradas) > ENTRADAS_POR_NODO:
+            nodo.entradas.popitem(last=False)
+        return resultado
+
+    def obtener(self, nombre):
+        with self._lock:
+            return self._resolver(nombre)[0]
+
+    def __getitem__(self, nombre):
+        return self.obtener(nombre)
+
+    def firma(self, nombre):
+        """Firma de contenido de la salida del nodo (sirve de clave para cachés de abajo)."""
+        with self._lock:
+            return self._resolver(nombre)[1]
+
+    def dependientes(self, nombre):
+        """Nodos que se recalcularían si cambia `nombre` (cierre transitivo)."""
+        afectados, pendientes = set(), [nombre]
+        while pendientes:
+            actual = pendientes.pop()
+            for otro in self._nodos.values():
+                if actual in otro.dependencias and otro.nombre not in afectados:
+                    afectados.add(otro.nombre)
+                    pendientes.append(otro.nombre)
+        return sorted(afectados)
+
+    def estadisticas(self):
+        """Tabla por nodo: dependencias, aciertos, fallos, tiempos y clave actual."""
+        with self._lock:
+            filas = [{
+                "Nodo": n.nombre,
+                "Depende de": ", ".join(n.dependencias),
+                "Aciertos": n.aciertos,
+                "Fallos": n.fallos,
+                "Último cálculo (ms)": round(n.segundos_ultimo * 1000, 2),
+                "Total (ms)": round(n.segundos_total * 1000, 2),
+                "Clave": n.clave,
+            } for n in self._nodos.values()]
+        return pd.DataFrame(filas)
+
+    def dot(self):
+        """Grafo en formato DOT (para st.graphviz_chart)."""
+        lineas = ["digraph {", "rankdir=LR;", "node [shape=box, style=rounded];"]
+        for nombre in self._fuentes:
+            lineas.append(f'"{nombre}" [shape=cylinder];')
+        for n in self._nodos.values():
+            lineas.append(f'"{n.nombre}" [label="{n.nombre}\\n{n.aciertos}✓ {n.fallos}✗"];')
+            lineas.extend(f'"{dep}" -> "{n.nombre}";' for dep in n.dependencias)
+        lineas.append("}")
+        return "\n".join(lineas)
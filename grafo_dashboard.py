@@ -0,0 +1,146 @@
+"""
+Grafo de cálculo del dashboard (ver grafo_calculo.py).
+
+Lo comparten la app de Streamlit y la API de agregados, así que ambas sirven
+los mismos números desde los mismos artefactos: el cubo de edades, el índice
+de segmentos, el modelo nacional y el pronóstico departamental. Las fuentes
+son 'encuesta_cruda' (la encuesta mapeada, con 'Oleada'/'Repetido' si hay
+varias oleadas), 'historia' (la serie oficial) y 'cruce' (regiones ->
+departamentos).
+"""
+import pandas as pd
+
+from grafo_calculo import GrafoCalculo
+from histogramas_edad import COLUMNAS_SEGMENTO, HistogramasEdad
+from indice_segmentos import IndiceSegmentos
+from modelos import backtesting_model
+from pronostico_regional import perfil_regional, pronostico_regional, tabla_departamental
+from recomendaciones import generar_recomendaciones, generar_recomendaciones_por_segmento
+from resultados import ConstructorRecomendaciones, calcular_kpis
+
+FRECUENCIA_ORDER = ('Diario', 'Semanal', 'Ocasional')
+AÑO_OBJETIVO = 2030
+# Tablas del reporte por segmento (las mismas del reporte batch)
+TABLAS = ('kpis', 'crosstab', 'recomendaciones', 'proyecciones', 'departamentos', 'perfil')
+
+
+def construir_grafo():
+    """Grafo con los nodos del dashboard; falta fijar sus fuentes con `fuente`."""
+    grafo = GrafoCalculo()
+
+    @grafo.nodo("muestras_oleadas", ["encuesta_cruda"])
+    def muestras_oleadas(df_crudo):
+        """Filas completas en las columnas de análisis (sin copiar si ya lo están)."""
+        columnas = [c for c in ('Región', 'Variedad', 'Preparación', 'Contexto', 'Frecuencia', 'Edad')
+                    if c in df_crudo.columns]
+        incompletas = df_crudo[columnas].isna().any(axis=1).to_numpy()
+        return df_crudo[~incompletas].reset_index(drop=True) if incompletas.any() else df_crudo
+
+    @grafo.nodo("encuesta", ["muestras_oleadas"])
+    def encuesta_limpia(df_muestras):
+        """Cada encuestado una vez: sin los repetidos de oleadas anteriores."""
+        if 'Repetido' not in df_muestras.columns:
+            return df_muestras
+        repetidos = df_muestras['Repetido'].to_numpy() == 1
+        return df_muestras[~repetidos].drop(columns='Repetido').reset_index(drop=True)
+
+    # Histogramas exactos de Edad (0..120) por Región x Variedad x Preparación
+    # x Frecuencia x Contexto: boxplots, edad promedio y la regla de Cold brew
+    # se resuelven sobre este cubo sin recorrer filas.
+    grafo.nodo("histogramas", ["encuesta"])(HistogramasEdad.desde_dataframe)
+
+    @grafo.nodo("histogramas_oleadas", ["muestras_oleadas"])
+    def histogramas_oleadas(df_muestras):
+        """
+        El mismo cubo con la Oleada como dimensión extra (None si hay una sola
+        fuente). Usa la muestra completa de cada oleada: los encuestados de
+        panel cuentan en todas las oleadas en que respondieron.
+        """
+        if 'Oleada' not in df_muestras.columns:
+            return None
+        return HistogramasEdad.desde_dataframe(df_muestras, COLUMNAS_SEGMENTO + ('Oleada',))
+
+    # Conteos por (Edad, Frecuencia) con bitsets de Preparación y matriz
+    # Frecuencia x Variedad (heatmap y scatter de Estrategia).
+    grafo.nodo("indice_segmentos", ["encuesta"])(IndiceSegmentos.desde_dataframe)
+
+    @grafo.nodo("crosstab", ["indice_segmentos"], frecuencia_order=FRECUENCIA_ORDER)
+    def crosstab(indice, frecuencia_order):
+        return indice.crosstab(list(frecuencia_order))
+
+    @grafo.nodo("scatter", ["indice_segmentos"])
+    def scatter(indice):
+        return indice.scatter()
+
+    @grafo.nodo("tabla_mapa", ["encuesta", "cruce"])
+    def tabla_mapa(df_encuesta, cruce):
+        """Perfil de la encuesta proyectado de regiones cafetaleras a departamentos."""
+        return tabla_departamental(df_encuesta, cruce=cruce)
+
+    @grafo.nodo("modelo", ["historia"], years_to_predict=6)
+    def modelo(historia, years_to_predict):
+        """
+        Backtesting de origen móvil sobre la serie IHCAFE (polinomios,
+        log-lineal, logística); la proyección usa el modelo ganador.
+        """
+        return backtesting_model(historia.copy(), years_to_predict)
+
+    grafo.nodo("proyeccion", ["modelo"])(lambda resultado: resultado[0])
+    grafo.nodo("leaderboard", ["modelo"])(lambda resultado: resultado[1])
+    grafo.nodo("metricas_modelo", ["modelo"])(lambda resultado: resultado[2])
+
+    @grafo.nodo("kpis", ["encuesta", "proyeccion", "historia", "histogramas"])
+    def kpis(df_encuesta, proyeccion, historia, histogramas):
+        """KPIs en un registro compacto."""
+        return calcular_kpis(df_encuesta, proyeccion, historia, histogramas)
+
+    @grafo.nodo("recomendaciones", ["encuesta", "proyeccion", "historia", "metricas_modelo", "histogramas"])
+    def recomendaciones(df_encuesta, proyeccion, historia, metricas, histogramas):
+        """
+        Reglas globales + reglas por segmento (Región x Contexto), en un
+        almacén columnar cuyo texto se renderiza solo al mostrarse.
+        """
+        constructor = ConstructorRecomendaciones()
+        generar_recomendaciones(df_encuesta, proyeccion, historia, metricas, constructor, histogramas)
+        generar_recomendaciones_por_segmento(df_encuesta, ('Región', 'Contexto'), constructor=constructor,
+                                             histogramas=histogramas)
+        return constructor.construir()
+
+    @grafo.nodo("pronostico_regional", ["historia", "encuesta", "cruce"], years_to_predict=6, max_degree=3)
+    def pronostico(historia, df_encuesta, cruce, years_to_predict, max_degree):
+        """
+        Ajusta y proyecta las 18 series departamentales y sus sub-series
+        (Variedad/Contexto) en una sola pasada. Los controles del mapa solo
+        re-colorean sin volver a ajustar.
+        """
+        return pronostico_regional(historia, df_encuesta, years_to_predict, max_degree, cruce=cruce)
+
+    @grafo.nodo("departamentos", ["encuesta", "pronostico_regional", "cruce"], año=AÑO_OBJETIVO)
+    def departamentos(df_encuesta, df_pronostico, cruce, año):
+        """Tabla del mapa con el consumo proyectado para `año`."""
+        return tabla_departamental(df_encuesta, df_pronostico, año, cruce=cruce)
+
+    grafo.nodo("perfil", ["encuesta"])(perfil_regional)
+    return grafo
+
+
+def tablas_reporte(grafo, tablas=TABLAS):
+    """
+    {tabla: DataFrame} de `tablas` para la encuesta fijada en el grafo, en el
+    formato del reporte batch.
+    """
+    resultado = {}
+    for nombre in tablas:
+        if nombre == 'kpis':
+            resultado[nombre] = pd.DataFrame([grafo['kpis'].as_dict()])
+        elif nombre == 'crosstab':
+            # Matriz de oportunidad (heatmap) en formato largo
+            resultado[nombre] = grafo['crosstab'].stack().rename('Conteo').reset_index()
+        elif nombre == 'recomendaciones':
+            resultado[nombre] = pd.DataFrame(list(grafo['recomendaciones']))
+        elif nombre == 'proyecciones':
+            df_pronostico = grafo['pronostico_regional']
+            resultado[nombre] = df_pronostico[df_pronostico['Nivel'] == 'Departamento'].reset_index(drop=True)
+        else:
+            resultado[nombre] = grafo[nombre]
+    return resultado
@@ -0,0 +1,275 @@
+"""
+Histogramas de Edad por segmento, combinables entre particiones.
+
+La edad es entera y acotada, así que un histograma exacto sobre 0..120 es
+un resumen sin pérdida: cuantiles, media, desviación y límites del boxplot
+salen idénticos a los calculados sobre las filas. Se guarda un cubo denso
+(una dimensión por columna de segmento + 121 bins de edad):
+
+- Construirlo es un solo `bincount` por partición (sobre las celdas tocadas);
+  dos cubos se combinan sumándolos (tras alinear categorías), sin volver a
+  leer filas.
+- Cualquier combinación de filtros (incluido un rango de edad) se resuelve
+  sumando celdas del cubo: O(segmentos x 121), independiente de las filas.
+
+El cubo denso crece con el producto de categorías; pasado `MAX_CELDAS` se
+guarda solo las combinaciones de segmentos observadas (a lo sumo una por
+fila), con los mismos resultados.
+"""
+import numpy as np
+import pandas as pd
+
+from indice_segmentos import Categorias
+
+EDAD_MAXIMA = 120
+BINS = EDAD_MAXIMA + 1
+COLUMNAS_SEGMENTO = ('Región', 'Variedad', 'Preparación', 'Frecuencia', 'Contexto')
+MAX_CELDAS = 1 << 22  # 32 MB de int64
+
+
+def _apilar(columnas, filas):
+    """Matriz filas x columnas de códigos (también sin columnas de segmento)."""
+    claves = np.empty((filas, len(columnas)), dtype=np.int64)
+    for j, columna in enumerate(columnas):
+        claves[:, j] = columna
+    return claves
+
+
+class HistogramasEdad:
+    """
+    Cubo (columnas de segmento... x 121) de conteos por edad.
+
+    Si el producto de categorías x 121 pasa de `max_celdas`, el cubo denso se
+    cambia por una tabla dispersa: una fila por combinación de segmentos
+    observada (`segmentos`, códigos) con sus 121 conteos (`conteo_segmentos`).
+    """
+
+    def __init__(self, columnas=COLUMNAS_SEGMENTO, max_celdas=MAX_CELDAS):
+        self.columnas = tuple(columnas)
+        self.categorias = {c: Categorias() for c in self.columnas}
+        self.max_celdas = max_celdas
+        self.conteo = np.zeros((0,) * len(self.columnas) + (BINS,), dtype=np.int64)
+        self.segmentos = None
+        self.conteo_segmentos = None
+        self.descartadas = 0
+
+    @classmethod
+    def desde_dataframe(cls, df, columnas=COLUMNAS_SEGMENTO, max_celdas=MAX_CELDAS):
+        histogramas = cls([c for c in columnas if c in df.columns], max_celdas)
+        histogramas.agregar(df)
+        return histogramas
+
+    @property
+    def disperso(self):
+        return self.conteo is None
+
+    def _forma(self):
+        return tuple(len(self.categorias[c]) for c in self.columnas) + (BINS,)
+
+    def _asegurar_forma(self):
+        """Amplía el cubo denso a las categorías actuales, o lo vuelve disperso si pasa del límite."""
+        forma = self._forma()
+        if self.disperso or forma == self.conteo.shape:
+            return
+        if np.prod(forma, dtype=float) > self.max_celdas:
+            filas = self.conteo.reshape(-1, BINS)
+            ocupadas = np.flatnonzero(filas.any(axis=1))
+            self.segmentos = _apilar(np.unravel_index(ocupadas, self.conteo.shape[:-1]), len(ocupadas))
+            self.conteo_segmentos = filas[ocupadas]
+            self.conteo = None
+            return
+        extra = [(0, len(self.categorias[c]) - n) for c, n in zip(self.columnas, self.conteo.shape)]
+        self.conteo = np.pad(self.conteo, extra + [(0, 0)])
+
+    def _acumular(self, claves, edades, pesos):
+        """Suma `pesos` en las celdas (claves de segmento por fila, edad)."""
+        self._asegurar_forma()
+        if len(edades) == 0:
+            return
+        if not self.disperso:
+            plano = np.ravel_multi_index(tuple(claves.T) + (edades,), self.conteo.shape)
+            celdas, inversa = np.unique(plano, return_inverse=True)
+            # Solo las celdas tocadas: no se reserva un arreglo del tamaño del cubo
+            self.conteo.reshape(-1)[celdas] += np.bincount(inversa, weights=pesos).astype(np.int64)
+            return
+        previas = len(self.segmentos)
+        segmentos, inversa = np.unique(np.concatenate([self.segmentos, claves]), axis=0, return_inverse=True)
+        inversa = inversa.reshape(-1)
+        conteo = np.zeros((len(segmentos), BINS), dtype=np.int64)
+        conteo[inversa[:previas]] = self.conteo_segmentos
+        np.add.at(conteo, (inversa[previas:], edades), pesos)
+        self.segmentos, self.conteo_segmentos = segmentos, conteo
+
+    def _celdas(self):
+        """(claves de segmento, edades, conteos) de las celdas no vacías."""
+        if self.disperso:
+            filas, edades = np.nonzero(self.conteo_segmentos)
+            return self.segmentos[filas], edades, self.conteo_segmentos[filas, edades]
+        indices = np.nonzero(self.conteo)
+        claves = _apilar(indices[:-1], len(indices[-1]))
+        return claves, indices[-1], self.conteo[indices]
+
+    def agregar(self, df):
+        """Incorpora una partición. Filas sin segmento o con edad fuera de 0..120 se descartan."""
+        if df.empty:
+            return self
+        codigos = [self.categorias[c].codigos(df[c]) for c in self.columnas]
+        edad = pd.to_numeric(df['Edad'], errors='coerce').to_numpy(dtype=float)
+        valida = (edad >= 0) & (edad <= EDAD_MAXIMA)
+        for codigo in codigos:
+            valida &= codigo >= 0
+        n = int(valida.sum())
+        claves = _apilar([codigo[valida] for codigo in codigos], n)
+        self._acumular(claves, edad[valida].astype(np.int64), np.ones(n, dtype=np.int64))
+        self.descartadas += int((~valida).sum())
+        return self
+
+    def combinar(self, otro):
+        """Suma los conteos de otra partición (las categorías se alinean por nombre)."""
+        if otro.columnas != self.columnas:
+            raise ValueError("Los histogramas deben tener las mismas columnas de segmento")
+        posiciones = []
+        for c in self.columnas:
+            nuevos = [v for v in otro.categorias[c].valores if v not in set(self.categorias[c].valores)]
+            self.categorias[c].valores.extend(nuevos)
+            posicion = {v: i for i, v in enumerate(self.categorias[c].valores)}
+            posiciones.append(np.array([posicion[v] for v in otro.categorias[c].valores], dtype=np.int64))
+        claves, edades, pesos = otro._celdas()
+        claves = _apilar([p[claves[:, j]] for j, p in enumerate(posiciones)], len(claves))
+        self._acumular(claves, edades, pesos)
+        self.descartadas += otro.descartadas
+        return self
+
+    def histograma(self, filtros=None, por=(), edad=None):
+        """
+        Suma los segmentos que cumplen `filtros` ({columna: [valores]}).
+
+        `por` conserva esas columnas como grupos; `edad=(min, max)` recorta
+        los bins. Devuelve (índice de grupos o None, arreglo grupos x 121).
+        """
+        filtros = filtros or {}
+        por = [por] if isinstance(por, str) else list(por)
+        faltan = [c for c in por if c not in self.columnas]
+        if faltan:
+            raise KeyError(f"El cubo no tiene las columnas de segmento {faltan}")
+        etiquetas, mascaras = {}, {}
+        for c in self.columnas:
+            valores = np.asarray(self.categorias[c].valores, dtype=object)
+            mascaras[c] = np.ones(len(valores), dtype=bool)
+            if c in filtros:
+                mascaras[c] = np.isin(valores, list(filtros[c]))
+            etiquetas[c] = valores[mascaras[c]]
+        if self.disperso:
+            indice, cubo = self._histograma_disperso(mascaras, etiquetas, por)
+        else:
+            cubo = self.conteo
+            for eje, c in enumerate(self.columnas):
+                cubo = np.compress(mascaras[c], cubo, axis=eje)
+            ejes_suma = tuple(eje for eje, c in enumerate(self.columnas) if c not in por)
+            cubo = cubo.sum(axis=ejes_suma)
+            # Reordenar los ejes que quedan según `por`
+            restantes = [c for c in self.columnas if c in por]
+            cubo = np.moveaxis(cubo, [restantes.index(c) for c in por], range(len(por))).reshape(-1, BINS)
+            indice = None
+            if len(por) == 1:
+                indice = pd.Index(etiquetas[por[0]], name=por[0])
+            elif por:
+                indice = pd.MultiIndex.from_product([etiquetas[c] for c in por], names=por)
+        if edad is not None:
+            cubo = cubo.copy()
+            cubo[:, :max(int(edad[0]), 0)] = 0
+            cubo[:, int(edad[1]) + 1:] = 0
+        return indice, cubo
+
+    def _histograma_disperso(self, mascaras, etiquetas, por):
+        """
+        `histograma` sobre la tabla dispersa. Los grupos salen completos
+        (producto de etiquetas, como en el cubo denso) si caben en
+        `max_celdas`; si no, solo los grupos observados.
+        """
+        ejes = {c: j for j, c in enumerate(self.columnas)}
+        dentro = np.ones(len(self.segmentos), dtype=bool)
+        for c in self.columnas:
+            dentro &= mascaras[c][self.segmentos[:, ejes[c]]]
+        segmentos, conteo = self.segmentos[dentro], self.conteo_segmentos[dentro]
+        if not por:
+            return None, conteo.sum(axis=0)[None, :]
+        # Posición de cada código dentro de las etiquetas filtradas
+        posiciones = [np.cumsum(mascaras[c])[segmentos[:, ejes[c]]] - 1 for c in por]
+        forma = tuple(len(etiquetas[c]) for c in por)
+        grupo = np.ravel_multi_index(posiciones, forma)
+        if np.prod(forma, dtype=float) * BINS <= self.max_celdas:
+            cubo = np.zeros((int(np.prod(forma)), BINS), dtype=np.int64)
+            np.add.at(cubo, grupo, conteo)
+            if len(por) == 1:
+                return pd.Index(etiquetas[por[0]], name=por[0]), cubo
+            return pd.MultiIndex.from_product([etiquetas[c] for c in por], names=por), cubo
+        grupos, inversa = np.unique(grupo, return_inverse=True)
+        cubo = np.zeros((len(grupos), BINS), dtype=np.int64)
+        np.add.at(cubo, inversa.reshape(-1), conteo)
+        posiciones = np.unravel_index(grupos, forma)
+        if len(por) == 1:
+            return pd.Index(etiquetas[por[0]][posiciones[0]], name=por[0]), cubo
+        return pd.MultiIndex.from_arrays([etiquetas[c][p] for c, p in zip(por, posiciones)], names=por), cubo
+
+    def estadisticas(self, filtros=None, por=(), edad=None, omitir_vacios=True):
+        """Estadísticas de edad (ver `estadisticas_histograma`) por grupo."""
+        indice, h = self.histograma(filtros, por, edad)
+        tabla = estadisticas_histograma(h)
+        if indice is not None:
+            tabla.index = indice
+        if omitir_vacios:
+            tabla = tabla[tabla['n'] > 0]
+        return tabla
+
+
+def _valor_en_rango(acumulado, rango):
+    """Edad de la observación número `rango` (0-based) en cada fila."""
+    return (acumulado <= rango[:, None]).sum(axis=1)
+
+
+def cuantiles_histograma(h, probabilidades):
+    """Cuantiles con interpolación lineal (igual que np.quantile) para cada fila de h."""
+    h = np.atleast_2d(h)
+    n = h.sum(axis=1)
+    acumulado = np.cumsum(h, axis=1)
+    resultado = np.full((len(h), len(probabilidades)), np.nan)
+    for j, p in enumerate(probabilidades):
+        posicion = p * np.maximum(n - 1, 0)
+        bajo, alto = np.floor(posicion), np.ceil(posicion)
+        v_bajo = _valor_en_rango(acumulado, bajo)
+        v_alto = _valor_en_rango(acumulado, alto)
+        resultado[:, j] = v_bajo + (v_alto - v_bajo) * (posicion - bajo)
+    resultado[n == 0] = np.nan
+    return resultado
+
+
+def estadisticas_histograma(h):
+    """
+    Estadísticas vectorizadas por fila de h (grupos x 121): n, media, std,
+    mínimo, q1, mediana, q3, máximo, límites del boxplot (dato más extremo
+    dentro de 1.5 IQR, como Plotly) y número de atípicos.
+    """
+    h = np.atleast_2d(h).astype(np.int64)
+    edades = np.arange(h.shape[1])
+    n = h.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = (h @ edades) / n
+        varianza = (h @ edades ** 2 - n * media ** 2) / (n - 1)
+    q1, mediana, q3 = cuantiles_histograma(h, (0.25, 0.5, 0.75)).T
+    iqr = q3 - q1
+    presentes = h > 0
+    minimo = np.where(presentes.any(axis=1), presentes.argmax(axis=1), np.nan)
+    maximo = np.where(presentes.any(axis=1), h.shape[1] - 1 - presentes[:, ::-1].argmax(axis=1), np.nan)
+
+    dentro = presentes & (edades >= (q1 - 1.5 * iqr)[:, None]) & (edades <= (q3 + 1.5 * iqr)[:, None])
+    limite_inferior = np.where(dentro.any(axis=1), dentro.argmax(axis=1), np.nan)
+    limite_superior = np.where(dentro.any(axis=1), h.shape[1] - 1 - dentro[:, ::-1].argmax(axis=1), np.nan)
+    atipicos = n - np.where(dentro, h, 0).sum(axis=1)
+
+    return pd.DataFrame({
+        'n': n, 'media': media, 'std': np.sqrt(varianza), 'minimo': minimo,
+        'q1': q1, 'mediana': mediana, 'q3': q3, 'maximo': maximo,
+        'limite_inferior': limite_inferior, 'limite_superior': limite_superior,
+        'atipicos': atipicos,
+    })
@@ -0,0 +1,137 @@
+"""
+Índice de segmentos para la pestaña de Estrategia.
+
+Mantiene, por cada par (Edad, Frecuencia), el conteo de encuestados y un
+bitset de los métodos de Preparación observados, más la matriz de conteos
+Frecuencia x Variedad. Con eso:
+
+- DiversidadMetodo (nunique de Preparación) = popcount del bitset.
+- El scatter y el heatmap salen del índice sin volver a recorrer las filas.
+- Agregar filas nuevas actualiza el índice de forma incremental.
+"""
+import numpy as np
+import pandas as pd
+
+_BITS_POR_PALABRA = 64
+_POPCOUNT_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(palabras):
+    """Cuenta bits encendidos sobre el último eje (arreglo uint64)."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(palabras).sum(axis=-1, dtype=np.int64)
+    bytes_ = palabras.view(np.uint8).reshape(palabras.shape[:-1] + (-1,))
+    return _POPCOUNT_BYTE[bytes_].sum(axis=-1, dtype=np.int64)
+
+
+class Categorias:
+    """
+    Lista de categorías que solo crece, con conversión vectorizada a códigos.
+    También la usan los cubos de `histogramas_edad`.
+    """
+    __slots__ = ("valores",)
+
+    def __init__(self, valores=()):
+        self.valores = list(valores)
+
+    def codigos(self, serie):
+        conocidos = set(self.valores)
+        nuevos = [v for v in pd.unique(serie.dropna()) if v not in conocidos]
+        self.valores.extend(sorted(nuevos, key=str))
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.array.codes.astype(np.int64)
+            if list(serie.cat.categories) == self.valores:
+                return codigos
+            # Recodificar por categoría (un subconjunto puede traer categorías sin uso
+            # que no están en `valores`); el código -1 toma el último elemento
+            posicion = {v: i for i, v in enumerate(self.valores)}
+            tabla = np.array([posicion.get(c, -1) for c in serie.cat.categories] + [-1], dtype=np.int64)
+            return tabla[codigos]
+        return pd.Categorical(serie, categories=self.valores).codes.astype(np.int64)
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class IndiceSegmentos:
+    """Índice incremental (Edad, Frecuencia) -> conteo + bitset de Preparación."""
+
+    def __init__(self, frecuencias=(), variedades=(), preparaciones=()):
+        self.frecuencias = Categorias(frecuencias)
+        self.variedades = Categorias(variedades)
+        self.preparaciones = Categorias(preparaciones)
+        self.conteo = np.zeros((0, len(self.frecuencias)), dtype=np.int64)
+        self.bits = np.zeros((0, len(self.frecuencias), 1), dtype=np.uint64)
+        self.crosstab_conteo = np.zeros((len(self.frecuencias), len(self.variedades)), dtype=np.int64)
+        self.filas = 0
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        indice = cls()
+        indice.agregar(df)
+        return indice
+
+    def _asegurar_forma(self, n_edades):
+        """Amplía los arreglos si aparecen edades o categorías nuevas."""
+        n_palabras = max(1, -(-len(self.preparaciones) // _BITS_POR_PALABRA))
+        forma_actual = self.bits.shape
+        extra_edad = max(0, n_edades - forma_actual[0])
+        extra_frec = len(self.frecuencias) - forma_actual[1]
+        extra_pal = n_palabras - forma_actual[2]
+        if extra_edad or extra_frec or extra_pal:
+            self.conteo = np.pad(self.conteo, ((0, extra_edad), (0, extra_frec)))
+            self.bits = np.pad(self.bits, ((0, extra_edad), (0, extra_frec), (0, extra_pal)))
+        extra_var = len(self.variedades) - self.crosstab_conteo.shape[1]
+        if extra_frec or extra_var:
+            self.crosstab_conteo = np.pad(self.crosstab_conteo, ((0, extra_frec), (0, extra_var)))
+
+    def agregar(self, df):
+        """Incorpora filas nuevas (DataFrame con Edad, Frecuencia, Preparación, Variedad)."""
+        if df.empty:
+            return self
+        edad = df['Edad'].to_numpy()
+        valida = ~pd.isna(edad)
+        edad = np.where(valida, edad, 0).astype(np.int64)
+        if edad.min() < 0:
+            raise ValueError("El índice de segmentos requiere edades no negativas")
+        frec = self.frecuencias.codigos(df['Frecuencia'])
+        prep = self.preparaciones.codigos(df['Preparación'])
+        var = self.variedades.codigos(df['Variedad'])
+        self._asegurar_forma(int(edad.max()) + 1)
+
+        # Igual que groupby: las filas sin Edad/Frecuencia no forman grupo;
+        # una Preparación vacía cuenta en el tamaño pero no en nunique
+        en_grupo = valida & (frec >= 0)
+        np.add.at(self.conteo, (edad[en_grupo], frec[en_grupo]), 1)
+        con_metodo = en_grupo & (prep >= 0)
+        palabra = prep[con_metodo] // _BITS_POR_PALABRA
+        bit = np.left_shift(np.uint64(1), (prep[con_metodo] % _BITS_POR_PALABRA).astype(np.uint64))
+        np.bitwise_or.at(self.bits, (edad[con_metodo], frec[con_metodo], palabra), bit)
+        en_tabla = (frec >= 0) & (var >= 0)
+        np.add.at(self.crosstab_conteo, (frec[en_tabla], var[en_tabla]), 1)
+        self.filas += len(df)
+        return self
+
+    # --- Consultas ---
+    def diversidad(self):
+        """Matriz (edad x frecuencia) con el número de métodos distintos."""
+        return _popcount(self.bits)
+
+    def scatter(self):
+        """Equivalente a groupby(['Edad', 'Frecuencia']).agg(Conteo=size, DiversidadMetodo=nunique)."""
+        edades, frecs = np.nonzero(self.conteo)
+        return pd.DataFrame({
+            'Edad': edades,
+            'Frecuencia': np.asarray(self.frecuencias.valores, dtype=object)[frecs],
+            'Conteo': self.conteo[edades, frecs],
+            'DiversidadMetodo': self.diversidad()[edades, frecs],
+        })
+
+    def crosstab(self, frecuencia_order=None):
+        """Equivalente a pd.crosstab(df['Frecuencia'], df['Variedad']) (reindexado)."""
+        tabla = pd.DataFrame(self.crosstab_conteo, index=pd.Index(self.frecuencias.valores, name='Frecuencia'),
+                             columns=pd.Index(self.variedades.valores, name='Variedad'))
+        tabla = tabla.loc[:, tabla.sum(axis=0) > 0].sort_index(axis=1)
+        if frecuencia_order is not None:
+            tabla = tabla.reindex(frecuencia_order, axis=0).fillna(0).astype(np.int64)
+        return tabla
@@ -0,0 +1,63 @@
+"""
+Modelo predictivo del consumo nacional elegido por backtesting.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error, r2_score
+
+from backtesting import CANDIDATOS, backtest, pronosticar, seleccion
+
+
+def backtesting_model(df_history, years_to_predict=6, candidatos=None):
+    """
+    Elige el modelo de la serie nacional con backtesting de origen móvil
+    (polinomios, log-lineal, logística) y proyecta con el ganador.
+
+    Devuelve (df_combined, leaderboard, metrics). El intervalo de confianza
+    usa el RMSE fuera de muestra del backtest, no los residuos del ajuste.
+    Si la serie es tan corta que ningún candidato se pudo evaluar, se usa el
+    que menos puntos necesita y el intervalo queda vacío (NaN).
+    """
+    X = df_history['Año'].to_numpy(dtype=float)
+    y = df_history['Consumo'].to_numpy(dtype=float)
+
+    leaderboard = backtest(X, y, candidatos)
+    modelo = seleccion(leaderboard).iloc[0]
+    rmse_backtest = float(leaderboard.loc[leaderboard['Rango'] == 1, 'RMSE'].iloc[0])
+    if not np.isfinite(rmse_backtest):
+        modelo = min(candidatos or CANDIDATOS, key=lambda nombre: CANDIDATOS[nombre][2])
+        rmse_backtest = np.nan
+
+    last_year = df_history['Año'].max()
+    prediction_years = np.arange(last_year + 1, last_year + years_to_predict + 1)
+    predicted_consumption = pronosticar(X, y[:, None], [modelo], prediction_years)[:, 0]
+    y_pred_all = pronosticar(X, y[:, None], [modelo], X)[:, 0]
+
+    if np.isnan(rmse_backtest):
+        confianza_baja = confianza_alta = np.full(len(prediction_years), np.nan)
+    else:
+        confianza_baja = (predicted_consumption - 1.96 * rmse_backtest).round(0).astype(int)
+        confianza_alta = (predicted_consumption + 1.96 * rmse_backtest).round(0).astype(int)
+
+    df_predictions = pd.DataFrame({
+        'Año': prediction_years,
+        'Consumo': predicted_consumption.round(0).astype(int),
+        'Confianza_Baja': confianza_baja,
+        'Confianza_Alta': confianza_alta,
+        'Tipo': 'Proyección'
+    })
+
+    df_history['Tipo'] = 'Histórico'
+    df_history['Confianza_Baja'] = df_history['Consumo']
+    df_history['Confianza_Alta'] = df_history['Consumo']
+    df_combined = pd.concat([df_history, df_predictions], ignore_index=True)
+
+    metrics = {
+        'modelo': modelo,
+        'grado_polinomio': int(modelo.rsplit(' ', 1)[1]) if modelo.startswith('Polinomio') else None,
+        'r2_score': r2_score(y, y_pred_all),
+        'mse': mean_squared_error(y, y_pred_all),
+        'rmse_backtest': rmse_backtest,
+        'intervalo_confianza': rmse_backtest
+    }
+    return df_combined, leaderboard, metrics
@@ -0,0 +1,145 @@
+"""
+Normalización y validación de la encuesta al momento de la carga.
+
+Los textos se limpian una sola vez por valor distinto (factorize -> lookup ->
+take), no fila por fila: el costo escala con la cantidad de valores únicos.
+Las filas inválidas se separan en una tabla de cuarentena con su motivo.
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Subir este número invalida los datasets ya normalizados y cacheados
+VERSION_NORMALIZACION = 4
+
+RANGO_EDAD = (12, 100)
+
+# Nombres canónicos de columnas
+COLUMNAS = ("ID", "Variedad", "Preparación", "Región", "Contexto", "Frecuencia", "Edad")
+COLUMNAS_CATEGORICAS = ("Variedad", "Preparación", "Región", "Contexto", "Frecuencia")
+
+# Valores canónicos por columna. Cualquier variante de mayúsculas, tildes,
+# guiones o espacios se resuelve contra estas tablas.
+CATALOGOS = {
+    "Variedad": ["Caturra", "Bourbon", "Pacas", "Lempira", "Typica", "Catuaí", "Parainema", "IHCAFE 90"],
+    "Preparación": ["Colado", "Espresso", "Cold brew", "Cappuccino", "De olla", "Instantáneo",
+                    "Americano", "Latte", "Prensa francesa"],
+    "Región": ["Copán", "Comayagua", "Agalta", "El Paraíso", "Montecillos", "Opalaca"],
+    "Contexto": ["Hogar", "Oficina", "Cafetería"],
+    "Frecuencia": ["Diario", "Semanal", "Ocasional"],
+}
+
+# Sinónimos frecuentes en las exportaciones (clave ya normalizada -> canónico)
+ALIAS = {
+    "Preparación": {"coldbrew": "Cold brew", "expreso": "Espresso", "capuchino": "Cappuccino",
+                    "capuccino": "Cappuccino", "cafe de olla": "De olla", "instant": "Instantáneo"},
+    "Región": {"paraiso": "El Paraíso"},
+    "Contexto": {"casa": "Hogar", "trabajo": "Oficina", "cafe": "Cafetería"},
+    "Frecuencia": {"diaria": "Diario", "diariamente": "Diario", "semanalmente": "Semanal",
+                   "ocasionalmente": "Ocasional"},
+    "Variedad": {"catuai": "Catuaí", "ihcafe-90": "IHCAFE 90"},
+}
+
+
+def clave(texto):
+    """Clave de comparación: sin tildes, minúsculas, espacios/guiones colapsados."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[\s_\-]+", " ", texto).strip().casefold()
+    return texto
+
+
+def _tabla_canonica(columna):
+    tabla = {clave(valor): valor for valor in CATALOGOS.get(columna, [])}
+    tabla.update({clave(k): v for k, v in ALIAS.get(columna, {}).items()})
+    return tabla
+
+
+_TABLAS = {columna: _tabla_canonica(columna) for columna in CATALOGOS}
+_TABLA_COLUMNAS = {clave(c): c for c in COLUMNAS}
+_TABLA_COLUMNAS.update({"region": "Región", "preparacion": "Preparación", "edad anos": "Edad", "id": "ID"})
+
+
+def normalizar_columnas(df):
+    """Quita BOM/espacios de los encabezados y los lleva a su nombre canónico."""
+    nombres = {}
+    for original in df.columns:
+        limpio = str(original).lstrip("\ufeff").strip()
+        nombres[original] = _TABLA_COLUMNAS.get(clave(limpio), limpio)
+    return df.rename(columns=nombres)
+
+
+def normalizar_categoria(serie, columna):
+    """
+    Mapea una columna de texto a sus valores canónicos.
+
+    Devuelve (serie_normalizada, desconocidos) donde `desconocidos` marca las
+    filas con valores vacíos. Los valores que no están en el catálogo se
+    conservan con espacios colapsados (son categorías nuevas, no errores).
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    tabla = _TABLAS.get(columna, {})
+    canonicos = []
+    for valor in unicos:
+        texto = re.sub(r"\s+", " ", str(valor)).strip()
+        canonicos.append(tabla.get(clave(texto), texto) if texto else None)
+    canonicos = np.array(canonicos + [None], dtype=object)
+    # El sentinel -1 toma el último elemento (None)
+    valores = canonicos[codigos]
+    return pd.Series(valores, index=serie.index, name=columna), pd.isna(valores)
+
+
+def normalizar_encuesta(df):
+    """
+    Limpia y valida la encuesta.
+
+    Devuelve (df_limpio, df_cuarentena). La cuarentena conserva las filas
+    originales más una columna 'Motivo'.
+    """
+    df = normalizar_columnas(df)
+    motivos = pd.Series("", index=df.index, dtype=object)
+    limpio = pd.DataFrame(index=df.index)
+
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna not in df.columns:
+            continue
+        limpio[columna], vacios = normalizar_categoria(df[columna], columna)
+        motivos[vacios] = motivos[vacios] + f"{columna} vacío; "
+
+    if "Edad" in df.columns:
+        edad = pd.to_numeric(df["Edad"], errors="coerce")
+        fuera = ~edad.between(*RANGO_EDAD) | (edad % 1 != 0)
+        motivos[fuera] = motivos[fuera] + f"Edad fuera de rango {RANGO_EDAD}; "
+        limpio["Edad"] = edad
+
+    # Generar una columna 'ID' si no existe, solo por si acaso. El ID es texto:
+    # las exportaciones pueden traer códigos como "HN-0001"
+    id_generado = "ID" not in df.columns
+    if id_generado:
+        ids = pd.Series(np.arange(1, len(df) + 1), index=df.index).astype(str)
+    else:
+        ids = df["ID"].astype("string").str.strip()
+        vacio = (ids.isna() | (ids == "")).to_numpy(dtype=bool)
+        motivos[vacio] = motivos[vacio] + "ID vacío; "
+        # Un ID repetido dentro del archivo: se conserva la primera fila válida
+        validas = motivos == ""
+        repetido = ids.where(validas).duplicated() & validas
+        motivos[repetido] = motivos[repetido] + "ID repetido; "
+    limpio.insert(0, "ID", ids)
+
+    # Columnas adicionales se conservan tal cual
+    for columna in df.columns:
+        if columna not in limpio.columns:
+            limpio[columna] = df[columna]
+
+    malas = motivos != ""
+    cuarentena = df[malas].assign(Motivo=motivos[malas].str.rstrip("; "))
+    limpio = limpio[~malas].reset_index(drop=True)
+    if "Edad" in limpio.columns:
+        limpio["Edad"] = limpio["Edad"].astype(np.int64)
+    limpio["ID"] = limpio["ID"].astype(str)
+    # Un ID numerado al cargar no identifica al encuestado entre oleadas
+    limpio.attrs["id_generado"] = id_generado
+    return limpio, cuarentena
@@ -0,0 +1,212 @@
+"""
+Pronóstico regional del consumo de café.
+
+Desagrega la serie nacional (IHCAFE) por departamento según la participación
+observada en la encuesta, junto con sub-series por Variedad y Contexto (canal),
+y proyecta todas las series con el modelo que gana el backtest de origen
+móvil de la serie nacional (ver `backtesting`), en un solo ajuste matricial.
+
+La encuesta registra regiones cafetaleras, no departamentos: todos los
+agregados por región se llevan a departamentos con el cruce precalculado de
+`cruce_regiones` (un producto de matriz dispersa).
+"""
+import numpy as np
+import pandas as pd
+
+from backtesting import backtest, candidatos_hasta_grado, pronosticar, seleccion
+from cruce_regiones import DEPARTAMENTOS_HN, cargar_cruce
+
+def agregados_regionales(df):
+    """
+    Agregados aditivos por Región (conteo, suma de edades y conteos por
+    Variedad/Preparación), listos para proyectarse con el cruce.
+    """
+    if 'Región' not in df.columns or df.empty:
+        return pd.DataFrame({'Conteo': []}, index=pd.Index([], name='Región'))
+
+    region = df['Región'].astype(object)
+    partes = [region.value_counts().rename('Conteo')]
+    if 'Edad' in df.columns:
+        partes.append(df['Edad'].groupby(region).sum().rename('SumaEdad'))
+    for columna in ('Variedad', 'Preparación'):
+        if columna in df.columns:
+            tabla = pd.crosstab(region, df[columna].astype(object))
+            partes.append(tabla.add_prefix(f'{columna}='))
+    return pd.concat(partes, axis=1).fillna(0)
+
+
+def participacion_departamental(df, cruce=None):
+    """
+    Participación de cada departamento en el consumo nacional, según los
+    conteos de la encuesta proyectados de región a departamento.
+
+    Los departamentos que el cruce no cubre quedan con NaN (sin dato, no
+    consumo cero). Devuelve todo NaN si la encuesta no tiene regiones.
+    """
+    if 'Región' in df.columns and not df.empty:
+        cruce = cruce or cargar_cruce()
+        conteo = cruce.proyectar(df['Región'].astype(object).value_counts().to_frame('Conteo'))['Conteo']
+    else:
+        conteo = pd.Series(0.0, index=DEPARTAMENTOS_HN)
+    conteo = conteo.reindex(DEPARTAMENTOS_HN).fillna(0).where(lambda c: c > 0)
+    return conteo / conteo.sum()
+
+
+def _mezcla_condicional(df, columna, cruce):
+    """
+    Matriz P(columna | departamento) con filas = DEPARTAMENTOS_HN.
+
+    Los conteos Región x categoría se proyectan a departamentos con el cruce;
+    los departamentos sin encuestados heredan la mezcla nacional.
+    """
+    nacional = df[columna].value_counts(normalize=True)
+    nacional = nacional[nacional > 0]
+    categorias = nacional.index
+
+    conteos = pd.crosstab(df['Región'].astype(object), df[columna].astype(object))
+    tabla = cruce.proyectar(conteos.reindex(columns=categorias, fill_value=0))
+    totales = tabla.sum(axis=1)
+    tabla = tabla.div(totales.where(totales > 0), axis=0)
+    tabla.loc[totales == 0] = nacional.values
+    return tabla
+
+
+def construir_series_regionales(df_oficial, df, cruce=None):
+    """
+    Construye la matriz de series (años x series) desagregando la serie nacional.
+
+    Devuelve (años, Y, meta) donde `meta` describe cada columna de Y con
+    las columnas Departamento, Nivel ('Departamento', 'Variedad', 'Contexto')
+    y Segmento.
+    """
+    años = df_oficial['Año'].to_numpy()
+    nacional = df_oficial['Consumo'].to_numpy(dtype=float)
+
+    cruce = cruce or cargar_cruce()
+    # Solo hay series para los departamentos con participación observada
+    share = participacion_departamental(df, cruce=cruce).dropna()
+    pesos = [share.to_numpy()]
+    meta = [pd.DataFrame({
+        'Departamento': share.index.to_numpy(),
+        'Nivel': 'Departamento',
+        'Segmento': 'Total'
+    })]
+
+    for columna in ('Variedad', 'Contexto'):
+        if columna not in df.columns or 'Región' not in df.columns or df.empty:
+            continue
+        mezcla = _mezcla_condicional(df, columna, cruce).loc[share.index]
+        # Peso de la sub-serie = participación del depto x P(segmento | depto)
+        sub = mezcla.to_numpy() * share.to_numpy()[:, None]
+        pesos.append(sub.ravel())
+        meta.append(pd.DataFrame({
+            'Departamento': np.repeat(mezcla.index.to_numpy(), mezcla.shape[1]),
+            'Nivel': columna,
+            'Segmento': np.tile(mezcla.columns.to_numpy(), mezcla.shape[0])
+        }))
+
+    pesos = np.concatenate(pesos)
+    Y = nacional[:, None] * pesos[None, :]
+    return años, Y, pd.concat(meta, ignore_index=True)
+
+
+def pronostico_regional(df_oficial, df, years_to_predict=6, max_degree=3, cruce=None):
+    """
+    Pronóstico de todas las series regionales en una sola pasada.
+
+    El modelo (polinomios hasta `max_degree`, log-lineal o logística) se
+    elige una sola vez por backtesting de la serie nacional: cada serie
+    regional es la nacional por una participación constante, y todos los
+    candidatos son invariantes a esa escala, así que un backtest por serie
+    elegiría siempre el mismo modelo. Devuelve un DataFrame largo con
+    columnas Departamento, Nivel, Segmento, Modelo, Año y Consumo
+    (histórico + proyección, con columna Tipo).
+    """
+    años, Y, meta = construir_series_regionales(df_oficial, df, cruce)
+    if Y.shape[1] == 0:
+        return pd.DataFrame(columns=['Departamento', 'Nivel', 'Segmento', 'Modelo', 'Año', 'Consumo', 'Tipo'])
+    nacional = df_oficial['Consumo'].to_numpy(dtype=float)
+    leaderboard = backtest(años, nacional, candidatos_hasta_grado(max_degree))
+    modelos = np.repeat(seleccion(leaderboard).iloc[0], Y.shape[1]).astype(object)
+
+    años_futuros = np.arange(años.max() + 1, años.max() + years_to_predict + 1)
+    proyeccion = pronosticar(años, Y, modelos, años_futuros)
+    proyeccion = np.clip(np.nan_to_num(proyeccion), 0, None)
+
+    todos_los_años = np.concatenate([años, años_futuros])
+    valores = np.vstack([Y, proyeccion])
+    tipo = np.repeat(['Histórico', 'Proyección'], [len(años), len(años_futuros)])
+
+    n_años, n_series = valores.shape
+    resultado = pd.DataFrame({
+        'Departamento': np.tile(meta['Departamento'].to_numpy(), n_años),
+        'Nivel': np.tile(meta['Nivel'].to_numpy(), n_años),
+        'Segmento': np.tile(meta['Segmento'].to_numpy(), n_años),
+        'Modelo': np.tile(modelos, n_años),
+        'Año': np.repeat(todos_los_años, n_series),
+        'Consumo': valores.ravel().round(0).astype(int),
+        'Tipo': np.repeat(tipo, n_series)
+    })
+    return resultado
+
+
+def consumo_departamental(df_pronostico, año):
+    """
+    Consumo total por departamento para un año (Serie indexada por depto).
+    NaN en los departamentos sin muestra en la encuesta.
+    """
+    sel = df_pronostico[(df_pronostico['Nivel'] == 'Departamento') & (df_pronostico['Año'] == año)]
+    return sel.set_index('Departamento')['Consumo'].reindex(DEPARTAMENTOS_HN)
+
+
+def perfil_regional(df):
+    """Perfil del consumidor por Región según la encuesta (df_real)."""
+    perfil = df.groupby("Región", observed=True).agg(
+        EdadPromedio=("Edad", "mean"),
+        Conteo=("ID", "count"),
+        CafeFavorito=("Variedad", lambda x: x.mode()[0]),
+        PreparacionFavorita=("Preparación", lambda x: x.mode()[0])
+    ).reset_index()
+    # Con el dataset mapeado las columnas son categóricas: se devuelven como texto
+    return perfil.astype({c: object for c in perfil.columns if isinstance(perfil[c].dtype, pd.CategoricalDtype)})
+
+
+def _favorito(proyectado, columna):
+    """Categoría con más peso proyectado por departamento (None sin muestra)."""
+    prefijo = f'{columna}='
+    cols = [c for c in proyectado.columns if c.startswith(prefijo)]
+    if not cols:
+        return np.full(len(proyectado), None, dtype=object)
+    valores = proyectado[cols].to_numpy()
+    nombres = np.array([c[len(prefijo):] for c in cols] + [None], dtype=object)
+    indice = np.where(valores.sum(axis=1) > 0, valores.argmax(axis=1), len(cols))
+    return nombres[indice]
+
+
+def tabla_departamental(df, df_pronostico=None, año=None, cruce=None):
+    """
+    Tabla del mapa: los 18 departamentos con el perfil de la encuesta
+    proyectado desde las regiones cafetaleras y, opcionalmente, el consumo
+    proyectado para `año`.
+
+    Conteo es la muestra equivalente asignada al departamento; EdadPromedio y
+    los favoritos quedan vacíos donde ninguna región aporta encuestados.
+    'Cruce' indica de dónde salen los pesos ("aproximado" sin polígonos).
+    """
+    cruce = cruce or cargar_cruce()
+    proyectado = cruce.proyectar(agregados_regionales(df))
+    conteo = proyectado['Conteo'].to_numpy()
+    suma_edad = proyectado['SumaEdad'].to_numpy() if 'SumaEdad' in proyectado else np.full(len(conteo), np.nan)
+
+    df_mapa = pd.DataFrame({
+        "Región": DEPARTAMENTOS_HN,
+        "EdadPromedio": np.round(suma_edad / np.where(conteo > 0, conteo, np.nan), 1),
+        "Conteo": np.rint(conteo).astype(int),
+        "CafeFavorito": _favorito(proyectado, 'Variedad'),
+        "PreparacionFavorita": _favorito(proyectado, 'Preparación'),
+        "Cruce": cruce.origen,
+    })
+
+    if df_pronostico is not None and año is not None:
+        df_mapa["Consumo"] = df_mapa["Región"].map(consumo_departamental(df_pronostico, año))
+    return df_mapa
@@ -0,0 +1,245 @@
+"""
+Prueba de carga del dashboard con sesiones concurrentes simuladas.
+
+Ejecuta app.py en proceso con `streamlit.testing.v1.AppTest`. Cada proceso
+trabajador representa un servidor de Streamlit (con sus propias cachés) y
+dentro de él cada sesión corre en su propio hilo, igual que en el servidor
+real. Las sesiones mueven `rango_edad`, cambian `filtro_region`, el año del
+mapa y la página de recomendaciones; cada interacción provoca un rerun cuya
+latencia se mide.
+
+Cambiar de pestaña no provoca rerun en Streamlit (todas las pestañas se
+renderizan en cada ejecución), así que se registra como acción sin latencia.
+
+El GeoJSON se sirve desde un servidor HTTP local y el dataset se genera con
+el tamaño pedido, de modo que la prueba no depende de la red.
+
+Uso:
+    python prueba_carga.py --tamaños 1000,100000 --sesiones 1,4,8 --pasos 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from generador_sintetico import generar_encuesta
+from pronostico_regional import DEPARTAMENTOS_HN
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+RUTA_APP = os.path.join(DIRECTORIO_APP, "app.py")
+ACCIONES = ("pestaña", "rango_edad", "filtro_region", "año_mapa", "pagina_recomendaciones")
+
+
+# -----------------------------------------------------------------------------
+# Recursos locales (GeoJSON y dataset)
+# -----------------------------------------------------------------------------
+def geojson_sustituto():
+    """18 rectángulos sobre Honduras con la propiedad NAME_1 de GADM."""
+    oeste, este, sur, norte = -89.4, -83.1, 13.0, 16.5
+    ancho = (este - oeste) / len(DEPARTAMENTOS_HN)
+    features = []
+    for i, nombre in enumerate(DEPARTAMENTOS_HN):
+        x0, x1 = oeste + i * ancho, oeste + (i + 1) * ancho
+        features.append({
+            "type": "Feature",
+            "properties": {"NAME_1": nombre},
+            "geometry": {"type": "Polygon",
+                         "coordinates": [[[x0, sur], [x1, sur], [x1, norte], [x0, norte], [x0, sur]]]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def servidor_geojson():
+    """Levanta un servidor HTTP local en un hilo y devuelve (servidor, url)."""
+    cuerpo = json.dumps(geojson_sustituto()).encode("utf-8")
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/gadm41_HND_1.json"
+
+
+def preparar_dataset(filas, directorio, semilla=0):
+    """CSV sintético de `filas` filas (distribuciones sesgadas y correlacionadas)."""
+    ruta = os.path.join(directorio, f"encuesta_{filas}.csv")
+    if not os.path.exists(ruta):
+        generar_encuesta(filas, semilla).to_csv(ruta, index=False, encoding="utf-8")
+    return ruta
+
+
+# -----------------------------------------------------------------------------
+# Sesiones simuladas
+# -----------------------------------------------------------------------------
+def _widget(elementos, etiqueta):
+    for elemento in elementos:
+        if elemento.label == etiqueta:
+            return elemento
+    return None
+
+
+def _aplicar_accion(at, accion, rng):
+    """Modifica un widget según `accion`. Devuelve False si no requiere rerun."""
+    if accion == "rango_edad":
+        slider = _widget(at.slider, "Rango de Edad:")
+        if slider is None:
+            return False
+        inicio = rng.randint(18, 50)
+        slider.set_value((inicio, rng.randint(inicio + 5, 90)))
+    elif accion == "filtro_region":
+        selector = _widget(at.multiselect, "Filtrar Región:")
+        if selector is None or not selector.options:
+            return False
+        selector.set_value(rng.sample(list(selector.options), rng.randint(1, len(selector.options))))
+    elif accion == "año_mapa":
+        selector = _widget(at.select_slider, "Año a visualizar:")
+        if selector is None:
+            return False
+        selector.set_value(rng.choice(list(selector.options)))
+    elif accion == "pagina_recomendaciones":
+        pagina = _widget(at.number_input, "Página de recomendaciones:")
+        if pagina is None:
+            return False
+        pagina.set_value(rng.randint(int(pagina.min), int(pagina.max)))
+    else:
+        return False
+    return True
+
+
+def _sesion(id_sesion, pasos, semilla, registros, errores, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(semilla + id_sesion)
+    at = AppTest.from_file(RUTA_APP, default_timeout=timeout)
+    inicio = time.perf_counter()
+    at.run()
+    registros.append(("inicial", time.perf_counter() - inicio))
+    if at.exception:
+        errores.append(at.exception[0].message)
+    for _ in range(pasos):
+        accion = rng.choice(ACCIONES)
+        if not _aplicar_accion(at, accion, rng):
+            registros.append((accion, None))
+            continue
+        inicio = time.perf_counter()
+        at.run()
+        registros.append((accion, time.perf_counter() - inicio))
+        if at.exception:
+            errores.append(at.exception[0].message)
+
+
+def ejecutar_servidor(config):
+    """Un proceso = un servidor de Streamlit con `sesiones` hilos concurrentes."""
+    os.chdir(DIRECTORIO_APP)
+    os.environ.update(config["entorno"])
+    registros, errores = [], []
+    hilos = [threading.Thread(target=_sesion, args=(i, config["pasos"], config["semilla"],
+                                                     registros, errores, config["timeout"]))
+             for i in range(config["sesiones"])]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    memoria = None
+    if resource is not None:
+        factor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        memoria = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / factor, 1)
+    return {"registros": registros, "errores": errores, "segundos": duracion, "memoria_mb": memoria}
+
+
+# -----------------------------------------------------------------------------
+# Orquestación y reporte
+# -----------------------------------------------------------------------------
+def resumir(resultados_procesos, filas, sesiones, procesos):
+    latencias = np.array([lat for r in resultados_procesos for accion, lat in r["registros"]
+                          if lat is not None and accion != "inicial"])
+    iniciales = np.array([lat for r in resultados_procesos for accion, lat in r["registros"]
+                          if accion == "inicial"])
+    duracion = max(r["segundos"] for r in resultados_procesos)
+    reruns = len(latencias) + len(iniciales)
+    percentil = (lambda q: round(float(np.percentile(latencias, q)) * 1000, 1)) if len(latencias) else (lambda q: None)
+    return {
+        "filas": filas,
+        "procesos": procesos,
+        "sesiones_por_proceso": sesiones,
+        "reruns": reruns,
+        "inicial_p50_ms": round(float(np.median(iniciales)) * 1000, 1) if len(iniciales) else None,
+        "p50_ms": percentil(50),
+        "p95_ms": percentil(95),
+        "p99_ms": percentil(99),
+        "reruns_por_segundo": round(reruns / duracion, 2) if duracion > 0 else None,
+        "memoria_mb_por_proceso": [r["memoria_mb"] for r in resultados_procesos],
+        "errores": sum(len(r["errores"]) for r in resultados_procesos),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard (AppTest en proceso).")
+    parser.add_argument("--tamaños", default="1000", help="Filas del dataset, separadas por coma")
+    parser.add_argument("--sesiones", default="1,4", help="Sesiones concurrentes por proceso, separadas por coma")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos servidor por configuración")
+    parser.add_argument("--pasos", type=int, default=10, help="Interacciones por sesión")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300, help="Timeout por rerun (s)")
+    parser.add_argument("--salida", help="Archivo JSON con los resultados")
+    args = parser.parse_args(argv)
+
+    servidor, url = servidor_geojson()
+    directorio = tempfile.mkdtemp(prefix="prueba_carga_")
+    resultados = []
+    try:
+        for filas in (int(t) for t in args.tamaños.split(",")):
+            ruta = preparar_dataset(filas, directorio, args.semilla)
+            entorno = {
+                "CAFE_URL_GEOJSON": url,
+                "CAFE_RUTA_DATOS": ruta,
+                "CAFE_DIRECTORIO_MMAP": os.path.join(directorio, f"mmap_{filas}"),
+            }
+            for sesiones in (int(s) for s in args.sesiones.split(",")):
+                config = {"entorno": entorno, "sesiones": sesiones, "pasos": args.pasos,
+                          "semilla": args.semilla, "timeout": args.timeout}
+                # Procesos nuevos por configuración: cachés frías, como tras un despliegue
+                with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+                    por_proceso = list(pool.map(ejecutar_servidor, [config] * args.procesos))
+                resumen = resumir(por_proceso, filas, sesiones, args.procesos)
+                resultados.append(resumen)
+                print(f"filas={filas:>9} sesiones={sesiones:>3} x{args.procesos} | "
+                      f"p50={resumen['p50_ms']} ms p95={resumen['p95_ms']} ms p99={resumen['p99_ms']} ms | "
+                      f"{resumen['reruns_por_segundo']} reruns/s | "
+                      f"memoria={resumen['memoria_mb_por_proceso']} MB | errores={resumen['errores']}")
+    finally:
+        servidor.shutdown()
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
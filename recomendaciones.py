@@ -0,0 +1,140 @@
+"""
+Sistema de recomendaciones automáticas.
+
+Las reglas producen un `AlmacenRecomendaciones` (ver resultados.py); las
+reglas por segmento se evalúan de forma vectorizada sobre un groupby, de modo
+que miles de segmentos no generan miles de dicts ni de f-strings.
+"""
+import numpy as np
+import pandas as pd
+
+from resultados import (
+    ConstructorRecomendaciones, PLANTILLA_TENDENCIA, PLANTILLA_DEMOGRAFIA,
+    PLANTILLA_FRECUENCIA, PLANTILLA_GEOGRAFIA, PLANTILLA_PROYECCION, PLANTILLA_MODELO,
+    consumo_en
+)
+
+
+def generar_recomendaciones(df, df_proyeccion, df_oficial, metrics_modelo, constructor=None, histogramas=None):
+    """
+    Genera recomendaciones estratégicas basadas en el análisis de datos.
+
+    `histogramas` (HistogramasEdad de la misma encuesta) es opcional: si se
+    da, las reglas de edad se resuelven sobre el cubo de edades.
+    """
+    rec = constructor or ConstructorRecomendaciones()
+
+    # 1. ANÁLISIS DE TENDENCIAS DE CONSUMO
+    crecimiento_historico = ((df_oficial['Consumo'].iloc[-1] - df_oficial['Consumo'].iloc[0]) /
+                             df_oficial['Consumo'].iloc[0]) * 100
+
+    if crecimiento_historico > 100:
+        rec.agregar(PLANTILLA_TENDENCIA, crecimiento_historico, len(df_oficial))
+
+    # 2-4. ANÁLISIS DE LA ENCUESTA (edad, frecuencia, región)
+    _reglas_encuesta(df, rec, histogramas)
+
+    # 5. PROYECCIÓN FUTURA (solo si la serie oficial cubre 2024 y la proyección llega a 2030)
+    consumo_2030 = consumo_en(df_proyeccion, 2030)
+    consumo_2024 = consumo_en(df_oficial, 2024)
+    if consumo_2030 is not None and consumo_2024:
+        crecimiento_proyectado = ((consumo_2030 - consumo_2024) / consumo_2024) * 100
+        if crecimiento_proyectado > 50:
+            rec.agregar(PLANTILLA_PROYECCION, crecimiento_proyectado)
+
+    # 6. CALIDAD DEL MODELO
+    if metrics_modelo['r2_score'] > 0.95:
+        rec.agregar(PLANTILLA_MODELO, metrics_modelo['r2_score'])
+
+    return rec.construir() if constructor is None else rec
+
+
+def _usa_histogramas(histogramas, columnas):
+    return histogramas is not None and all(c in histogramas.columnas for c in columnas)
+
+
+def _reglas_encuesta(df, rec, histogramas=None):
+    """Reglas de la encuesta para el conjunto completo (segmento General)."""
+    if 'Edad' in df.columns and 'Preparación' in df.columns:
+        if _usa_histogramas(histogramas, ['Preparación']):
+            edad_coldbrew = histogramas.estadisticas({'Preparación': ['Cold brew']},
+                                                     omitir_vacios=False)['media'].iloc[0]
+        else:
+            edad_coldbrew = df[df['Preparación'] == 'Cold brew']['Edad'].mean()
+        if edad_coldbrew < 35:
+            rec.agregar(PLANTILLA_DEMOGRAFIA, edad_coldbrew)
+
+    if 'Frecuencia' in df.columns:
+        frecuencia_diaria = (df['Frecuencia'] == 'Diario').mean() * 100
+        if frecuencia_diaria < 50:
+            rec.agregar(PLANTILLA_FRECUENCIA, frecuencia_diaria)
+
+    if 'Región' in df.columns and not df.empty:
+        # Solo regiones presentes (las categóricas reportan también conteos en 0)
+        region_counts = df['Región'].value_counts()
+        region_counts = region_counts[region_counts > 0]
+        if region_counts.iloc[0] > region_counts.iloc[-1] * 3:
+            rec.agregar(PLANTILLA_GEOGRAFIA, t0=region_counts.index[0], t1=region_counts.index[-1])
+
+
+def _etiquetas(indice):
+    """Etiquetas legibles ('Copán · Hogar') para un índice (posiblemente multi-nivel)."""
+    if isinstance(indice, pd.MultiIndex):
+        return [' · '.join(map(str, valores)) for valores in indice]
+    return [str(valor) for valor in indice]
+
+
+def generar_recomendaciones_por_segmento(df, columnas=('Región', 'Contexto'), min_muestra=20, constructor=None,
+                                         histogramas=None):
+    """
+    Evalúa las reglas de la encuesta para cada segmento definido por `columnas`.
+
+    Todas las estadísticas se calculan con un solo groupby por regla y las
+    condiciones se aplican con máscaras booleanas sobre los segmentos.
+    """
+    rec = constructor or ConstructorRecomendaciones()
+    columnas = [c for c in columnas if c in df.columns]
+    if df.empty or not columnas:
+        return rec.construir() if constructor is None else rec
+
+    grupos = df.groupby(columnas, observed=True, sort=True)
+    tamaño = grupos.size()
+    validos = tamaño[tamaño >= min_muestra].index
+
+    # Cold brew: edad promedio por segmento
+    if 'Edad' in df.columns and 'Preparación' in df.columns:
+        if _usa_histogramas(histogramas, columnas + ['Preparación']):
+            edad_coldbrew = histogramas.estadisticas({'Preparación': ['Cold brew']}, por=columnas,
+                                                     omitir_vacios=False)['media'].reindex(validos)
+        else:
+            edad_coldbrew = (df['Edad'].where(df['Preparación'] == 'Cold brew')
+                             .groupby([df[c] for c in columnas], observed=True).mean()
+                             .reindex(validos))
+        mascara = (edad_coldbrew < 35).to_numpy()
+        rec.agregar_bloque(PLANTILLA_DEMOGRAFIA, edad_coldbrew.to_numpy()[mascara],
+                           segmentos=np.asarray(_etiquetas(validos), dtype=object)[mascara])
+
+    # Frecuencia diaria por segmento
+    if 'Frecuencia' in df.columns:
+        diario = ((df['Frecuencia'] == 'Diario')
+                  .groupby([df[c] for c in columnas], observed=True).mean()
+                  .reindex(validos) * 100)
+        mascara = (diario < 50).to_numpy()
+        rec.agregar_bloque(PLANTILLA_FRECUENCIA, diario.to_numpy()[mascara],
+                           segmentos=np.asarray(_etiquetas(validos), dtype=object)[mascara])
+
+    # Dominancia regional dentro de cada segmento (solo si Región no segmenta)
+    if 'Región' in df.columns and 'Región' not in columnas:
+        tabla = pd.crosstab([df[c] for c in columnas], df['Región']).reindex(validos)
+        conteos = tabla.to_numpy()
+        # Igual que value_counts: solo regiones presentes en el segmento
+        presentes = np.where(conteos > 0, conteos, np.iinfo(np.int64).max)
+        i_max, i_min = conteos.argmax(axis=1), presentes.argmin(axis=1)
+        filas = np.arange(len(conteos))
+        mascara = conteos[filas, i_max] > conteos[filas, i_min] * 3
+        regiones = tabla.columns.to_numpy()
+        rec.agregar_bloque(PLANTILLA_GEOGRAFIA, np.zeros(mascara.sum()),
+                           t0=regiones[i_max[mascara]], t1=regiones[i_min[mascara]],
+                           segmentos=np.asarray(_etiquetas(validos), dtype=object)[mascara])
+
+    return rec.construir() if constructor is None else rec
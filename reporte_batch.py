@@ -0,0 +1,230 @@
+"""
+Reporte batch (sin navegador) de los números del dashboard por segmento.
+
+Reutiliza la carga de datos, los modelos y las recomendaciones del dashboard
+fuera de Streamlit, procesa los segmentos en paralelo con un pool de procesos
+y escribe los resultados en Parquet o JSON.
+
+La encuesta se normaliza una sola vez en el proceso principal (que también
+escribe la cuarentena) y se exporta al dataset mapeado de
+`datos_compartidos`; los trabajadores solo mapean ese binario.
+
+Uso:
+    python reporte_batch.py --salida reportes/ --por Región,Contexto --procesos 4
+    python reporte_batch.py --segmentos segmentos.json --formato json
+
+Formato de segmentos.json:
+    [{"nombre": "Jóvenes Copán", "filtros": {"Región": ["Copán"], "Edad": [18, 35]}}, ...]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from datos import RUTA_DATOS, RUTA_OFICIAL, cargar_serie_oficial
+from datos_compartidos import DIRECTORIO_MMAP, abrir_encuesta, preparar_encuesta_compartida
+from grafo_dashboard import AÑO_OBJETIVO, FRECUENCIA_ORDER, TABLAS
+from modelos import backtesting_model
+from pronostico_regional import perfil_regional, pronostico_regional, tabla_departamental
+from recomendaciones import generar_recomendaciones
+from resultados import calcular_kpis
+
+
+# Estado por proceso trabajador (se carga una sola vez en el initializer)
+_CONTEXTO = {}
+
+
+# -----------------------------------------------------------------------------
+# Segmentos
+# -----------------------------------------------------------------------------
+def segmentos_por_columnas(df, columnas):
+    """Un segmento 'General' más uno por cada combinación presente de `columnas`."""
+    segmentos = [{"nombre": "General", "filtros": {}}]
+    columnas = [c for c in columnas if c in df.columns]
+    if not columnas:
+        return segmentos
+    combinaciones = df[columnas].drop_duplicates().sort_values(columnas).itertuples(index=False)
+    for valores in combinaciones:
+        segmentos.append({
+            "nombre": " · ".join(map(str, valores)),
+            "filtros": {c: [v] for c, v in zip(columnas, valores)}
+        })
+    return segmentos
+
+
+def filtrar_segmento(df, filtros):
+    """Aplica los filtros de un segmento. 'Edad' acepta un rango [min, max]."""
+    mascara = pd.Series(True, index=df.index)
+    for columna, valores in filtros.items():
+        if columna == 'Edad':
+            mascara &= df['Edad'].between(valores[0], valores[1])
+        else:
+            valores = valores if isinstance(valores, list) else [valores]
+            mascara &= df[columna].isin(valores)
+    return df[mascara]
+
+
+# -----------------------------------------------------------------------------
+# Cálculo por segmento
+# -----------------------------------------------------------------------------
+def _inicializar_trabajador(directorio_mmap, meta, df_oficial, df_proyeccion, metrics_modelo):
+    _CONTEXTO['df'] = abrir_encuesta(directorio_mmap, meta)
+    _CONTEXTO['df_oficial'] = df_oficial
+    _CONTEXTO['df_proyeccion'] = df_proyeccion
+    _CONTEXTO['metrics_modelo'] = metrics_modelo
+
+
+def calcular_reporte_segmento(df_segmento, df_oficial, df_proyeccion, metrics_modelo):
+    """
+    Números del dashboard para un subconjunto de la encuesta.
+
+    Devuelve un dict {tabla: DataFrame} con las tablas de TABLAS.
+    """
+    kpis = calcular_kpis(df_segmento, df_proyeccion, df_oficial)
+
+    # Matriz de oportunidad (heatmap) en formato largo
+    df_crosstab = pd.crosstab(df_segmento['Frecuencia'], df_segmento['Variedad'])
+    df_crosstab = df_crosstab.reindex(list(FRECUENCIA_ORDER), axis=0).fillna(0).astype(int)
+    crosstab = (df_crosstab.rename_axis(index='Frecuencia', columns='Variedad')
+                .stack().rename('Conteo').reset_index())
+
+    recomendaciones = pd.DataFrame(list(
+        generar_recomendaciones(df_segmento, df_proyeccion, df_oficial, metrics_modelo)
+    ))
+
+    df_pronostico = pronostico_regional(df_oficial, df_segmento)
+    proyecciones = df_pronostico[df_pronostico['Nivel'] == 'Departamento']
+    departamentos = tabla_departamental(df_segmento, df_pronostico, AÑO_OBJETIVO)
+
+    return {
+        'kpis': pd.DataFrame([kpis.as_dict()]),
+        'crosstab': crosstab,
+        'recomendaciones': recomendaciones,
+        'proyecciones': proyecciones.reset_index(drop=True),
+        'departamentos': departamentos,
+        'perfil': perfil_regional(df_segmento),
+    }
+
+
+def _procesar_segmento(segmento):
+    df_segmento = filtrar_segmento(_CONTEXTO['df'], segmento['filtros'])
+    if df_segmento.empty:
+        return segmento['nombre'], None
+    tablas = calcular_reporte_segmento(df_segmento, _CONTEXTO['df_oficial'],
+                                       _CONTEXTO['df_proyeccion'], _CONTEXTO['metrics_modelo'])
+    for tabla in tablas.values():
+        tabla.insert(0, 'SegmentoCliente', segmento['nombre'])
+    return segmento['nombre'], tablas
+
+
+# -----------------------------------------------------------------------------
+# Escritura y métricas
+# -----------------------------------------------------------------------------
+def escribir_tabla(df, ruta_base, formato):
+    if formato == 'parquet':
+        # Parquet requiere columnas de texto homogéneas
+        for columna in df.columns[df.dtypes == object]:
+            df[columna] = df[columna].astype(str)
+        df.to_parquet(ruta_base + '.parquet', index=False)
+    else:
+        df.to_json(ruta_base + '.json', orient='records', force_ascii=False, indent=1)
+
+
+def memoria_pico_mb():
+    """Memoria residente pico (MB) del proceso principal y de los trabajadores."""
+    if resource is None:
+        return None, None
+    # En Linux ru_maxrss está en KB; en macOS en bytes
+    factor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / factor
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / factor
+    return round(propio, 1), round(hijos, 1)
+
+
+def ejecutar(ruta_datos, segmentos, salida, formato='parquet', procesos=None, chunksize=8,
+             ruta_oficial=RUTA_OFICIAL, directorio_mmap=DIRECTORIO_MMAP):
+    """Procesa todos los segmentos y escribe una tabla por tipo de resultado."""
+    inicio = time.perf_counter()
+    # Una sola lectura y normalización; los trabajadores reciben solo la metadata
+    meta = preparar_encuesta_compartida(ruta_datos, directorio_mmap)
+
+    # Los modelos nacionales no dependen del segmento: se entrenan una sola vez
+    # (la misma serie oficial y el mismo modelo elegido por backtesting que usa el dashboard)
+    df_oficial = cargar_serie_oficial(ruta_oficial)
+    df_proyeccion, _, metrics_modelo = backtesting_model(df_oficial.copy(), years_to_predict=6)
+
+    resultados = {tabla: [] for tabla in TABLAS}
+    vacios = []
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador,
+                             initargs=(directorio_mmap, meta, df_oficial, df_proyeccion, metrics_modelo)) as pool:
+        for nombre, tablas in pool.map(_procesar_segmento, segmentos, chunksize=chunksize):
+            if tablas is None:
+                vacios.append(nombre)
+                continue
+            for tabla, valor in tablas.items():
+                resultados[tabla].append(valor)
+
+    os.makedirs(salida, exist_ok=True)
+    for tabla, partes in resultados.items():
+        if partes:
+            escribir_tabla(pd.concat(partes, ignore_index=True), os.path.join(salida, tabla), formato)
+    escribir_tabla(df_proyeccion, os.path.join(salida, 'proyeccion_nacional'), formato)
+
+    duracion = time.perf_counter() - inicio
+    pico_principal, pico_trabajadores = memoria_pico_mb()
+    resumen = {
+        'segmentos': len(segmentos),
+        'segmentos_vacios': vacios,
+        'segundos': round(duracion, 3),
+        'segmentos_por_segundo': round(len(segmentos) / duracion, 2) if duracion > 0 else None,
+        'memoria_pico_mb_principal': pico_principal,
+        'memoria_pico_mb_trabajador': pico_trabajadores,
+    }
+    with open(os.path.join(salida, 'resumen.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reporte batch del dashboard de consumo de café.")
+    parser.add_argument('--datos', default=RUTA_DATOS, help="CSV de la encuesta")
+    parser.add_argument('--oficial', default=RUTA_OFICIAL,
+                        help="CSV de la serie oficial (Año,Consumo); sin archivo se usa la serie fija")
+    parser.add_argument('--salida', default='reportes', help="Directorio de salida")
+    parser.add_argument('--formato', choices=('parquet', 'json'), default='parquet')
+    parser.add_argument('--segmentos', help="JSON con la lista de segmentos a procesar")
+    parser.add_argument('--por', default='Región,Contexto',
+                        help="Columnas para generar segmentos automáticamente (si no se da --segmentos)")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto: CPUs)")
+    parser.add_argument('--chunksize', type=int, default=8, help="Segmentos por tarea enviada al pool")
+    args = parser.parse_args(argv)
+
+    if args.segmentos:
+        with open(args.segmentos, encoding='utf-8') as f:
+            segmentos = json.load(f)
+    else:
+        meta = preparar_encuesta_compartida(args.datos)
+        segmentos = segmentos_por_columnas(abrir_encuesta(DIRECTORIO_MMAP, meta), args.por.split(','))
+
+    resumen = ejecutar(args.datos, segmentos, args.salida, args.formato, args.procesos, args.chunksize,
+                       args.oficial)
+    print(f"✅ {resumen['segmentos']} segmentos en {resumen['segundos']} s "
+          f"({resumen['segmentos_por_segundo']} segmentos/s)")
+    print(f"   Memoria pico: principal {resumen['memoria_pico_mb_principal']} MB, "
+          f"trabajador {resumen['memoria_pico_mb_trabajador']} MB")
+    if resumen['segmentos_vacios']:
+        print(f"   Segmentos sin filas: {len(resumen['segmentos_vacios'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
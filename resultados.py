@@ -0,0 +1,304 @@
+"""
+Objetos de resultados compactos del dashboard.
+
+- `KPIs`: registro con __slots__ para la fila de métricas.
+- `AlmacenRecomendaciones`: almacén columnar (struct-of-arrays) de
+  recomendaciones con códigos internados para categoría, prioridad y plantilla.
+  El texto se genera de forma perezosa solo para los elementos que se muestran.
+"""
+import hashlib
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Tablas de códigos internados
+# -----------------------------------------------------------------------------
+PRIORIDADES = ('ALTA', 'MEDIA', 'BAJA')
+
+CATEGORIAS = (
+    '📈 TENDENCIA DE MERCADO',
+    '👥 DEMOGRAFÍA',
+    '🔄 FRECUENCIA',
+    '🗺️ DISTRIBUCIÓN GEOGRÁFICA',
+    '🔮 PROYECCIÓN',
+    '🎯 PRECISIÓN DEL MODELO',
+)
+
+# Plantillas (categoría, prioridad, mensaje, acción). Los parámetros numéricos
+# se guardan en v0/v1 y los textuales (índices a la tabla de textos) en t0/t1.
+PLANTILLAS = (
+    (0, 0, 'El consumo interno ha crecido un {v0:.0f}% en {v1:.0f} años. Es un mercado en expansión acelerada.',
+     'Aumentar capacidad de producción en un 30% para 2026'),
+    (1, 1, 'El Cold Brew es popular entre jóvenes ({v0:.0f} años promedio).',
+     'Lanzar campaña digital en redes sociales para menores de 35 años'),
+    (2, 0, 'Solo el {v0:.1f}% consume café diariamente.',
+     'Crear programa de fidelización con descuentos progresivos'),
+    (3, 1, '{t0} domina el mercado vs {t1}.',
+     'Explorar oportunidades en {t1} con pilotos de cafeterías'),
+    (4, 0, 'Se proyecta crecimiento del {v0:.0f}% para 2030.',
+     'Planificar expansión de infraestructura para 2028'),
+    (5, 2, 'Modelo predictivo con R²={v0:.3f} (Excelente ajuste).',
+     'Las proyecciones son confiables para planificación estratégica'),
+)
+
+(PLANTILLA_TENDENCIA, PLANTILLA_DEMOGRAFIA, PLANTILLA_FRECUENCIA,
+ PLANTILLA_GEOGRAFIA, PLANTILLA_PROYECCION, PLANTILLA_MODELO) = range(len(PLANTILLAS))
+
+SEGMENTO_GLOBAL = 'General'
+
+_COLUMNAS = ('plantilla', 'prioridad', 'segmento', 'v0', 'v1', 't0', 't1')
+
+
+class KPIs:
+    """Fila de métricas principales del dashboard."""
+    __slots__ = ('total_encuestados', 'region_top', 'metodo_top', 'edad_promedio',
+                 'consumo_2030', 'consumo_2024', 'crecimiento_proyectado')
+
+    def __init__(self, total_encuestados=0, region_top="-", metodo_top="-", edad_promedio=0,
+                 consumo_2030=0, consumo_2024=1, crecimiento_proyectado=0):
+        self.total_encuestados = total_encuestados
+        self.region_top = region_top
+        self.metodo_top = metodo_top
+        self.edad_promedio = edad_promedio
+        self.consumo_2030 = consumo_2030
+        self.consumo_2024 = consumo_2024
+        self.crecimiento_proyectado = crecimiento_proyectado
+
+    def as_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def __getstate__(self):
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def __setstate__(self, estado):
+        for campo, valor in zip(self.__slots__, estado):
+            setattr(self, campo, valor)
+
+    def __eq__(self, otro):
+        return isinstance(otro, KPIs) and self.__getstate__() == otro.__getstate__()
+
+    def __repr__(self):
+        return f"KPIs({self.as_dict()})"
+
+
+def consumo_en(df, año):
+    """Consumo de `df` (columnas Año, Consumo) en `año`, o None si la serie no lo cubre."""
+    if df.empty or año not in df['Año'].values:
+        return None
+    return df[df['Año'] == año]['Consumo'].iloc[0]
+
+
+def calcular_kpis(df, df_proyeccion, df_oficial, histogramas=None):
+    """
+    Calcula la fila de KPIs a partir de la encuesta y la proyección.
+
+    Con `histogramas` (HistogramasEdad de la misma encuesta) la edad promedio
+    sale del cubo de edades en lugar de recorrer las filas.
+    """
+    kpis = KPIs()
+    if not df.empty:
+        kpis.total_encuestados = len(df)
+        kpis.region_top = df['Región'].mode()[0] if 'Región' in df.columns else "N/A"
+        kpis.metodo_top = df['Preparación'].mode()[0] if 'Preparación' in df.columns else "N/A"
+        if histogramas is not None:
+            kpis.edad_promedio = int(histogramas.estadisticas(omitir_vacios=False)['media'].iloc[0])
+        else:
+            kpis.edad_promedio = int(df['Edad'].mean()) if 'Edad' in df.columns else 0
+
+    # Obtener la predicción para 2030 y el crecimiento total proyectado
+    consumo_2030, consumo_2024 = consumo_en(df_proyeccion, 2030), consumo_en(df_oficial, 2024)
+    if consumo_2030 is not None:
+        kpis.consumo_2030 = consumo_2030
+    if consumo_2024 is not None:
+        kpis.consumo_2024 = consumo_2024
+    if kpis.consumo_2024 > 0:
+        kpis.crecimiento_proyectado = ((kpis.consumo_2030 - kpis.consumo_2024) / kpis.consumo_2024) * 100
+    return kpis
+
+
+class AlmacenRecomendaciones:
+    """
+    Recomendaciones en formato columnar.
+
+    Cada recomendación es una fila de arreglos NumPy (plantilla, prioridad,
+    segmento, v0, v1, t0, t1). `textos` y `segmentos` son tablas internadas;
+    t0/t1/segmento son índices a ellas (-1 = sin valor).
+    """
+    __slots__ = _COLUMNAS + ('textos', 'segmentos', '_huella')
+
+    def __init__(self, plantilla=(), prioridad=(), segmento=(), v0=(), v1=(), t0=(), t1=(),
+                 textos=(), segmentos=(SEGMENTO_GLOBAL,)):
+        self.plantilla = np.asarray(plantilla, dtype=np.uint8)
+        self.prioridad = np.asarray(prioridad, dtype=np.uint8)
+        self.segmento = np.asarray(segmento, dtype=np.int32)
+        self.v0 = np.asarray(v0, dtype=np.float64)
+        self.v1 = np.asarray(v1, dtype=np.float64)
+        self.t0 = np.asarray(t0, dtype=np.int32)
+        self.t1 = np.asarray(t1, dtype=np.int32)
+        self.textos = tuple(textos)
+        self.segmentos = tuple(segmentos)
+        self._huella = None
+
+    # --- Tamaño, comparación y cache ---
+    def __len__(self):
+        return len(self.plantilla)
+
+    def __getstate__(self):
+        return tuple(getattr(self, campo) for campo in _COLUMNAS) + (self.textos, self.segmentos)
+
+    def __setstate__(self, estado):
+        for campo, valor in zip(_COLUMNAS + ('textos', 'segmentos'), estado):
+            setattr(self, campo, valor)
+        self._huella = None
+
+    def huella(self):
+        """Hash estable del contenido (para cache y comparación rápida)."""
+        if self._huella is None:
+            h = hashlib.blake2b(digest_size=16)
+            for campo in _COLUMNAS:
+                h.update(np.ascontiguousarray(getattr(self, campo)).tobytes())
+            h.update(repr((self.textos, self.segmentos)).encode('utf-8'))
+            self._huella = h.hexdigest()
+        return self._huella
+
+    def __eq__(self, otro):
+        return isinstance(otro, AlmacenRecomendaciones) and self.huella() == otro.huella()
+
+    def __hash__(self):
+        return hash(self.huella())
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, campo).nbytes for campo in _COLUMNAS)
+
+    # --- Acceso perezoso al texto ---
+    def _parametros(self, i):
+        t0, t1 = self.t0[i], self.t1[i]
+        return {
+            'v0': self.v0[i], 'v1': self.v1[i],
+            't0': self.textos[t0] if t0 >= 0 else '',
+            't1': self.textos[t1] if t1 >= 0 else '',
+        }
+
+    def categoria(self, i):
+        return CATEGORIAS[PLANTILLAS[self.plantilla[i]][0]]
+
+    def prioridad_texto(self, i):
+        return PRIORIDADES[self.prioridad[i]]
+
+    def segmento_texto(self, i):
+        return self.segmentos[self.segmento[i]]
+
+    def mensaje(self, i):
+        return PLANTILLAS[self.plantilla[i]][2].format(**self._parametros(i))
+
+    def accion(self, i):
+        return PLANTILLAS[self.plantilla[i]][3].format(**self._parametros(i))
+
+    def item(self, i):
+        """Vista tipo dict de una recomendación (compatibilidad con el formato anterior)."""
+        return {
+            'categoria': self.categoria(i),
+            'mensaje': self.mensaje(i),
+            'prioridad': self.prioridad_texto(i),
+            'accion': self.accion(i),
+            'segmento': self.segmento_texto(i),
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.item(i)
+
+    # --- Selección ---
+    def orden_por_prioridad(self):
+        """Índices ordenados por prioridad (ALTA primero), estable."""
+        return np.argsort(self.prioridad, kind='stable')
+
+    def pagina(self, numero, tamaño=10, indices=None):
+        """Índices de la página `numero` (base 0) sobre `indices` (o el orden natural)."""
+        if indices is None:
+            indices = np.arange(len(self))
+        inicio = numero * tamaño
+        return indices[inicio:inicio + tamaño]
+
+    def num_paginas(self, tamaño=10, indices=None):
+        n = len(self) if indices is None else len(indices)
+        return max(1, -(-n // tamaño))
+
+    def conteo_por_prioridad(self):
+        conteo = np.bincount(self.prioridad, minlength=len(PRIORIDADES))
+        return dict(zip(PRIORIDADES, conteo.tolist()))
+
+    @classmethod
+    def concatenar(cls, almacenes):
+        """Une varios almacenes re-internando las tablas de textos y segmentos."""
+        textos, segmentos = _Internador(), _Internador()
+        columnas = {campo: [] for campo in _COLUMNAS}
+        for almacen in almacenes:
+            mapa_t = np.array([textos.codigo(t) for t in almacen.textos] + [-1], dtype=np.int32)
+            mapa_s = np.array([segmentos.codigo(s) for s in almacen.segmentos], dtype=np.int32)
+            for campo in ('plantilla', 'prioridad', 'v0', 'v1'):
+                columnas[campo].append(getattr(almacen, campo))
+            # El índice -1 cae en el último elemento de mapa_t (-1)
+            columnas['t0'].append(mapa_t[almacen.t0])
+            columnas['t1'].append(mapa_t[almacen.t1])
+            columnas['segmento'].append(mapa_s[almacen.segmento])
+        return cls(**{campo: np.concatenate(valores) if valores else () for campo, valores in columnas.items()},
+                   textos=textos.valores, segmentos=segmentos.valores or (SEGMENTO_GLOBAL,))
+
+
+class _Internador:
+    """Tabla de valores únicos -> código entero."""
+    __slots__ = ('valores', '_codigos')
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codigo(self, valor):
+        if valor is None:
+            return -1
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+
+class ConstructorRecomendaciones:
+    """Acumula recomendaciones fila a fila o en bloque y produce el almacén."""
+
+    def __init__(self):
+        self._textos = _Internador()
+        self._segmentos = _Internador()
+        self._segmentos.codigo(SEGMENTO_GLOBAL)
+        self._bloques = []
+
+    def agregar(self, plantilla, v0=0.0, v1=0.0, t0=None, t1=None, segmento=SEGMENTO_GLOBAL):
+        self.agregar_bloque(plantilla, [v0], [v1], [t0], [t1], [segmento])
+
+    def agregar_bloque(self, plantilla, v0, v1=None, t0=None, t1=None, segmentos=None):
+        """Agrega n recomendaciones de la misma plantilla (parámetros vectorizados)."""
+        v0 = np.asarray(v0, dtype=np.float64)
+        n = len(v0)
+        if n == 0:
+            return
+        v1 = np.zeros(n) if v1 is None else np.asarray(v1, dtype=np.float64)
+        t0 = np.full(n, -1, np.int32) if t0 is None else np.array([self._textos.codigo(t) for t in t0], np.int32)
+        t1 = np.full(n, -1, np.int32) if t1 is None else np.array([self._textos.codigo(t) for t in t1], np.int32)
+        if segmentos is None:
+            segmento = np.zeros(n, np.int32)
+        else:
+            segmento = np.array([self._segmentos.codigo(s) for s in segmentos], np.int32)
+        self._bloques.append((
+            np.full(n, plantilla, np.uint8),
+            np.full(n, PLANTILLAS[plantilla][1], np.uint8),
+            segmento, v0, v1, t0, t1
+        ))
+
+    def construir(self):
+        if not self._bloques:
+            return AlmacenRecomendaciones(segmentos=self._segmentos.valores)
+        columnas = [np.concatenate(partes) for partes in zip(*self._bloques)]
+        return AlmacenRecomendaciones(*columnas, textos=self._textos.valores,
+                                      segmentos=self._segmentos.valores)
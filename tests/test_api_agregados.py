@@ -0,0 +1,101 @@
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+import api_agregados
+from api_agregados import ContextoAPI, crear_servidor
+from datos import cargar_oleadas, datos_de_ejemplo
+from deduplicacion import IndiceHuellas
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    df = datos_de_ejemplo(600)
+    ruta = tmp_path / "encuesta.csv"
+    df.to_csv(ruta, index=False)
+    contexto = ContextoAPI(str(ruta), str(tmp_path / "mm"), str(tmp_path / "sin_oficial.csv"), rutas_oleadas=[])
+    servidor = crear_servidor(contexto, puerto=0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}", df
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _pedir(url, cuerpo=None, **cabeceras):
+    datos = None if cuerpo is None else json.dumps(cuerpo).encode("utf-8")
+    pedido = urllib.request.Request(url, data=datos, headers=cabeceras)
+    try:
+        with urllib.request.urlopen(pedido) as respuesta:
+            return respuesta.status, dict(respuesta.headers), respuesta.read()
+    except urllib.error.HTTPError as error:
+        return error.code, dict(error.headers), error.read()
+
+
+def test_kpis_y_crosstab_igual_que_pandas(servidor):
+    url, df = servidor
+    estado, _, cuerpo = _pedir(url + "/kpis?Regi%C3%B3n=Cop%C3%A1n")
+    assert estado == 200
+    assert json.loads(cuerpo)[0]["total_encuestados"] == int((df["Región"] == "Copán").sum())
+
+    _, _, cuerpo = _pedir(url + "/crosstab?Edad=18,35")
+    obtenido = pd.DataFrame(json.loads(cuerpo)).set_index(["Frecuencia", "Variedad"])["Conteo"]
+    segmento = df[df["Edad"].between(18, 35)]
+    esperado = pd.crosstab(segmento["Frecuencia"].astype(str), segmento["Variedad"].astype(str)).stack()
+    pd.testing.assert_series_equal(obtenido[obtenido > 0].sort_index(), esperado[esperado > 0].sort_index(),
+                                   check_names=False, check_dtype=False)
+
+
+def test_etag_304_y_gzip(servidor):
+    url, _ = servidor
+    estado, cabeceras, plano = _pedir(url + "/perfil")
+    assert estado == 200
+    etag = cabeceras["ETag"]
+    estado, _, cuerpo = _pedir(url + "/perfil", **{"If-None-Match": etag})
+    assert estado == 304 and cuerpo == b""
+    estado, cabeceras, comprimido = _pedir(url + "/recomendaciones", **{"Accept-Encoding": "gzip"})
+    assert cabeceras["Content-Encoding"] == "gzip"
+    assert gzip.decompress(comprimido) == _pedir(url + "/recomendaciones")[2]
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"segmentos": ["Copán"]},
+    {"segmentos": [{"filtros": {"Departamento": ["Copán"]}}]},
+    {"segmentos": [{"filtros": {"Edad": [18]}}]},
+    {"segmentos": [{"filtros": ["Región"]}]},
+    {"segmentos": [], "tablas": "kpis"},
+    {"segmentos": {}},
+])
+def test_lote_invalido_es_400(servidor, cuerpo):
+    url, _ = servidor
+    estado, _, respuesta = _pedir(url + "/lote", cuerpo)
+    assert estado == 400 and "error" in json.loads(respuesta)
+
+
+def test_lote_por_region(servidor):
+    url, df = servidor
+    segmentos = [{"nombre": r, "filtros": {"Región": [r]}} for r in ("Copán", "Agalta")]
+    estado, _, cuerpo = _pedir(url + "/lote", {"segmentos": segmentos, "tablas": ["kpis"]})
+    kpis = pd.DataFrame(json.loads(cuerpo)["kpis"]).set_index("SegmentoCliente")["total_encuestados"]
+    assert estado == 200
+    assert kpis.to_dict() == {r: int((df["Región"] == r).sum()) for r in ("Copán", "Agalta")}
+
+
+def test_oleadas_sin_repetidos(tmp_path, monkeypatch):
+    df = datos_de_ejemplo(300)
+    rutas = [str(tmp_path / "ola1.csv"), str(tmp_path / "ola2.csv")]
+    df.iloc[:200].to_csv(rutas[0], index=False)
+    df.iloc[100:].to_csv(rutas[1], index=False)
+    indice = IndiceHuellas(str(tmp_path / "indice"))
+    monkeypatch.setattr(api_agregados, "cargar_oleadas",
+                        lambda rutas: cargar_oleadas(rutas, indice, str(tmp_path / "oleadas")))
+    contexto = ContextoAPI(directorio_mmap=str(tmp_path / "mm"), ruta_oficial=str(tmp_path / "sin_oficial.csv"),
+                           rutas_oleadas=rutas)
+    assert len(contexto.df) == 400
+    assert contexto.tabla("kpis", {})["total_encuestados"].iloc[0] == 300
+    assert contexto.tabla("kpis", {"Oleada": ["ola2"]})["total_encuestados"].iloc[0] == 100
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import backtesting
+from backtesting import CANDIDATOS, backtest, errores_candidato, seleccion
+from modelos import backtesting_model
+
+
+def _series():
+    x = np.arange(2010, 2024, dtype=float)
+    t = x - x[0]
+    return x, np.column_stack([100 + 20 * t, 50 * np.exp(0.15 * t), 400 / (1 + np.exp(-(t - 6) / 1.5))])
+
+
+def test_seleccion_igual_que_rmse_con_pandas(tmp_path):
+    x, Y = _series()
+    leaderboard = backtest(x, Y, directorio_cache=str(tmp_path))
+    # Baseline: RMSE por candidato y serie a partir de los errores de cada fold
+    filas = []
+    for nombre in CANDIDATOS:
+        errores = pd.DataFrame(errores_candidato(nombre, x, Y))
+        rmse = np.sqrt((errores ** 2).mean())
+        rmse[errores.isna().any()] = np.inf
+        filas.append(pd.DataFrame({"Serie": range(Y.shape[1]), "Modelo": nombre, "RMSE": rmse}))
+    esperado = pd.concat(filas).sort_values(["Serie", "RMSE"], kind="stable").groupby("Serie").head(1)
+    assert seleccion(leaderboard).tolist() == esperado["Modelo"].tolist()
+    assert seleccion(leaderboard).tolist() == ["Polinomio grado 1", "Log-lineal", "Logística"]
+
+
+def test_entrada_de_cache_borrada_se_recalcula(tmp_path, monkeypatch):
+    x, Y = _series()
+    primera = backtest(x, Y, directorio_cache=str(tmp_path))
+    # Otro proceso poda la caché entre la búsqueda y la lectura
+    cargar = np.load
+    monkeypatch.setattr(backtesting.np, "load", lambda ruta: os.remove(ruta) or cargar(ruta))
+    segunda = backtest(x, Y, directorio_cache=str(tmp_path))
+    pd.testing.assert_frame_equal(primera, segunda)
+
+
+def test_serie_corta_sin_intervalo():
+    df_proyeccion, leaderboard, metricas = backtesting_model(pd.DataFrame({"Año": [2020, 2022],
+                                                                          "Consumo": [100, 200]}))
+    assert np.isinf(leaderboard["RMSE"]).all()
+    assert metricas["modelo"] == "Polinomio grado 1" and np.isnan(metricas["rmse_backtest"])
+    proyeccion = df_proyeccion[df_proyeccion["Tipo"] == "Proyección"]
+    assert proyeccion["Consumo"].tolist() == [250, 300, 350, 400, 450, 500]
+    assert proyeccion[["Confianza_Baja", "Confianza_Alta"]].isna().all().all()
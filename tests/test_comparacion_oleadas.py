@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from comparacion_oleadas import (VistaOleada, comparar_edad, comparar_participacion, dimensiones_comunes,
+                                 prueba_proporciones, valores_q)
+from datos import datos_de_ejemplo
+from histogramas_edad import COLUMNAS_SEGMENTO, HistogramasEdad
+
+
+def test_valores_q_igual_que_scipy():
+    p = np.random.default_rng(0).uniform(0, 0.2, 40)
+    np.testing.assert_allclose(valores_q(p), stats.false_discovery_control(p, method="bh"))
+    con_nan = p.copy()
+    con_nan[[3, 17]] = np.nan
+    q = valores_q(con_nan)
+    assert np.isnan(q[[3, 17]]).all()
+    np.testing.assert_allclose(q[~np.isnan(con_nan)], stats.false_discovery_control(p[~np.isnan(con_nan)]))
+
+
+def test_participacion_igual_que_pandas():
+    df = datos_de_ejemplo(2000)
+    df["Oleada"] = np.where(np.arange(len(df)) < 800, "ola1", "ola2")
+    cubo = HistogramasEdad.desde_dataframe(df, COLUMNAS_SEGMENTO + ("Oleada",))
+    tabla = comparar_participacion(VistaOleada(cubo, "ola1"), VistaOleada(cubo, "ola2"), "Contexto")
+
+    conteos = pd.crosstab(df["Contexto"].astype(str), df["Oleada"])
+    np.testing.assert_array_equal(tabla["Conteo base"], conteos.loc[tabla.index, "ola1"])
+    np.testing.assert_array_equal(tabla["Conteo comparada"], conteos.loc[tabla.index, "ola2"])
+    n1, n2 = conteos["ola1"].sum(), conteos["ola2"].sum()
+    _, p = prueba_proporciones(tabla["Conteo base"], n1, tabla["Conteo comparada"], n2)
+    # Prueba z combinada = chi-cuadrado 2x2 sin corrección de continuidad
+    esperado = [stats.chi2_contingency([[x1, n1 - x1], [x2, n2 - x2]], correction=False)[1]
+                for x1, x2 in zip(tabla["Conteo base"], tabla["Conteo comparada"])]
+    np.testing.assert_allclose(p, esperado)
+
+
+def test_version_sin_una_columna():
+    df = datos_de_ejemplo(500)
+    completa = HistogramasEdad.desde_dataframe(df)
+    sin_contexto = HistogramasEdad.desde_dataframe(df.drop(columns="Contexto"))
+    assert dimensiones_comunes(completa, sin_contexto) == [c for c in COLUMNAS_SEGMENTO if c != "Contexto"]
+    with pytest.raises(ValueError, match="Contexto"):
+        comparar_participacion(completa, sin_contexto, "Contexto")
+    with pytest.raises(ValueError, match="Contexto"):
+        comparar_edad(completa, sin_contexto, "Contexto")
+    tabla = comparar_edad(completa, sin_contexto, "Región")
+    assert (tabla["n base"] == tabla["n comparada"]).all()
+    assert not tabla["Significativo"].any()
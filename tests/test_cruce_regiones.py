@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cruce_regiones
+from cruce_regiones import _dentro, cruce_aproximado, cruce_desde_poligonos
+
+
+def _dentro_por_arista(x, y, anillos):
+    """Referencia: una arista a la vez."""
+    dentro = np.zeros(len(x), dtype=bool)
+    for anillo in anillos:
+        for (a, b), (c, d) in zip(anillo[:-1], anillo[1:]):
+            cruza = (b > y) != (d > y)
+            x_corte = a + (y[cruza] - b) * (c - a) / (d - b)
+            dentro[np.flatnonzero(cruza)[x[cruza] < x_corte]] ^= True
+    return dentro
+
+
+def _rectangulo(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def _geo(propiedad, poligonos):
+    return {"features": [{"properties": {propiedad: nombre}, "geometry": {"type": "Polygon", "coordinates": anillos}}
+                         for nombre, anillos in poligonos.items()]}
+
+
+@pytest.mark.parametrize("celdas", [1 << 22, 7])
+def test_dentro_igual_que_por_arista(monkeypatch, celdas):
+    monkeypatch.setattr(cruce_regiones, "MAX_CELDAS_BLOQUE", celdas)
+    rng = np.random.default_rng(0)
+    angulos = np.sort(rng.uniform(0, 2 * np.pi, 40))
+    radios = rng.uniform(0.5, 1.0, 40)
+    exterior = np.column_stack([radios * np.cos(angulos), radios * np.sin(angulos)])
+    anillos = [np.vstack([exterior, exterior[:1]]), np.asarray(_rectangulo(-0.2, -0.2, 0.2, 0.2), dtype=float)]
+    x, y = rng.uniform(-1.1, 1.1, (2, 5000))
+    np.testing.assert_array_equal(_dentro(x, y, anillos), _dentro_por_arista(x, y, anillos))
+    assert not _dentro(np.array([0.0]), np.array([0.0]), anillos)[0]  # dentro del hueco
+
+
+def test_pesos_por_area_de_interseccion():
+    regiones = _geo("region", {"Copán": [_rectangulo(0, 0, 1, 1)], "Agalta": [_rectangulo(1, 0, 2, 1)]})
+    departamentos = _geo("NAME_1", {"Copán": [_rectangulo(0, 0, 0.25, 1)], "Lempira": [_rectangulo(0.25, 0, 2, 1)]})
+    cruce = cruce_desde_poligonos(regiones, departamentos, resolucion=0.01)
+    tabla = cruce.tabla().set_index(["Región", "Departamento"])["Peso"]
+    np.testing.assert_allclose(np.asarray(cruce.matriz.sum(axis=1)).ravel(), 1.0)
+    assert tabla[("Copán", "Copán")] == pytest.approx(0.25, abs=0.01)
+    assert tabla[("Copán", "Lempira")] == pytest.approx(0.75, abs=0.01)
+    assert tabla[("Agalta", "Lempira")] == pytest.approx(1.0)
+    assert not cruce.aproximado
+
+
+def test_proyectar_igual_que_merge_groupby():
+    cruce = cruce_aproximado()
+    assert cruce.aproximado
+    agregados = pd.DataFrame({"Conteo": [10.0, 4.0, 6.0], "SumaEdad": [300.0, 120.0, 150.0]},
+                             index=pd.Index(["Copán", "Agalta", "Yoro"], name="Región"))
+    obtenido = cruce.proyectar(agregados)
+
+    # Baseline en pandas: unir con la tabla de pesos y sumar por departamento
+    pesos = pd.concat([cruce.tabla(), pd.DataFrame({"Región": ["Yoro"], "Departamento": ["Yoro"], "Peso": [1.0]})])
+    unido = pesos.merge(agregados.reset_index(), on="Región")
+    esperado = unido[["Conteo", "SumaEdad"]].mul(unido["Peso"], axis=0).groupby(unido["Departamento"]).sum()
+    esperado = esperado.reindex(cruce.departamentos, fill_value=0.0)
+    np.testing.assert_allclose(obtenido.to_numpy(), esperado.to_numpy())
+    assert obtenido["Conteo"].sum() == pytest.approx(20.0)
@@ -0,0 +1,53 @@
+import glob
+import os
+
+import pandas as pd
+
+import datos_compartidos
+from datos import cargar_datos, datos_de_ejemplo
+from datos_compartidos import cargar_encuesta_compartida, leer_meta
+
+
+def _csv(ruta, n, semilla=0):
+    df = datos_de_ejemplo(n)
+    if semilla:
+        df = df.sample(frac=1, random_state=semilla)
+    df.to_csv(ruta, index=False)
+    return str(ruta)
+
+
+def test_mapeado_igual_a_la_carga_normalizada(tmp_path):
+    ruta = _csv(tmp_path / "a.csv", 300)
+    mapeado = cargar_encuesta_compartida(ruta, str(tmp_path / "mm"))
+    esperado = cargar_datos(ruta, str(tmp_path / "cuarentena"))
+    pd.testing.assert_frame_equal(mapeado.astype(object), esperado.astype(object), check_dtype=False)
+    assert mapeado.attrs["firma_contenido"] == leer_meta(str(tmp_path / "mm"), ruta)["binario"]
+
+
+def test_fuentes_distintas_no_se_pisan(tmp_path):
+    directorio = str(tmp_path / "mm")
+    ruta_a, ruta_b = _csv(tmp_path / "a.csv", 100), _csv(tmp_path / "b.csv", 200)
+    a = cargar_encuesta_compartida(ruta_a, directorio)
+    b = cargar_encuesta_compartida(ruta_b, directorio)
+    assert len(a) == 100 and len(b) == 200
+    assert leer_meta(directorio, ruta_a)["filas"] == 100
+    assert leer_meta(directorio, ruta_b)["filas"] == 200
+
+
+def test_binarios_sin_referencia_se_podan(tmp_path, monkeypatch):
+    monkeypatch.setattr(datos_compartidos, "MARGEN_PODA", 0)
+    directorio = str(tmp_path / "mm")
+    ruta = str(tmp_path / "a.csv")
+    for semilla in (1, 2, 3):
+        _csv(ruta, 100, semilla)
+        os.utime(ruta, ns=(semilla * 10 ** 9, semilla * 10 ** 9))
+        cargar_encuesta_compartida(ruta, directorio)
+    binarios = [os.path.basename(b) for b in glob.glob(os.path.join(directorio, "*.bin"))]
+    assert binarios == [leer_meta(directorio, ruta)["binario"]]
+
+
+def test_encuesta_vacia(tmp_path):
+    ruta = str(tmp_path / "vacia.csv")
+    datos_de_ejemplo(5).iloc[:0].to_csv(ruta, index=False)
+    df = cargar_encuesta_compartida(ruta, str(tmp_path / "mm"))
+    assert df.empty and "Región" in df.columns
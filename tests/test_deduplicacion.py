@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import datos
+from deduplicacion import IndiceHuellas
+from normalizacion import normalizar_encuesta
+
+
+def _oleada(ids, semilla=0):
+    rng = np.random.default_rng(semilla)
+    n = len(ids)
+    return pd.DataFrame({
+        "ID": [str(i) for i in ids],
+        "Región": rng.choice(["Copán", "Lempira"], n),
+        "Edad": rng.integers(18, 70, n).astype(str),
+        "Variedad": rng.choice(["Catuaí", "Pacas"], n),
+        "Preparación": rng.choice(["Espresso", "Cold brew"], n),
+        "Contexto": rng.choice(["Casa", "Oficina"], n),
+        "Frecuencia": rng.choice(["Diario", "Semanal"], n),
+    })
+
+
+@pytest.fixture
+def indice(tmp_path):
+    return IndiceHuellas(str(tmp_path / "indice"))
+
+
+def test_oleada_sin_id_se_conserva_completa(indice):
+    # Respuestas idénticas de personas distintas no son duplicados
+    crudo = _oleada(range(500)).drop(columns="ID")
+    crudo = pd.concat([crudo, crudo], ignore_index=True)
+    ola1, _ = normalizar_encuesta(crudo)
+    ola2, _ = normalizar_encuesta(crudo)
+    limpio1, _ = indice.deduplicar(ola1, "ola1")
+    limpio2, _ = indice.deduplicar(ola2, "ola2")
+    assert len(limpio1) == len(limpio2) == 1000
+    registro = indice.registro().set_index("Oleada")
+    assert registro.loc["ola2", "sin_clave"]
+    assert registro.loc["ola2", "duplicados_previos"] == 0
+
+
+def test_recargar_oleada_editada_conserva_todo(indice):
+    ola, _ = normalizar_encuesta(_oleada(range(1000)))
+    indice.deduplicar(ola, "ola1")
+    editada = pd.concat([normalizar_encuesta(_oleada([5000]))[0], ola], ignore_index=True)
+    limpio, resumen = indice.deduplicar(editada, "ola1")
+    assert len(limpio) == 1001
+    assert resumen["duplicados_internos"] == resumen["duplicados_previos"] == 0
+
+
+def test_duplicados_internos_y_previos(indice):
+    ola1, _ = normalizar_encuesta(_oleada(range(100)))
+    # La normalización ya pone en cuarentena los IDs repetidos de un archivo;
+    # aquí la oleada llega de dos exportaciones ya normalizadas por separado
+    ola2 = pd.concat([normalizar_encuesta(_oleada(range(80, 120)))[0],
+                      normalizar_encuesta(_oleada([110, 111]))[0]], ignore_index=True)
+    indice.deduplicar(ola1, "ola1")
+    limpio, resumen = indice.deduplicar(ola2, "ola2")
+    assert sorted(limpio["ID"].astype(int)) == list(range(100, 120))
+    assert resumen["duplicados_previos"] == 20
+    assert resumen["duplicados_internos"] == 2
+    registro = indice.registro().set_index("Oleada")
+    assert registro.loc["ola2", "tasa_duplicados"] == pytest.approx(22 / 42, abs=1e-6)
+
+
+def test_lotes_equivalen_a_una_carga(tmp_path):
+    ola1, _ = normalizar_encuesta(_oleada(range(300)))
+    ola2 = pd.concat([normalizar_encuesta(_oleada(range(200, 400), semilla=s))[0] for s in (1, 2)],
+                     ignore_index=True)
+    completo, por_lotes = IndiceHuellas(str(tmp_path / "a")), IndiceHuellas(str(tmp_path / "b"))
+    for indice in (completo, por_lotes):
+        indice.deduplicar(ola1, "ola1")
+    esperado, _ = completo.deduplicar(ola2, "ola2")
+    lotes = [ola2.iloc[i:i + 64] for i in range(0, len(ola2), 64)]
+    obtenido = pd.concat(por_lotes.deduplicar_lotes(lotes, "ola2"))
+    assert obtenido["ID"].tolist() == esperado["ID"].tolist()
+    assert por_lotes.registro().equals(completo.registro())
+
+
+def test_agregar_oleada_solo_lee_la_nueva(tmp_path, monkeypatch):
+    rutas = []
+    for i, ids in enumerate((range(100), range(50, 150), range(120, 200)), start=1):
+        ruta = tmp_path / f"ola{i}.csv"
+        _oleada(ids, semilla=i).to_csv(ruta, index=False)
+        rutas.append(str(ruta))
+    indice = IndiceHuellas(str(tmp_path / "indice"))
+    cache = str(tmp_path / "oleadas")
+    cuarentena = str(tmp_path / "cuarentena")
+    leidas = []
+    cargar = datos.cargar_datos
+    monkeypatch.setattr(datos, "cargar_datos", lambda ruta: leidas.append(ruta) or cargar(ruta, cuarentena))
+
+    primera = datos.cargar_oleadas(rutas[:2], indice, cache)
+    segunda = datos.cargar_oleadas(rutas, indice, cache)
+    assert leidas == rutas
+    assert segunda.iloc[:len(primera)].equals(primera)
+    # Cada oleada conserva su muestra; 'Repetido' marca a quienes ya respondieron antes
+    assert segunda.groupby("Oleada").size().tolist() == [100, 100, 80]
+    assert sorted(segunda.loc[segunda["Repetido"] == 0, "ID"].astype(int)) == list(range(200))
+
+
+def _rutas(tmp_path, *rangos):
+    rutas = []
+    for i, ids in enumerate(rangos, start=1):
+        ruta = tmp_path / f"ola{i}.csv"
+        _oleada(ids, semilla=i).to_csv(ruta, index=False)
+        rutas.append(str(ruta))
+    return rutas
+
+
+def _repetidos(df):
+    return df.groupby("Oleada", sort=False)["Repetido"].sum().to_dict()
+
+
+def test_quitar_o_reordenar_oleadas(tmp_path):
+    ola1, ola2 = _rutas(tmp_path, range(100), range(50, 150))
+    indice = IndiceHuellas(str(tmp_path / "indice"))
+    cache = str(tmp_path / "oleadas")
+    assert _repetidos(datos.cargar_oleadas([ola1, ola2], indice, cache)) == {"ola1": 0, "ola2": 50}
+    # Sin la primera oleada nadie de la segunda está repetido
+    assert _repetidos(datos.cargar_oleadas([ola2], indice, cache)) == {"ola2": 0}
+    assert _repetidos(datos.cargar_oleadas([ola1, ola2], indice, cache)) == {"ola1": 0, "ola2": 50}
+    assert _repetidos(datos.cargar_oleadas([ola2, ola1], indice, cache)) == {"ola2": 0, "ola1": 50}
+    registro = indice.registro(["ola2", "ola1", "ola3"])
+    assert registro["Oleada"].tolist() == ["ola2", "ola1"]
+    assert registro["duplicados_previos"].tolist() == [0, 50]
+
+
+def test_otro_proceso_ve_las_oleadas_cargadas(tmp_path, monkeypatch):
+    rutas = _rutas(tmp_path, range(100), range(50, 150))
+    cache = str(tmp_path / "oleadas")
+    a, b = IndiceHuellas(str(tmp_path / "indice")), IndiceHuellas(str(tmp_path / "indice"))
+    datos.cargar_oleadas(rutas, a, cache)
+    leidas = []
+    cargar = datos.cargar_datos
+    monkeypatch.setattr(datos, "cargar_datos", lambda ruta: leidas.append(ruta) or cargar(ruta))
+    # `b` se abrió antes de la carga de `a`: el candado relee el índice
+    assert _repetidos(datos.cargar_oleadas(rutas, b, cache)) == {"ola1": 0, "ola2": 50}
+    assert leidas == []
+    assert b.registro().equals(a.registro())
+    solo_lectura = IndiceHuellas(str(tmp_path / "indice"), solo_lectura=True)
+    assert not solo_lectura.tabla.flags.writeable
+    assert solo_lectura.registro(["ola2"])["duplicados_previos"].tolist() == [50]
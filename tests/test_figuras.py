@@ -0,0 +1,44 @@
+import json
+
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from figuras import CacheFiguras, firma
+
+
+def _barras(n):
+    conteo = pd.Series(range(n), index=[f"R{i}" for i in range(n)], name="Conteo")
+    return conteo, lambda: px.bar(x=conteo.index, y=conteo.to_numpy())
+
+
+def test_figura_congelada_igual_a_plotly():
+    conteo, construir = _barras(5)
+    cache = CacheFiguras()
+    figura = cache.obtener("barras", (conteo,), construir)
+    esperado = json.loads(pio.to_json(construir(), validate=False))
+    assert json.loads(pio.to_json(figura, validate=False)) == esperado
+    assert cache.obtener("barras", (conteo.copy(),), construir) is figura
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_cache_acotada_por_bytes():
+    figuras = [_barras(n) for n in (5, 6, 7)]
+    tamanos = [CacheFiguras().obtener("b", (c,), f).bytes_json for c, f in figuras]
+    cache = CacheFiguras(max_bytes=tamanos[1] + tamanos[2])
+    for conteo, construir in figuras:
+        cache.obtener("b", (conteo,), construir)
+    estadisticas = cache.estadisticas()
+    assert estadisticas["figuras"] == 2
+    assert estadisticas["bytes_json"] == tamanos[1] + tamanos[2]
+    # La primera fue desalojada: vuelve a construirse
+    cache.obtener("b", (figuras[0][0],), figuras[0][1])
+    assert cache.fallos == 4
+
+
+def test_figura_mayor_que_el_presupuesto_no_se_guarda():
+    conteo, construir = _barras(5)
+    cache = CacheFiguras(max_bytes=10)
+    assert cache.obtener("b", (conteo,), construir).bytes_json > 10
+    assert cache.estadisticas()["figuras"] == 0
+    assert firma(conteo) == firma(conteo.copy())
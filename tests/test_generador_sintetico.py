@@ -0,0 +1,36 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+import generador_sintetico as gs
+
+
+def test_misma_semilla_misma_encuesta():
+    pd.testing.assert_frame_equal(gs.generar_encuesta(500, semilla=3), gs.generar_encuesta(500, semilla=3))
+    assert not gs.generar_encuesta(500, semilla=3).equals(gs.generar_encuesta(500, semilla=4))
+
+
+def test_marginales_condicionales_como_las_tablas():
+    df = gs.generar_encuesta(200_000, semilla=1)
+    region = df["Región"].value_counts(normalize=True).reindex(gs.REGIONES)
+    np.testing.assert_allclose(region.to_numpy(), gs.pesos_zipf(len(gs.REGIONES)), atol=0.01)
+    variedad = pd.crosstab(df["Región"], df["Variedad"], normalize="index").reindex(
+        index=gs.REGIONES, columns=gs.VARIEDADES)
+    np.testing.assert_allclose(variedad.to_numpy(), gs.VARIEDAD_POR_REGION, atol=0.02)
+    grupo = pd.cut(df["Edad"], [0, 29, 49, 200], labels=False)
+    preparacion = pd.crosstab(grupo, df["Preparación"], normalize="index").reindex(columns=gs.PREPARACIONES)
+    np.testing.assert_allclose(preparacion.to_numpy(), gs.PREPARACION_POR_EDAD, atol=0.02)
+    assert df["Edad"].between(gs.EDAD_MINIMA, gs.EDAD_MAXIMA).all()
+
+
+def test_archivos_por_bloques_reproducibles(tmp_path):
+    rutas = []
+    for procesos in (1, 2):
+        directorio = str(tmp_path / f"p{procesos}")
+        gs.generar_archivos(2500, directorio, filas_por_bloque=1000, semilla=7, procesos=procesos)
+        rutas.append(sorted(glob.glob(os.path.join(directorio, "parte-*.csv"))))
+    uno, dos = (pd.concat([pd.read_csv(r) for r in lista], ignore_index=True) for lista in rutas)
+    pd.testing.assert_frame_equal(uno, dos)
+    assert len(rutas[0]) == 3 and uno["ID"].tolist() == list(range(1, 2501))
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from datos import DF_OFICIAL, cargar_serie_oficial, datos_de_ejemplo
+from grafo_calculo import GrafoCalculo
+from modelos import backtesting_model
+from recomendaciones import generar_recomendaciones
+from resultados import PLANTILLA_PROYECCION, calcular_kpis
+
+
+def _grafo():
+    grafo = GrafoCalculo()
+    grafo.nodo("conteo", ["encuesta"])(lambda df: df["Región"].astype(object).value_counts())
+    grafo.nodo("total", ["historia"])(lambda h: h["Consumo"].sum())
+    grafo.nodo("resumen", ["conteo", "total"])(lambda c, t: (len(c), t))
+    return grafo
+
+
+def test_solo_se_recalculan_los_dependientes():
+    grafo = _grafo()
+    df = datos_de_ejemplo(300)
+    grafo.fuente("encuesta", df)
+    grafo.fuente("historia", DF_OFICIAL)
+    assert grafo["conteo"].equals(df["Región"].astype(object).value_counts())
+    assert grafo["resumen"] == (df["Región"].nunique(), DF_OFICIAL["Consumo"].sum())
+
+    historia = DF_OFICIAL.assign(Consumo=DF_OFICIAL["Consumo"] * 2)
+    grafo.fuente("historia", historia)
+    assert grafo["resumen"][1] == historia["Consumo"].sum()
+    fallos = grafo.estadisticas().set_index("Nodo")["Fallos"]
+    assert fallos.to_dict() == {"conteo": 1, "total": 2, "resumen": 2}
+    assert grafo.dependientes("historia") == ["resumen", "total"]
+
+
+def test_misma_firma_de_contenido_es_acierto():
+    grafo = _grafo()
+    grafo.fuente("encuesta", datos_de_ejemplo(100), "f1")
+    grafo.fuente("historia", DF_OFICIAL)
+    grafo["conteo"]
+    grafo.fuente("encuesta", datos_de_ejemplo(100), "f1")
+    grafo["conteo"]
+    assert grafo.estadisticas().set_index("Nodo").loc["conteo", ["Aciertos", "Fallos"]].tolist() == [1, 1]
+
+
+def test_serie_oficial_sin_2024_no_rompe_recomendaciones(tmp_path):
+    ruta = tmp_path / "oficial.csv"
+    pd.DataFrame({"Año": range(2012, 2023, 2), "Consumo": [10000, 30000, 70000, 120000, 200000, 260000]}
+                 ).to_csv(ruta, index=False)
+    df_oficial = cargar_serie_oficial(str(ruta))
+    df_proyeccion, _, metricas = backtesting_model(df_oficial.copy(), years_to_predict=6)
+    df = datos_de_ejemplo(200)
+    almacen = generar_recomendaciones(df, df_proyeccion, df_oficial, metricas)
+    assert PLANTILLA_PROYECCION not in almacen.plantilla
+    assert calcular_kpis(df, df_proyeccion, df_oficial).consumo_2030 == 0
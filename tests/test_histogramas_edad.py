@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datos import datos_de_ejemplo
+from histogramas_edad import HistogramasEdad
+
+
+def _pandas(df, por):
+    df = df.astype({c: str for c in ([por] if isinstance(por, str) else por)})
+    grupos = df.dropna(subset=["Edad"]).groupby(por)["Edad"]
+    return pd.DataFrame({
+        "n": grupos.size(), "media": grupos.mean(), "std": grupos.std(),
+        "mediana": grupos.median(), "q1": grupos.quantile(0.25), "q3": grupos.quantile(0.75),
+    })
+
+
+@pytest.mark.parametrize("max_celdas", [1 << 22, 500])
+def test_estadisticas_iguales_a_groupby(max_celdas):
+    df = datos_de_ejemplo(600)
+    cubo = HistogramasEdad.desde_dataframe(df, max_celdas=max_celdas)
+    assert cubo.disperso == (max_celdas == 500)
+    for por in ("Región", ["Variedad", "Frecuencia"]):
+        obtenido = cubo.estadisticas(por=por)
+        esperado = _pandas(df, por)
+        obtenido = obtenido.loc[esperado.index, esperado.columns]
+        pd.testing.assert_frame_equal(obtenido.astype(float), esperado.astype(float), check_names=False,
+                                      check_index_type=False)
+
+
+def test_disperso_igual_al_denso_al_combinar():
+    df = datos_de_ejemplo(400)
+    a, b = df.iloc[:150], df.iloc[150:]
+    denso = HistogramasEdad.desde_dataframe(a).combinar(HistogramasEdad.desde_dataframe(b))
+    disperso = HistogramasEdad.desde_dataframe(a, max_celdas=500)
+    disperso.combinar(HistogramasEdad.desde_dataframe(b))
+    assert disperso.disperso and not denso.disperso
+    filtros = {"Preparación": ["Cold brew", "Espresso"]}
+    for por in ((), "Contexto", ["Región", "Preparación"]):
+        indice_d, h_d = denso.histograma(filtros, por=por, edad=(20, 60))
+        indice_s, h_s = disperso.histograma(filtros, por=por, edad=(20, 60))
+        np.testing.assert_array_equal(h_s, h_d)
+        if indice_d is not None:
+            assert indice_s.equals(indice_d)
+    assert disperso.descartadas == denso.descartadas
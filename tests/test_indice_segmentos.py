@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from datos import datos_de_ejemplo
+from indice_segmentos import Categorias, IndiceSegmentos
+
+FRECUENCIAS = ["Diario", "Semanal", "Ocasional"]
+
+
+def test_scatter_igual_a_groupby():
+    df = datos_de_ejemplo(1500)
+    esperado = (df.groupby(["Edad", df["Frecuencia"].astype(object)], observed=True)
+                .agg(Conteo=("Preparación", "size"), DiversidadMetodo=("Preparación", "nunique"))
+                .reset_index().sort_values(["Edad", "Frecuencia"], ignore_index=True))
+    obtenido = (IndiceSegmentos.desde_dataframe(df).scatter()
+                .sort_values(["Edad", "Frecuencia"], ignore_index=True))
+    pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False)
+
+
+def test_crosstab_igual_a_pandas():
+    df = datos_de_ejemplo(800)
+    esperado = (pd.crosstab(df["Frecuencia"].astype(object), df["Variedad"].astype(object))
+                .reindex(FRECUENCIAS).fillna(0).astype(np.int64))
+    obtenido = IndiceSegmentos.desde_dataframe(df).crosstab(FRECUENCIAS)
+    pd.testing.assert_frame_equal(obtenido, esperado, check_names=False)
+
+
+def test_agregar_por_partes_igual_a_todo_junto():
+    df = datos_de_ejemplo(1000)
+    completo = IndiceSegmentos.desde_dataframe(df)
+    por_partes = IndiceSegmentos()
+    for inicio in range(0, len(df), 137):
+        por_partes.agregar(df.iloc[inicio:inicio + 137])
+    pd.testing.assert_frame_equal(por_partes.scatter().sort_values(["Edad", "Frecuencia"], ignore_index=True),
+                                  completo.scatter().sort_values(["Edad", "Frecuencia"], ignore_index=True))
+    pd.testing.assert_frame_equal(por_partes.crosstab(FRECUENCIAS), completo.crosstab(FRECUENCIAS))
+
+
+def test_categorias_solo_crecen():
+    categorias = Categorias(["b"])
+    codigos = categorias.codigos(pd.Series(["a", "b", None, "c"]))
+    assert categorias.valores == ["b", "a", "c"]
+    assert codigos.tolist() == [1, 0, -1, 2]
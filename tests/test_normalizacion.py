@@ -0,0 +1,47 @@
+import pandas as pd
+
+from datos import datos_de_ejemplo, leer_csv
+from normalizacion import normalizar_encuesta
+
+
+def _crudo(ids):
+    n = len(ids)
+    return pd.DataFrame({
+        "ID": ids,
+        "Región": ["Copán"] * n,
+        "Edad": ["30"] * n,
+        "Variedad": ["Pacas"] * n,
+        "Preparación": ["Espresso"] * n,
+        "Contexto": ["Hogar"] * n,
+        "Frecuencia": ["Diario"] * n,
+    })
+
+
+def test_ids_alfanumericos_se_conservan():
+    limpio, cuarentena = normalizar_encuesta(_crudo(["HN-0001", " HN-0002 ", "0003", "A7"]))
+    assert limpio["ID"].tolist() == ["HN-0001", "HN-0002", "0003", "A7"]
+    assert cuarentena.empty
+
+
+def test_cuarentena_solo_ids_vacios_o_repetidos():
+    limpio, cuarentena = normalizar_encuesta(_crudo(["HN-1", "", None, "HN-1 ", "HN-2"]))
+    assert limpio["ID"].tolist() == ["HN-1", "HN-2"]
+    assert cuarentena["Motivo"].tolist() == ["ID vacío", "ID vacío", "ID repetido"]
+
+
+def test_repetido_de_una_fila_invalida_no_cuenta():
+    crudo = _crudo(["HN-1", "HN-1"])
+    crudo.loc[0, "Edad"] = "200"
+    limpio, cuarentena = normalizar_encuesta(crudo)
+    assert limpio.index.tolist() == [0] and limpio["ID"].tolist() == ["HN-1"]
+    assert cuarentena["Motivo"].str.startswith("Edad").all()
+
+
+def test_igual_que_pandas(tmp_path):
+    ruta = tmp_path / "encuesta.csv"
+    df = datos_de_ejemplo(500)
+    df.to_csv(ruta, index=False)
+    limpio, cuarentena = normalizar_encuesta(leer_csv(str(ruta)))
+    assert cuarentena.empty
+    esperado = pd.read_csv(ruta, dtype={"ID": str})
+    pd.testing.assert_frame_equal(limpio.astype(object), esperado.astype(object), check_dtype=False)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from cruce_regiones import DEPARTAMENTOS_HN, cruce_aproximado
+from datos import DF_OFICIAL, datos_de_ejemplo
+from pronostico_regional import participacion_departamental, pronostico_regional, tabla_departamental
+
+
+def test_participacion_igual_a_reparto_con_pandas():
+    df = datos_de_ejemplo(500)
+    cruce = cruce_aproximado()
+    pesos = cruce.tabla()
+    conteo = df["Región"].astype(object).value_counts().rename("Conteo")
+    esperado = (pesos.merge(conteo, left_on="Región", right_index=True)
+                .assign(Asignado=lambda t: t["Peso"] * t["Conteo"])
+                .groupby("Departamento")["Asignado"].sum())
+    esperado = (esperado / esperado.sum()).reindex(DEPARTAMENTOS_HN)
+    obtenido = participacion_departamental(df, cruce)
+    pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+
+
+def test_historico_departamental_suma_la_serie_nacional():
+    resultado = pronostico_regional(DF_OFICIAL, datos_de_ejemplo(500), cruce=cruce_aproximado())
+    historico = resultado[(resultado["Tipo"] == "Histórico") & (resultado["Nivel"] == "Departamento")]
+    suma = historico.groupby("Año")["Consumo"].sum()
+    np.testing.assert_allclose(suma.to_numpy(), DF_OFICIAL["Consumo"].to_numpy(), atol=len(DEPARTAMENTOS_HN))
+    assert resultado["Modelo"].nunique() == 1
+
+
+def test_encuesta_vacia_sin_pronostico():
+    vacia = datos_de_ejemplo(10).iloc[:0]
+    assert pronostico_regional(DF_OFICIAL, vacia, cruce=cruce_aproximado()).empty
+
+
+def test_tabla_departamental_indica_cruce_aproximado():
+    df = datos_de_ejemplo(300)
+    tabla = tabla_departamental(df, cruce=cruce_aproximado())
+    assert (tabla["Cruce"] == "aproximado").all()
+    assert len(tabla) == len(DEPARTAMENTOS_HN)
@@ -0,0 +1,47 @@
+import json
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from prueba_carga import geojson_sustituto, preparar_dataset, resumir, servidor_geojson
+from pronostico_regional import DEPARTAMENTOS_HN
+
+
+def test_resumen_igual_a_pandas():
+    rng = np.random.default_rng(0)
+    latencias = rng.exponential(0.2, 200)
+    resultados = [
+        {"registros": [("inicial", 1.5)] + [("rango_edad", x) for x in latencias[:120]] + [("pestaña", None)],
+         "errores": [], "segundos": 4.0, "memoria_mb": 100.0},
+        {"registros": [("inicial", 2.5)] + [("filtro_region", x) for x in latencias[120:]],
+         "errores": ["fallo"], "segundos": 5.0, "memoria_mb": 110.0},
+    ]
+    resumen = resumir(resultados, filas=1000, sesiones=1, procesos=2)
+    serie = pd.Series(latencias) * 1000
+    for q in (50, 95, 99):
+        assert resumen[f"p{q}_ms"] == round(serie.quantile(q / 100), 1)
+    assert resumen["inicial_p50_ms"] == 2000.0
+    assert resumen["reruns"] == 202
+    assert resumen["reruns_por_segundo"] == round(202 / 5.0, 2)
+    assert resumen["errores"] == 1
+
+
+def test_resumen_sin_interacciones():
+    resumen = resumir([{"registros": [("inicial", 1.0), ("pestaña", None)], "errores": [],
+                        "segundos": 1.0, "memoria_mb": None}], filas=10, sesiones=1, procesos=1)
+    assert resumen["p50_ms"] is None and resumen["reruns"] == 1
+
+
+def test_geojson_local_y_dataset(tmp_path):
+    servidor, url = servidor_geojson()
+    try:
+        with urllib.request.urlopen(url) as respuesta:
+            geojson = json.load(respuesta)
+    finally:
+        servidor.shutdown()
+    assert geojson == geojson_sustituto()
+    assert [f["properties"]["NAME_1"] for f in geojson["features"]] == list(DEPARTAMENTOS_HN)
+    ruta = preparar_dataset(300, str(tmp_path))
+    assert len(pd.read_csv(ruta)) == 300
+    assert preparar_dataset(300, str(tmp_path)) == ruta
@@ -0,0 +1,34 @@
+import json
+import os
+
+import pandas as pd
+
+import reporte_batch
+from datos import datos_de_ejemplo
+from datos_compartidos import preparar_encuesta_compartida
+
+
+def test_reporte_por_region_igual_a_groupby(tmp_path):
+    ruta = str(tmp_path / "encuesta.csv")
+    df = datos_de_ejemplo(400)
+    df.to_csv(ruta, index=False)
+    segmentos = [{"nombre": r, "filtros": {"Región": [r]}} for r in sorted(df["Región"].astype(str).unique())]
+    resumen = reporte_batch.ejecutar(ruta, segmentos, str(tmp_path / "salida"), formato="json", procesos=2,
+                                     ruta_oficial=str(tmp_path / "sin_oficial.csv"),
+                                     directorio_mmap=str(tmp_path / "mm"))
+    assert resumen["segmentos_vacios"] == []
+    with open(tmp_path / "salida" / "kpis.json", encoding="utf-8") as f:
+        kpis = pd.DataFrame(json.load(f)).set_index("SegmentoCliente")
+    esperado = df["Región"].astype(str).value_counts()
+    pd.testing.assert_series_equal(kpis["total_encuestados"].sort_index(), esperado.sort_index(),
+                                   check_names=False)
+
+
+def test_trabajador_no_vuelve_a_leer_el_csv(tmp_path):
+    ruta = str(tmp_path / "encuesta.csv")
+    datos_de_ejemplo(50).to_csv(ruta, index=False)
+    directorio = str(tmp_path / "mm")
+    meta = preparar_encuesta_compartida(ruta, directorio)
+    os.remove(ruta)
+    reporte_batch._inicializar_trabajador(directorio, meta, None, None, None)
+    assert len(reporte_batch._CONTEXTO["df"]) == 50
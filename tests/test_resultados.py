@@ -0,0 +1,64 @@
+import numpy as np
+
+from datos import datos_de_ejemplo
+from recomendaciones import generar_recomendaciones_por_segmento
+from resultados import (
+    PLANTILLA_FRECUENCIA, PLANTILLA_MODELO, PLANTILLA_TENDENCIA, AlmacenRecomendaciones,
+    ConstructorRecomendaciones
+)
+
+
+def _almacen(n):
+    rec = ConstructorRecomendaciones()
+    rec.agregar_bloque(PLANTILLA_FRECUENCIA, np.arange(n, dtype=float), segmentos=[f"s{i}" for i in range(n)])
+    rec.agregar(PLANTILLA_TENDENCIA, 250, 10)
+    return rec.construir()
+
+
+def test_pagina_con_menos_reglas_que_el_tamaño():
+    almacen = _almacen(2)
+    assert len(almacen) == 3
+    assert almacen.num_paginas(tamaño=10) == 1
+    indices = almacen.pagina(0, tamaño=10, indices=almacen.orden_por_prioridad())
+    assert len(indices) == 3
+    assert len(almacen.pagina(1, tamaño=10)) == 0
+    # El texto se arma solo al pedirlo, con los parámetros guardados
+    assert almacen.mensaje(2) == "El consumo interno ha crecido un 250% en 10 años. Es un mercado en expansión acelerada."
+    assert [almacen.item(i)["segmento"] for i in indices] == ["s0", "s1", "General"]
+
+
+def test_paginas_cubren_todo_sin_repetir():
+    almacen = _almacen(23)
+    orden = almacen.orden_por_prioridad()
+    paginas = [almacen.pagina(p, 10, orden) for p in range(almacen.num_paginas(10, orden))]
+    assert [len(p) for p in paginas] == [10, 10, 4]
+    assert sorted(np.concatenate(paginas).tolist()) == list(range(24))
+
+
+def test_almacen_vacio():
+    almacen = ConstructorRecomendaciones().construir()
+    assert len(almacen) == 0 and almacen.num_paginas() == 1 and list(almacen) == []
+
+
+def test_concatenar_reinterna_textos():
+    a = ConstructorRecomendaciones()
+    a.agregar(PLANTILLA_MODELO, 0.99, segmento="A")
+    b = _almacen(1)
+    unido = AlmacenRecomendaciones.concatenar([a.construir(), b])
+    assert [r["segmento"] for r in unido] == ["A", "s0", "General"]
+    assert unido.mensaje(0) == a.construir().mensaje(0)
+
+
+def test_reglas_por_segmento_igual_que_pandas():
+    df = datos_de_ejemplo(2000)
+    almacen = generar_recomendaciones_por_segmento(df, columnas=("Región",), min_muestra=20)
+    # Regla de frecuencia evaluada segmento por segmento con pandas
+    esperado = {}
+    for region, grupo in df.groupby(df["Región"].astype(object)):
+        diario = (grupo["Frecuencia"] == "Diario").mean() * 100
+        if len(grupo) >= 20 and diario < 50:
+            esperado[region] = diario
+    obtenido = {almacen.segmento_texto(i): almacen.v0[i]
+                for i in range(len(almacen)) if almacen.plantilla[i] == PLANTILLA_FRECUENCIA}
+    assert obtenido.keys() == esperado.keys()
+    np.testing.assert_allclose([obtenido[k] for k in esperado], list(esperado.values()))